@@ -0,0 +1,211 @@
+# Synchronous purchases versus the queued mode ("async": true) under a burst of buyers.
+# Every buyer already holds two seats; all of them hit POST .../purchase at once. The
+# synchronous route runs one DynamoDB transaction per request in flight, so write
+# pressure follows client concurrency. The queued route answers 202 after the hold
+# check, and worker_purchase drains the SQS FIFO queue (one message group per event)
+# with `--pollers` x PURCHASE_WORKERS purchases in flight, whatever the burst size.
+# Reports client latency, drain time, peak purchases in flight and peak
+# TransactWriteItems per second, then checks every order completed and no seat was sold twice.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_async_purchase.py --buyers 400 --concurrency 64 --dynamodb-rtt-ms 5
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import clients, holds, orders, purchase, seat_state  # noqa: E402
+
+SEATS_PER_BUYER = 2
+SEATS_PER_ROW = 50
+
+
+class WriteMeter(object):
+    # Purchases in flight (each one is a DynamoDB transaction per 98 seats) and the start
+    # time of every TransactWriteItems call. Calls are counted around the purchase itself:
+    # serialize_aws_calls runs botocore's hooks one call at a time.
+    def __init__(self, client):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.started = []
+        client.meta.events.register('before-call.dynamodb.TransactWriteItems', self.record)
+        run = purchase.purchase
+
+        def metered(*args, **kwargs):
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            try:
+                return run(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+        purchase.purchase = metered
+
+    def record(self, **kwargs):
+        with self.lock:
+            self.started.append(time.perf_counter())
+
+    def reset(self):
+        with self.lock:
+            self.peak = self.in_flight
+            self.started = []
+
+    def peak_per_second(self, window=0.5):
+        windows = Counter(int(t / window) for t in self.started)
+        return max(windows.values()) / window if windows else 0
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def create_events(event, prefix, count, seats):
+    event_ids = [f"{prefix}-{n}" for n in range(count)]
+    for event_id in event_ids:
+        response = event.lambda_handler({'httpMethod': 'POST', 'path': '/default/ticketmaster_event', 'body': json.dumps({
+            'event_id': event_id, 'event_name': 'Bench', 'event_date': '2026-12-01', 'venue_id': 'bench-venue',
+            'ticket_price': 80, 'counter_shards': 4})}, None)
+        assert response['statusCode'] == 200, response
+    return event_ids
+
+
+def hold_carts(redis_client, event_ids, buyers):
+    # Buyer n holds two adjacent seats of event n % len(event_ids)
+    carts = []
+    for n in range(buyers):
+        event_id = event_ids[n % len(event_ids)]
+        layout = seat_state.get_layout(redis_client, event_id)
+        first = (n // len(event_ids)) * SEATS_PER_BUYER
+        ticket_ids = seat_state.ordinal_ticket_ids(event_id, range(first, first + SEATS_PER_BUYER), layout)
+        token = f"buyer-{n}"
+        held, conflicts, _ = holds.hold(redis_client, event_id, ticket_ids, token, 600)
+        assert held, conflicts
+        carts.append({'event_id': event_id, 'ticket_ids': ticket_ids, 'hold_token': token})
+    return carts
+
+
+def burst(booking, carts, concurrency, queued):
+    def buy(cart):
+        body = dict(cart, **({'async': True} if queued else {}))
+        started = time.perf_counter()
+        response = booking.lambda_handler({'httpMethod': 'POST', 'path': '/default/ticketmaster_booking/purchase',
+                                           'body': json.dumps(body)}, None)
+        return time.perf_counter() - started, response
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(buy, carts))
+
+
+def drain(worker_purchase, sqs, pollers):
+    # Each poller stands in for one concurrent worker_purchase invocation
+    def poll():
+        idle = 0
+        while idle < 3:
+            messages = sqs.receive_message(QueueUrl=orders.QUEUE_URL, MaxNumberOfMessages=10,
+                                           AttributeNames=['MessageGroupId'], VisibilityTimeout=30).get('Messages', [])
+            if not messages:
+                idle += 1
+                time.sleep(0.05)
+                continue
+            idle = 0
+            records = [{'messageId': m['MessageId'], 'body': m['Body'], 'attributes': m['Attributes']} for m in messages]
+            failed = {f['itemIdentifier'] for f in worker_purchase.lambda_handler({'Records': records}, None)['batchItemFailures']}
+            for m in messages:
+                if m['MessageId'] not in failed:
+                    sqs.delete_message(QueueUrl=orders.QUEUE_URL, ReceiptHandle=m['ReceiptHandle'])
+
+    with ThreadPoolExecutor(max_workers=pollers) as executor:
+        for future in [executor.submit(poll) for _ in range(pollers)]:
+            future.result()
+
+
+def sold_twice(dynamodb_client, booking_ids):
+    seen = Counter()
+    for booking_id in booking_ids:
+        item = dynamodb_client.get_item(TableName='Booking_table', Key={'booking_id': {'S': booking_id}})['Item']
+        seen.update(t['S'] for t in item['ticket_ids']['L'])
+    return [ticket_id for ticket_id, count in seen.items() if count > 1]
+
+
+def report(label, latencies, seconds, meter, done, buyers):
+    latencies.sort()
+    print(f"{label:>7} {percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+          f"{seconds:>9.2f} {meter.peak:>10} {meter.peak_per_second():>11.0f} {done:>5}/{buyers}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buyers', type=int, default=400)
+    parser.add_argument('--events', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=64, help='buyers in flight at once')
+    parser.add_argument('--pollers', type=int, default=2, help='concurrent worker_purchase invocations')
+    parser.add_argument('--purchase-workers', type=int, default=4, help='PURCHASE_WORKERS per invocation')
+    parser.add_argument('--dynamodb-rtt-ms', type=float, default=5.0)
+    parser.add_argument('--redis-rtt-ms', type=float, default=0.5)
+    args = parser.parse_args()
+    seats = args.buyers // args.events * SEATS_PER_BUYER + SEATS_PER_ROW
+    rows = -(-seats // SEATS_PER_ROW)
+
+    with mock_aws():
+        dynamodb_client = boto3.client('dynamodb')
+        local_stack.create_tables(dynamodb_client)
+        sqs = boto3.client('sqs')
+        orders.QUEUE_URL = sqs.create_queue(QueueName='purchases.fifo', Attributes={'FifoQueue': 'true'})['QueueUrl']
+        redis_client = local_stack.redis_standin(rtt_ms=args.redis_rtt_ms, max_connections=args.concurrency + 50)
+        clients.override('redis', redis_client)
+        boto3.resource('dynamodb').Table('Venue_table').put_item(Item={
+            'venue_id': 'bench-venue', 'row_count': rows, 'seats_per_row': SEATS_PER_ROW})
+        import booking
+        import event
+        import worker_purchase
+        worker_purchase.PURCHASE_WORKERS = args.purchase_workers
+        meter = WriteMeter(clients.get('dynamodb_client'))
+        restore = local_stack.serialize_aws_calls(args.dynamodb_rtt_ms)
+
+        print(f"{args.buyers} buyers over {args.events} events, {args.concurrency} in flight; "
+              f"queued mode drains with {args.pollers} x {args.purchase_workers} workers")
+        print(f"{'mode':>7} {'p50 ms':>8} {'p99 ms':>8} {'seconds':>9} {'in flight':>10} {'peak txn/s':>11} {'done':>9}")
+        try:
+            carts = hold_carts(redis_client, create_events(event, 'sync', args.events, seats), args.buyers)
+            meter.reset()
+            started = time.perf_counter()
+            results = burst(booking, carts, args.concurrency, queued=False)
+            seconds = time.perf_counter() - started
+            booking_ids = [json.loads(r['body'])['booking_id'] for _, r in results if r['statusCode'] == 200]
+            report('sync', [latency for latency, _ in results], seconds, meter, len(booking_ids), args.buyers)
+            assert not sold_twice(dynamodb_client, booking_ids)
+
+            carts = hold_carts(redis_client, create_events(event, 'queued', args.events, seats), args.buyers)
+            meter.reset()
+            started = time.perf_counter()
+            results = burst(booking, carts, args.concurrency, queued=True)
+            accepted = time.perf_counter() - started
+            assert all(r['statusCode'] == 202 for _, r in results), [r for _, r in results if r['statusCode'] != 202][:1]
+            drain(worker_purchase, sqs, args.pollers)
+            seconds = time.perf_counter() - started
+            order_ids = [json.loads(r['body'])['order_id'] for _, r in results]
+            statuses = [json.loads(booking.lambda_handler({'httpMethod': 'GET', 'path': '/default/ticketmaster_booking/order',
+                                                           'queryStringParameters': {'order_id': order_id}}, None)['body'])
+                        for order_id in order_ids]
+            complete = [s['booking_id'] for s in statuses if s['status'] == orders.COMPLETE]
+            report('queued', [latency for latency, _ in results], seconds, meter, len(complete), args.buyers)
+            assert not sold_twice(dynamodb_client, complete)
+            print(f"\nqueued: all {args.buyers} orders accepted in {accepted:.2f}s; seconds = until the queue drained")
+        finally:
+            restore()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# Availability list reads on large events: the old single GSI query (all attributes,
+# whatever fits in one 1 MB page) against the paged, projected read in event.read_item.
+# Reports tickets returned, response size, DynamoDB queries and time, for one response
+# and for walking the whole inventory by cursor, then the peak memory of one invocation
+# (tracemalloc, which also counts moto evaluating the query and slows it down a lot).
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_availability_read.py --sizes 10000,20000 --limit 5000
+import argparse
+import json
+import time
+import tracemalloc
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import clients, dynamo_batch, serialization  # noqa: E402
+
+
+def legacy_read(event_id):
+    response = boto3.resource('dynamodb').Table('Ticket_table').query(
+        IndexName='event_id-ticket_status-index',
+        KeyConditionExpression='event_id = :event_id AND ticket_status = :status',
+        ExpressionAttributeValues={':event_id': event_id, ':status': 'available'}
+    )
+    items = response.get('Items', [])
+    return serialization.dumps_list(items, key='available_tickets'), len(items)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,20000')
+    parser.add_argument('--limit', type=int, default=5000, help='seats per paged response')
+    args = parser.parse_args()
+
+    with mock_aws():
+        dynamodb = boto3.client('dynamodb')
+        local_stack.create_tables(dynamodb)
+        queries = {'Query': 0}
+
+        def count(**kwargs):
+            queries['Query'] += 1
+        dynamodb.meta.events.register('before-call.dynamodb.Query', count)
+        clients.override('dynamodb_client', dynamodb)
+        clients.override('redis', local_stack.redis_standin())
+        import event
+
+        print(f"{'seats':>7} {'read':>16} {'tickets':>8} {'KB':>8} {'queries':>8} {'seconds':>8}")
+        peaks = []
+        for size in [int(s) for s in args.sizes.split(',')]:
+            event_id = f"bench{size}"
+            layout = {'row_count': size // 100, 'seats_per_row': 100}
+            seats = event.generate_seat_map({**layout, 'seat_count': size})
+            dynamo_batch.bulk_write(dynamodb, 'Ticket_table', (
+                dynamo_batch.put_request(event.build_ticket_item(event_id, seat, 120, 'bench-venue', '2026-12-01', section))
+                for seat, section in seats))
+
+            (body, count_), seconds = timed(lambda: legacy_read(event_id))
+            print(f"{size:>7} {'legacy query':>16} {count_:>8} {len(body) / 1024:>8.0f} {1:>8} {seconds:>8.2f}")
+
+            def page(cursor=None):
+                params = {'event_id': event_id, 'limit': str(args.limit)}
+                if cursor:
+                    params['cursor'] = cursor
+                response = event.read_item({'queryStringParameters': params})
+                return json.loads(response['body']), len(response['body'])
+
+            queries['Query'] = 0
+            (first, first_bytes), seconds = timed(page)
+            print(f"{'':>7} {'paged, 1 page':>16} {len(first['available_tickets']):>8} {first_bytes / 1024:>8.0f} "
+                  f"{queries['Query']:>8} {seconds:>8.2f}")
+
+            queries['Query'] = 0
+            total, total_bytes, cursor, started = 0, 0, None, time.perf_counter()
+            while True:
+                body, size_bytes = page(cursor)
+                total += len(body['available_tickets'])
+                total_bytes += size_bytes
+                cursor = body['cursor']
+                if not cursor:
+                    break
+            print(f"{'':>7} {'paged, all':>16} {total:>8} {total_bytes / 1024:>8.0f} {queries['Query']:>8} "
+                  f"{time.perf_counter() - started:>8.2f}")
+            peaks.append((size, peak_memory(lambda: legacy_read(event_id)), peak_memory(page)))
+            assert total == size
+
+        print(f"\n{'seats':>7} {'legacy peak MB':>15} {'1 page peak MB':>15}")
+        for size, legacy_peak, paged_peak in peaks:
+            print(f"{size:>7} {legacy_peak / 2**20:>15.1f} {paged_peak / 2**20:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
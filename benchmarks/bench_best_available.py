@@ -0,0 +1,103 @@
+# Best-available seat search across venue sizes. Compares the old client-side flow
+# (download the available-ticket list, then scan it for adjacent seats) with
+# common.seat_finder over the seat-state bitmap, and times the booking handler's
+# best-available route end to end, with the hold, against fakeredis (and moto for the
+# event item the route reads).
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_best_available.py --taken 0.8 --quantity 4
+import argparse
+import json
+import random
+import time
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import clients, seat_finder, seat_state, serialization  # noqa: E402
+
+# seats -> (rows, seats per row)
+VENUES = {1000: (20, 50), 10000: (100, 100), 50000: (250, 200)}
+
+
+def client_side_search(body, quantity):
+    # What a client had to do with read_item's list: group seats by row, then scan
+    seats = {}
+    for ticket in json.loads(body)['available_tickets']:
+        number = ticket['seat_number']
+        split = len(number.rstrip('0123456789'))
+        seats.setdefault(seat_state.row_index(number[:split]), set()).add(int(number[split:]))
+    for row in sorted(seats):
+        free = seats[row]
+        for seat in sorted(free):
+            if all(seat + k in free for k in range(quantity)):
+                return row, seat
+    return None
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default=','.join(str(size) for size in VENUES))
+    parser.add_argument('--taken', type=float, default=0.8, help='share of seats already held or sold')
+    parser.add_argument('--quantity', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    with mock_aws():
+        local_stack.create_tables(boto3.client('dynamodb'))
+        run(args)
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    redis_client = local_stack.redis_standin()
+    clients.override('redis', redis_client)
+    import booking
+
+    print(f"{'seats':>7} {'list KB':>8} {'client scan ms':>15} {'finder ms':>10} {'handler+hold ms':>16} {'response B':>11}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        rows, seats_per_row = VENUES[size]
+        layout = seat_state.build_layout(rows, seats_per_row)
+        event_id = f"bench{size}"
+        states = {o: rng.choice((seat_state.HELD, seat_state.SOLD)) for o in range(size) if rng.random() < args.taken}
+        seat_state.write(redis_client, event_id, layout, states)
+        _, bitmap = seat_state.snapshot(redis_client, event_id)
+
+        available = [{'ticket_id': f"{event_id}_{seat_state.seat_number(o, layout)}", 'event_id': event_id,
+                      'seat_number': seat_state.seat_number(o, layout), 'ticket_price': 120, 'venue_id': 'bench-venue',
+                      'event_date': '2026-12-01', 'ticket_status': 'available', 'redis_status': 'non-exist'}
+                     for o in range(size) if o not in states]
+        body = serialization.dumps_list(available, key='available_tickets')
+        client_ms = timed(lambda: client_side_search(body, args.quantity), max(1, args.repeat // 10))
+        ordinals = seat_finder.find(bitmap, layout, args.quantity)
+        expected = client_side_search(body, args.quantity)
+        assert (ordinals is None and expected is None) or divmod(ordinals[0], seats_per_row)[0] == expected[0]
+        finder_ms = timed(lambda: seat_finder.find(bitmap, layout, args.quantity), args.repeat)
+
+        responses = []
+
+        def hold_best():
+            responses.append(booking.lambda_handler({
+                'httpMethod': 'POST', 'path': '/default/ticketmaster_booking/best-available',
+                'body': json.dumps({'event_id': event_id, 'quantity': args.quantity, 'hold': True})}, None))
+        handler_ms = timed(hold_best, min(args.repeat, 20))
+        print(f"{size:>7} {len(body) / 1024:>8.0f} {client_ms:>15.2f} {finder_ms:>10.3f} {handler_ms:>16.2f} "
+              f"{len(responses[0]['body']):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# Time to remove an event's inventory: one delete_item per ticket (what a synchronous
+# cascade in the event lambda would do) versus the worker_delete pipeline with 1 and
+# `--workers` parallel batch-delete streams. Each run also stops the worker early once,
+# as a Lambda timeout would, and checks the requeued message finishes the job with no
+# ticket, counter shard, hold or seat-state key left behind.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_cascade_delete.py --seats 5000 --rtt-ms 2
+import argparse
+import json
+import time
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import clients, event_deletion, holds, search_client  # noqa: E402
+
+SEATS_PER_ROW = 100
+
+
+class StubResponse(object):
+    status_code = 404
+
+
+class StubSearch(object):
+    # OpenSearch is not emulated; the document delete answers "not found"
+    def delete(self, url, timeout=None):
+        return StubResponse()
+
+
+class Deadline(object):
+    # Lambda context whose remaining time runs out after `calls` checks
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_remaining_time_in_millis(self):
+        self.calls -= 1
+        return 900000 if self.calls > 0 else 0
+
+
+def create_event(event, event_id, seats):
+    response = event.lambda_handler({'httpMethod': 'POST', 'path': '/default/ticketmaster_event', 'body': json.dumps({
+        'event_id': event_id, 'event_name': 'Bench', 'event_date': '2026-12-01', 'venue_id': 'bench-venue',
+        'ticket_price': 80, 'counter_shards': 4})}, None)
+    assert response['statusCode'] == 200, response
+    holds.hold(clients.get('redis'), event_id, [f"{event_id}_A1", f"{event_id}_A2"], 'bench', 300)
+
+
+def sequential_delete(dynamodb_client, event_id):
+    query_kwargs = {
+        'TableName': 'Ticket_table',
+        'IndexName': 'event_id-ticket_status-index',
+        'KeyConditionExpression': 'event_id = :event_id',
+        'ExpressionAttributeValues': {':event_id': {'S': event_id}},
+        'ProjectionExpression': 'ticket_id'
+    }
+    while True:
+        response = dynamodb_client.query(**query_kwargs)
+        for item in response.get('Items', []):
+            dynamodb_client.delete_item(TableName='Ticket_table', Key={'ticket_id': item['ticket_id']})
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def worker_delete_run(event, worker_delete, sqs, event_id):
+    response = event.lambda_handler({'httpMethod': 'DELETE', 'path': '/default/ticketmaster_event',
+                                     'body': json.dumps({'event_id': event_id})}, None)
+    assert response['statusCode'] == 202, response
+    first = True
+    while True:
+        messages = sqs.receive_message(QueueUrl=event_deletion.QUEUE_URL, MaxNumberOfMessages=10).get('Messages', [])
+        if not messages:
+            return
+        records = [{'messageId': m['MessageId'], 'body': m['Body']} for m in messages]
+        for m in messages:
+            sqs.delete_message(QueueUrl=event_deletion.QUEUE_URL, ReceiptHandle=m['ReceiptHandle'])
+        # The first invocation runs out of time after a few segments and requeues itself
+        assert worker_delete.lambda_handler({'Records': records}, Deadline(4) if first else None) == {'batchItemFailures': []}
+        first = False
+
+
+def leftovers(dynamodb_client, redis_client, event_id):
+    tickets = dynamodb_client.query(
+        TableName='Ticket_table', IndexName='event_id-ticket_status-index', Select='COUNT',
+        KeyConditionExpression='event_id = :event_id', ExpressionAttributeValues={':event_id': {'S': event_id}})['Count']
+    shards = dynamodb_client.scan(TableName='Event_counter_table', Select='COUNT', FilterExpression='event_id = :event_id',
+                                  ExpressionAttributeValues={':event_id': {'S': event_id}})['Count']
+    keys = [k for k in redis_client.keys(f"*{event_id}*") if not k.decode().startswith('eventdelete:')]
+    return tickets, shards, len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seats', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rtt-ms', type=float, default=2.0, help='simulated DynamoDB round-trip time')
+    args = parser.parse_args()
+
+    with mock_aws():
+        dynamodb_client = boto3.client('dynamodb')
+        local_stack.create_tables(dynamodb_client)
+        sqs = boto3.client('sqs')
+        event_deletion.QUEUE_URL = sqs.create_queue(QueueName='event-delete')['QueueUrl']
+        redis_client = local_stack.redis_standin()
+        clients.override('redis', redis_client)
+        search_client._session = StubSearch()
+        boto3.resource('dynamodb').Table('Venue_table').put_item(Item={
+            'venue_id': 'bench-venue', 'row_count': args.seats // SEATS_PER_ROW, 'seats_per_row': SEATS_PER_ROW})
+        import event
+        import worker_delete
+
+        print(f"{'path':>12} {'tickets':>8} {'seconds':>9} {'tickets/s':>10} {'left':>12}")
+        baseline = None
+        for path, workers in (('sequential', None), ('worker x1', 1), (f"worker x{args.workers}", args.workers)):
+            event_id = f"bench-{workers or 0}"
+            create_event(event, event_id, args.seats)
+            restore = local_stack.serialize_aws_calls(args.rtt_ms)
+            try:
+                started = time.perf_counter()
+                if workers is None:
+                    sequential_delete(dynamodb_client, event_id)
+                else:
+                    worker_delete.DELETE_WORKERS = workers
+                    worker_delete_run(event, worker_delete, sqs, event_id)
+                seconds = time.perf_counter() - started
+            finally:
+                restore()
+            baseline = baseline or seconds
+            tickets, shards, keys = leftovers(dynamodb_client, redis_client, event_id)
+            if workers is not None:
+                assert (tickets, shards, keys) == (0, 0, 0), (tickets, shards, keys)
+                progress = json.loads(event.lambda_handler({'httpMethod': 'GET', 'path': '/default/ticketmaster_event',
+                                                            'queryStringParameters': {'event_id': event_id, 'view': 'deletion'}}, None)['body'])
+                assert progress['status'] == 'deleted' and progress['tickets_deleted'] == args.seats, progress
+            left = f"{tickets}/{shards}/{keys}"
+            print(f"{path:>12} {args.seats:>8} {seconds:>9.2f} {args.seats / seconds:>10.0f} {left:>12}  {baseline / seconds:.1f}x")
+        print('\nleft = tickets / counter shards / Redis keys remaining for the event')
+
+
+if __name__ == '__main__':
+    main()
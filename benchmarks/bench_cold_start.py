@@ -0,0 +1,86 @@
+# Cold-start cost per handler: module import time and first/second invocation latency,
+# each handler measured in a fresh interpreter so nothing is already imported.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_cold_start.py --max-import-ms 150
+#
+# The handler is imported before moto, so the import column is what Lambda pays during
+# init. moto imports boto3 itself, so the first-call column includes creating clients but
+# not importing boto3; both columns are comparable across runs on the same machine.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Handler module -> event for the first invocations
+HANDLERS = {
+    'event': {'httpMethod': 'GET', 'path': '/default/ticketmaster_event', 'queryStringParameters': {'event_id': 'bench', 'view': 'seatmap'}},
+    'booking': {'httpMethod': 'POST', 'path': '/default/ticketmaster_booking/reserve', 'body': json.dumps({'ticket_ids': ['bench_1', 'bench_2']})},
+    'ticket': {'httpMethod': 'GET', 'queryStringParameters': {'ticket_id': 'bench_1'}},
+    'image': {'queryStringParameters': {'filename': 'bench.jpg'}},
+    'read_imageDB': {'queryStringParameters': {'page_size': '10'}},
+    'worker_SQS': {'Records': []},
+    'worker_delete': {'Records': []},
+    'worker_purchase': {'Records': []},
+    'upload': {'Records': []},
+}
+
+CHILD = r'''
+import json, os, sys, time
+sys.path.insert(0, {benchmarks!r})
+import local_stack
+local_stack.setup_env()
+started = time.perf_counter()
+handler = __import__({module!r})
+import_ms = (time.perf_counter() - started) * 1000
+loaded = sorted(name for name in ('boto3', 'redis', 'requests') if name in sys.modules)
+
+import boto3
+from moto import mock_aws
+from common import clients
+with mock_aws():
+    local_stack.create_tables(boto3.client('dynamodb'))
+    clients.override('redis', local_stack.redis_standin())
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        response = handler.lambda_handler(json.loads({event!r}), None)
+        timings.append((time.perf_counter() - started) * 1000)
+print(json.dumps({{'import_ms': import_ms, 'first_ms': timings[0], 'warm_ms': timings[1], 'loaded': loaded,
+                  'status': response.get('statusCode') if isinstance(response, dict) else None}}))
+'''
+
+
+def measure(module, event):
+    code = CHILD.format(benchmarks=HERE, module=module, event=json.dumps(event))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--handlers', default=','.join(HANDLERS))
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per handler; the median is reported')
+    parser.add_argument('--max-import-ms', type=float, help='exit non-zero if any handler imports slower than this')
+    args = parser.parse_args()
+
+    print(f"{'handler':>14} {'import ms':>10} {'first ms':>9} {'warm ms':>8} {'status':>7}  imported at init")
+    slow = []
+    for module in args.handlers.split(','):
+        event = HANDLERS[module]
+        runs = sorted((measure(module, event) for _ in range(args.runs)), key=lambda r: r['import_ms'])
+        result = runs[len(runs) // 2]
+        print(f"{module:>14} {result['import_ms']:>10.1f} {result['first_ms']:>9.1f} {result['warm_ms']:>8.1f} {str(result['status']):>7}  {', '.join(result['loaded']) or '-'}")
+        if args.max_import_ms is not None and result['import_ms'] > args.max_import_ms:
+            slow.append(module)
+
+    if slow:
+        print(f"import budget of {args.max_import_ms} ms exceeded by: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
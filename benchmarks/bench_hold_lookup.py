@@ -0,0 +1,59 @@
+# Compare the per-ticket EXISTS hold check with the pipelined one used by event.read_item.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_hold_lookup.py --rtt-ms 0.3
+import argparse
+import time
+
+import local_stack
+
+local_stack.setup_env()
+
+import event  # noqa: E402
+from common import holds  # noqa: E402
+
+
+def legacy_filter(redis_client, tickets):
+    return [t for t in tickets if not redis_client.exists(holds.hold_key(t['event_id'], t['ticket_id']))]
+
+
+def make_tickets(event_id, count):
+    return [{'ticket_id': f"{event_id}_{n}", 'event_id': event_id, 'ticket_status': 'available'} for n in range(count)]
+
+
+def measure(fn, redis_client):
+    redis_client.stats['round_trips'] = 0
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    return result, elapsed, redis_client.stats['round_trips']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    parser.add_argument('--held-ratio', type=float, default=0.1)
+    parser.add_argument('--rtt-ms', type=float, default=0.3, help='simulated Redis round-trip time')
+    args = parser.parse_args()
+
+    print(f"{'seats':>8} {'path':>10} {'round trips':>12} {'seconds':>9} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        redis_client = local_stack.redis_standin(rtt_ms=args.rtt_ms)
+        event.redis_client = redis_client
+        event_id = f"bench{size}"
+        tickets = make_tickets(event_id, size)
+        pipe = redis_client.pipeline(transaction=False)
+        for ticket in tickets[:int(size * args.held_ratio)]:
+            pipe.set(holds.hold_key(ticket['event_id'], ticket['ticket_id']), 'reserved', ex=300)
+        pipe.execute()
+
+        legacy, legacy_seconds, legacy_trips = measure(lambda: legacy_filter(redis_client, tickets), redis_client)
+        pipelined, pipelined_seconds, pipelined_trips = measure(lambda: event.filter_held_tickets(tickets, event_id), redis_client)
+        assert legacy == pipelined
+
+        print(f"{size:>8} {'legacy':>10} {legacy_trips:>12} {legacy_seconds:>9.3f} {'':>8}")
+        print(f"{size:>8} {'pipelined':>10} {pipelined_trips:>12} {pipelined_seconds:>9.3f} {legacy_seconds / pipelined_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Venue and event metadata reads with and without common.cache. Times the lookups the
+# event and booking lambdas make per request (get_venue_seat_info and the counter shard
+# count) against moto with a simulated DynamoDB round trip, counts the GetItem calls, then
+# fires concurrent misses on one key to show they share a single read, and checks that a
+# stream batch through upload.py retires the cached entries.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_metadata_cache.py --dynamodb-rtt-ms 3
+import argparse
+import threading
+import time
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import cache, clients, ticket_counter  # noqa: E402
+
+
+def count_get_items(client):
+    calls = {'GetItem': 0}
+
+    def counted(**kwargs):
+        calls['GetItem'] += 1
+    client.meta.events.register('before-call.dynamodb.GetItem', counted)
+    return calls
+
+
+def timed(fn, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--dynamodb-rtt-ms', type=float, default=3.0)
+    args = parser.parse_args()
+
+    with mock_aws():
+        dynamodb = boto3.client('dynamodb')
+        local_stack.create_tables(dynamodb)
+        local_stack.add_latency(dynamodb, args.dynamodb_rtt_ms)
+        calls = count_get_items(dynamodb)
+        clients.override('dynamodb_client', dynamodb)
+        clients.override('redis', local_stack.redis_standin())
+        import event
+        import upload
+        dynamodb.put_item(TableName='Venue_table', Item={'venue_id': {'S': 'v1'}, 'row_count': {'N': '20'}, 'seats_per_row': {'N': '50'}})
+        dynamodb.put_item(TableName='Event_table', Item={'event_id': {'S': 'e1'}, 'venue_id': {'S': 'v1'}, 'counter_shards': {'N': '8'}})
+
+        lookups = [('venue layout', lambda: event.get_venue_seat_info('v1')),
+                   ('counter shard count', lambda: ticket_counter.shard_count(dynamodb, 'e1'))]
+        print(f"{'lookup':>20} {'uncached ms':>12} {'cached ms':>10} {'GetItem/call':>13}")
+        for name, fn in lookups:
+            cache.venues.ttl_seconds = cache.events.ttl_seconds = 0
+            calls['GetItem'] = 0
+            uncached = timed(fn, args.calls)
+            uncached_reads = calls['GetItem'] / args.calls
+            cache.venues.ttl_seconds, cache.events.ttl_seconds = cache.VENUE_TTL_SECONDS, cache.EVENT_TTL_SECONDS
+            fn()
+            calls['GetItem'] = 0
+            cached = timed(fn, args.calls)
+            print(f"{name:>20} {uncached:>12.3f} {cached:>10.4f} {uncached_reads:>6.0f} -> {calls['GetItem'] / args.calls:.0f}")
+
+        cache.venues.discard('v1')
+        calls['GetItem'] = 0
+        barrier = threading.Barrier(args.threads)
+
+        def miss():
+            barrier.wait()
+            event.get_venue_seat_info('v1')
+        threads = [threading.Thread(target=miss) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"\n{args.threads} concurrent misses on one venue: {calls['GetItem']} GetItem")
+
+        record = {'eventName': 'MODIFY', 'eventSourceARN': 'arn:aws:dynamodb:us-west-2:0:table/Venue_table/stream/x',
+                  'dynamodb': {'Keys': {'venue_id': {'S': 'v1'}}, 'SequenceNumber': '1'}}
+        upload.lambda_handler({'Records': [record]}, None)
+        # Another container notices the new generation on its next check
+        cache.venues._generation, cache.venues._checked_at = 0, 0.0
+        calls['GetItem'] = 0
+        event.get_venue_seat_info('v1')
+        print(f"after a Venue_table stream batch: {calls['GetItem']} GetItem on the next lookup (expected 1)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Overhead common.metrics adds to each client call, in the three states a call can be in:
+# metrics off (nothing is installed), on but the invocation not sampled, and sampled.
+# Stand-in Redis and DynamoDB calls take ~100 us and ~2 ms here and vary by more than the
+# overhead, so the wrappers are timed around a stub client and the botocore hooks are
+# called directly. Finishes with one sampled booking reservation against moto and
+# fakeredis to show the EMF lines it writes.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_metrics.py
+import argparse
+import json
+import time
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import clients, metrics, seat_state  # noqa: E402
+
+
+class StubRedis(object):
+    def execute_command(self, *args, **options):
+        return None
+
+    def pipeline(self, *args, **kwargs):
+        return self
+
+
+class StubModel(object):
+    name = 'GetItem'
+
+    class service_model(object):
+        service_name = 'dynamodb'
+
+
+class StubResponse(object):
+    status_code = 200
+
+
+def per_call_ns(fn, calls, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = (time.perf_counter() - started) / calls * 1e9
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def boto3_hooks():
+    context = {}
+    metrics.before_boto3_call(params={'TableName': 'Event_table'}, model=StubModel, context=context)
+    metrics.after_boto3_call(http_response=StubResponse, parsed={'Item': {}}, model=StubModel, context=context)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+    empty = per_call_ns(lambda: None, args.calls)
+
+    metrics.configure(sample_rate=0)
+    plain = metrics.instrument_redis(StubRedis())
+    base = per_call_ns(lambda: plain.execute_command('GET', 'k'), args.calls)
+    rows = [('off: record()', per_call_ns(lambda: metrics.record('redis', 'GET', 0.001), args.calls) - empty),
+            ('off: redis command', base - per_call_ns(lambda: StubRedis.execute_command(plain, 'GET', 'k'), args.calls))]
+
+    metrics.configure(sample_rate=1)
+    timed = metrics.instrument_redis(StubRedis())
+    for sampled in (False, True):
+        metrics._sampled = sampled
+        label = 'sampled' if sampled else 'unsampled'
+        rows.append((f"{label}: redis command", per_call_ns(lambda: timed.execute_command('GET', 'k'), args.calls) - base))
+        rows.append((f"{label}: botocore hooks", per_call_ns(boto3_hooks, args.calls) - empty))
+        metrics._samples.clear()
+    metrics._sampled = False
+
+    print(f"{'state: call':>26} {'added ns':>9}")
+    for name, ns in rows:
+        print(f"{name:>26} {max(ns, 0):>9.0f}")
+
+    with mock_aws():
+        local_stack.create_tables(boto3.client('dynamodb'))
+        redis_client = metrics.instrument_redis(local_stack.redis_standin())
+        seat_state.write(redis_client, 'bench', seat_state.build_layout(1, 10))
+        clients.override('redis', redis_client)
+        clients.override('dynamodb_client', metrics.instrument_boto3(boto3.client('dynamodb')))
+        # Imported with metrics on, so its lambda_handler is wrapped
+        import booking
+        event = {'httpMethod': 'POST', 'path': '/default/ticketmaster_booking/reserve',
+                 'body': json.dumps({'event_id': 'bench', 'ticket_ids': ['bench_A1', 'bench_A2']})}
+        print('\nEMF lines for one sampled reservation:')
+        booking.lambda_handler(event, None)
+
+
+if __name__ == '__main__':
+    main()
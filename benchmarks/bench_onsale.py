@@ -0,0 +1,219 @@
+# On-sale load test and correctness check. Runs the real event, booking and ticket
+# lambda_handlers in-process against moto (DynamoDB) and fakeredis, replaying an on-sale:
+# create the event, then thousands of virtual users browse the seat map, hold seats,
+# purchase them and read a ticket back. Reports latency percentiles and throughput per
+# route, then checks that no seat was sold twice and that the sharded available_tickets
+# counter agrees with Ticket_table. Exits non-zero if a check fails.
+#
+# moto serves one AWS call at a time; latencies leave out the time spent queued for it,
+# but with the GIL and a single process they are still an upper bound on service time.
+# Throughput is a regression signal for this machine, not a capacity figure.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_onsale.py --users 2000 --concurrency 200 --rows 20 --seats-per-row 50
+import argparse
+import base64
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import clients, seat_state, ticket_counter  # noqa: E402
+
+
+class Recorder(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def call(self, route, handler, event):
+        # Time queued behind other threads for the moto lock is not part of the latency
+        waited = local_stack.aws_lock_wait()
+        started = time.perf_counter()
+        response = handler(event, None)
+        elapsed = time.perf_counter() - started - (local_stack.aws_lock_wait() - waited)
+        with self.lock:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][response['statusCode']] += 1
+        return response['statusCode'], json.loads(response['body'])
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def available_ordinals(snapshot):
+    bitmap = base64.b64decode(snapshot['seat_state'])
+    ordinals = []
+    for ordinal in range(snapshot['layout']['seat_count']):
+        byte = bitmap[ordinal // 4] if ordinal // 4 < len(bitmap) else 0
+        if (byte >> (6 - 2 * (ordinal % 4))) & 3 == seat_state.AVAILABLE:
+            ordinals.append(ordinal)
+    return ordinals
+
+
+def ticket_id(event_id, layout, ordinal):
+    return f"{event_id}_{seat_state.seat_number(ordinal, layout)}"
+
+
+def virtual_user(recorder, handlers, event_id, args, rng):
+    # Returns (booking_id, ticket_ids) for a completed purchase, or None
+    for _ in range(args.attempts):
+        status, snapshot = recorder.call('browse seatmap', handlers['event'], {
+            'httpMethod': 'GET', 'path': '/default/ticketmaster_event',
+            'queryStringParameters': {'event_id': event_id, 'view': 'seatmap'}
+        })
+        if rng.random() < args.list_ratio:
+            recorder.call('browse list', handlers['event'], {
+                'httpMethod': 'GET', 'path': '/default/ticketmaster_event',
+                'queryStringParameters': {'event_id': event_id}
+            })
+        candidates = available_ordinals(snapshot)
+        if not candidates:
+            return None
+        ordinals = rng.sample(candidates, min(len(candidates), rng.randint(1, args.max_seats)))
+        ticket_ids = [ticket_id(event_id, snapshot['layout'], ordinal) for ordinal in ordinals]
+
+        status, held = recorder.call('hold', handlers['booking'], {
+            'httpMethod': 'POST', 'path': '/default/ticketmaster_booking/reserve',
+            'body': json.dumps({'event_id': event_id, 'ticket_ids': ticket_ids})
+        })
+        if status != 200:
+            continue
+        if args.think_ms:
+            time.sleep(rng.uniform(0, args.think_ms) / 1000.0)
+
+        status, purchased = recorder.call('purchase', handlers['booking'], {
+            'httpMethod': 'POST', 'path': '/default/ticketmaster_booking/purchase',
+            'headers': {'Idempotency-Key': str(uuid.uuid4())},
+            'body': json.dumps({'event_id': event_id, 'ticket_ids': ticket_ids, 'hold_token': held['hold_token']})
+        })
+        if status != 200:
+            continue
+        recorder.call('ticket read', handlers['ticket'], {
+            'httpMethod': 'GET', 'ticket_id': ticket_ids[0], 'queryStringParameters': {'ticket_id': ticket_ids[0]}
+        })
+        return purchased['booking_id'], ticket_ids
+    return None
+
+
+def check(event_id, seat_count, purchases):
+    # Returns a list of failed invariants
+    failures = []
+    sold_by_users = Counter(t for _, ticket_ids in purchases for t in ticket_ids)
+    double_sold = [t for t, count in sold_by_users.items() if count > 1]
+    if double_sold:
+        failures.append(f"{len(double_sold)} seats were sold to more than one user, e.g. {double_sold[:5]}")
+
+    ticket_table = boto3.resource('dynamodb').Table('Ticket_table')
+    booking_of = {}
+    scan = {'FilterExpression': 'event_id = :event_id', 'ExpressionAttributeValues': {':event_id': event_id}}
+    while True:
+        page = ticket_table.scan(**scan)
+        for item in page['Items']:
+            if item['ticket_status'] == 'sold':
+                booking_of[item['ticket_id']] = item.get('booking_id')
+        if 'LastEvaluatedKey' not in page:
+            break
+        scan['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    expected = {t: booking_id for booking_id, ticket_ids in purchases for t in ticket_ids}
+    if set(booking_of) != set(expected):
+        failures.append(f"Ticket_table has {len(booking_of)} sold seats but users completed {len(expected)}")
+    wrong_booking = [t for t in expected if t in booking_of and booking_of[t] != expected[t]]
+    if wrong_booking:
+        failures.append(f"{len(wrong_booking)} sold seats carry another purchase's booking_id")
+
+    available = ticket_counter.total(clients.get('dynamodb_client'), event_id, max_age=0)
+    if available != seat_count - len(booking_of):
+        failures.append(f"available_tickets is {available} across the counter shards, expected {seat_count - len(booking_of)}")
+
+    layout, bitmap = seat_state.snapshot(clients.get('redis'), event_id)
+    bitmap_sold = sum(1 for o in range(layout['seat_count'])
+                      if o // 4 < len(bitmap) and (bitmap[o // 4] >> (6 - 2 * (o % 4))) & 3 == seat_state.SOLD)
+    if bitmap_sold != len(booking_of):
+        failures.append(f"seat-state bitmap shows {bitmap_sold} sold seats, Ticket_table {len(booking_of)}")
+    return failures, len(booking_of)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000, help='virtual users in the on-sale')
+    parser.add_argument('--concurrency', type=int, default=100, help='users in flight at once')
+    parser.add_argument('--rows', type=int, default=20)
+    parser.add_argument('--seats-per-row', type=int, default=50)
+    parser.add_argument('--max-seats', type=int, default=4, help='seats per purchase, chosen uniformly from 1..N')
+    parser.add_argument('--attempts', type=int, default=3, help='hold attempts per user before giving up')
+    parser.add_argument('--list-ratio', type=float, default=0.0, help='share of browses that also read the full availability list')
+    parser.add_argument('--counter-shards', type=int, default=8, help='available-ticket counter shards for the event')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='max pause between hold and purchase')
+    parser.add_argument('--dynamodb-rtt-ms', type=float, default=0.0)
+    parser.add_argument('--redis-rtt-ms', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with mock_aws():
+        local_stack.create_tables(boto3.client('dynamodb'))
+        restore = local_stack.serialize_aws_calls(args.dynamodb_rtt_ms)
+        # One client stands in for every Lambda container, so it needs a connection per user thread
+        clients.override('redis', local_stack.redis_standin(rtt_ms=args.redis_rtt_ms, max_connections=args.concurrency + 10))
+        import booking
+        import event
+        import ticket
+        handlers = {'event': event.lambda_handler, 'booking': booking.lambda_handler, 'ticket': ticket.lambda_handler}
+        recorder = Recorder()
+
+        event_id = 'onsale'
+        seat_count = args.rows * args.seats_per_row
+        boto3.resource('dynamodb').Table('Venue_table').put_item(
+            Item={'venue_id': 'bench-venue', 'row_count': args.rows, 'seats_per_row': args.seats_per_row})
+        status, created = recorder.call('create event', handlers['event'], {
+            'httpMethod': 'POST', 'path': '/default/ticketmaster_event',
+            'body': json.dumps({'event_id': event_id, 'event_name': 'Bench On-sale', 'event_date': '2026-12-01',
+                                'venue_id': 'bench-venue', 'ticket_price': 120,
+                                'counter_shards': args.counter_shards})
+        })
+        assert status == 200, created
+
+        rng = random.Random(args.seed)
+        seeds = [rng.random() for _ in range(args.users)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            outcomes = list(executor.map(
+                lambda seed: virtual_user(recorder, handlers, event_id, args, random.Random(seed)), seeds))
+        elapsed = time.perf_counter() - started
+        purchases = [outcome for outcome in outcomes if outcome]
+
+        print(f"{args.users} users, {args.concurrency} concurrent, {seat_count} seats, {elapsed:.1f}s")
+        print(f"{'route':>15} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}  statuses")
+        for route, latencies in recorder.latencies.items():
+            latencies.sort()
+            rate = len(latencies) / elapsed if route != 'create event' else len(latencies) / latencies[-1]
+            statuses = ' '.join(f"{code}:{count}" for code, count in sorted(recorder.statuses[route].items()))
+            print(f"{route:>15} {len(latencies):>9} {rate:>8.1f} {percentile(latencies, 0.5) * 1000:>8.1f} "
+                  f"{percentile(latencies, 0.9) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f}  {statuses}")
+
+        failures, sold = check(event_id, seat_count, purchases)
+        restore()
+        print(f"{len(purchases)} purchases, {sold} of {seat_count} seats sold")
+        for failure in failures:
+            print(f"FAILED: {failure}")
+        if failures:
+            sys.exit(1)
+        print('OK: no seat sold twice; available_tickets, Ticket_table and seat state agree')
+
+
+if __name__ == '__main__':
+    main()
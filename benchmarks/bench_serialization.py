@@ -0,0 +1,83 @@
+# Compare the per-handler Decimal encoders this repo used with common.serialization on
+# availability-sized lists of ticket items and on DynamoDB stream images.
+#
+#   python benchmarks/bench_serialization.py --sizes 1000,10000
+import argparse
+import json
+import time
+from decimal import Decimal
+
+import local_stack
+
+local_stack.setup_env()
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer  # noqa: E402
+
+from common import serialization  # noqa: E402
+
+
+# The encoders being replaced, as they were in event.py and ticket.py / upload.py
+def decimal_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj) if obj % 1 else int(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+
+def make_tickets(count):
+    return [{
+        'ticket_id': f"bench_{n}",
+        'event_id': 'bench',
+        'event_name': 'Bench Night',
+        'event_date': '2026-12-01',
+        'venue_id': 'v1',
+        'venue_seat': f"A{n}",
+        'ticket_price': Decimal('120.50') if n % 3 else Decimal('80'),
+        'ticket_status': 'available'
+    } for n in range(count)]
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    deserializer = TypeDeserializer()
+    serializer = TypeSerializer()
+    print(f"{'items':>7} {'case':>45} {'ms':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        tickets = make_tickets(size)
+        images = [{k: serializer.serialize(v) for k, v in ticket.items()} for ticket in tickets]
+        assert json.loads(serialization.dumps_list(tickets, key='available_tickets')) == json.loads(json.dumps({'available_tickets': tickets}, cls=DecimalEncoder))
+        assert [serialization.from_item(image) for image in images] == json.loads(json.dumps(tickets, cls=DecimalEncoder))
+
+        cases = [
+            ('response: json.dumps(default=decimal_default)', lambda: json.dumps({'available_tickets': tickets}, default=decimal_default)),
+            ('response: json.dumps(cls=DecimalEncoder)', lambda: json.dumps({'available_tickets': tickets}, cls=DecimalEncoder)),
+            ('response: serialization.dumps', lambda: serialization.dumps({'available_tickets': tickets})),
+            ('response: serialization.dumps_list', lambda: serialization.dumps_list(tickets, key='available_tickets')),
+            ('stream: TypeDeserializer + DecimalEncoder', lambda: [json.dumps({k: deserializer.deserialize(v) for k, v in image.items()}, cls=DecimalEncoder) for image in images]),
+            ('stream: from_item + serialization.dumps', lambda: [serialization.dumps(serialization.from_item(image)) for image in images]),
+        ]
+        for name, fn in cases:
+            print(f"{size:>7} {name:>45} {best_of(fn, args.repeat):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Reading a cart of tickets: one ticket-lambda GET per seat (read_item) versus one
+# batch read (GET ?ticket_ids=... / POST /default/ticketmaster_ticket/batch) that
+# fetches them with parallel BatchGetItem calls and merges the live hold state.
+# `--invoke-ms` adds the API Gateway + Lambda overhead each separate request pays.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_ticket_batch.py --rtt-ms 5 --invoke-ms 20
+import argparse
+import json
+import time
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from common import clients, dynamo_batch, holds  # noqa: E402
+
+CART_SIZES = (8, 100, 500)
+
+
+def load_tickets(dynamodb_client, event_id, count):
+    requests = [dynamo_batch.put_request({
+        'ticket_id': f"{event_id}_{n}", 'event_id': event_id, 'seat_number': str(n), 'ticket_price': 80,
+        'venue_id': 'bench-venue', 'event_date': '2026-12-01', 'ticket_status': 'available', 'redis_status': 'non-exist'
+    }) for n in range(count)]
+    dynamo_batch.bulk_write(dynamodb_client, 'Ticket_table', requests)
+
+
+def per_seat(ticket, ticket_ids, invoke_ms):
+    tickets = []
+    for ticket_id in ticket_ids:
+        time.sleep(invoke_ms / 1000.0)
+        response = ticket.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {'ticket_id': ticket_id}}, None)
+        tickets.append(json.loads(response['body']))
+    return tickets
+
+
+def batched(ticket, ticket_ids, invoke_ms):
+    time.sleep(invoke_ms / 1000.0)
+    response = ticket.lambda_handler({'httpMethod': 'POST', 'path': '/default/ticketmaster_ticket/batch', 'body': json.dumps({
+        'ticket_ids': ticket_ids, 'fields': ['seat_number', 'ticket_price', 'ticket_status'], 'holds': True})}, None)
+    assert response['statusCode'] == 200, response
+    body = json.loads(response['body'])
+    assert not body['missing'], body['missing']
+    return body['tickets']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rtt-ms', type=float, default=5.0, help='simulated DynamoDB / Redis round-trip time')
+    parser.add_argument('--invoke-ms', type=float, default=20.0, help='API Gateway + Lambda overhead per request')
+    args = parser.parse_args()
+
+    with mock_aws():
+        dynamodb_client = boto3.client('dynamodb')
+        local_stack.create_tables(dynamodb_client)
+        load_tickets(dynamodb_client, 'bench', max(CART_SIZES))
+        redis_client = local_stack.redis_standin(rtt_ms=args.rtt_ms)
+        clients.override('redis', redis_client)
+        holds.hold(redis_client, 'bench', ['bench_0', 'bench_1'], 'cart', 300)
+        restore = local_stack.serialize_aws_calls(args.rtt_ms)
+        import ticket
+
+        print(f"{'cart':>5} {'per seat ms':>12} {'batch ms':>9} {'speedup':>8} {'held':>5}")
+        try:
+            for size in CART_SIZES:
+                ticket_ids = [f"bench_{n}" for n in range(size)]
+                started = time.perf_counter()
+                per_seat(ticket, ticket_ids, args.invoke_ms)
+                single_ms = (time.perf_counter() - started) * 1000
+                started = time.perf_counter()
+                tickets = batched(ticket, ticket_ids, args.invoke_ms)
+                batch_ms = (time.perf_counter() - started) * 1000
+                assert [t['ticket_id'] for t in tickets] == ticket_ids
+                held = sum(1 for t in tickets if t['held'])
+                print(f"{size:>5} {single_ms:>12.1f} {batch_ms:>9.1f} {single_ms / batch_ms:>7.1f}x {held:>5}")
+        finally:
+            restore()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Compare the original image worker (first S3 record of the first message, one put_item
+# each) with the batched worker_SQS handler on SQS batches of S3 notifications.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/bench_worker_ingest.py --rtt-ms 5
+import argparse
+import json
+import time
+
+import local_stack
+
+local_stack.setup_env()
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+
+def s3_record(key, event_name, sequencer):
+    return {
+        'eventName': event_name,
+        'eventTime': '2024-01-01T00:00:00.000Z',
+        's3': {'bucket': {'name': 'bench-images'}, 'object': {'key': key, 'sequencer': f"{sequencer:016X}"}}
+    }
+
+
+def make_batch(messages, records_per_message, start):
+    batch = []
+    for m in range(messages):
+        records = [s3_record(f"events/bench/{start + m * records_per_message + r}.jpg", 'ObjectCreated:Put', start + m * records_per_message + r)
+                   for r in range(records_per_message)]
+        batch.append({'messageId': f"msg-{start + m}", 'body': json.dumps({'Records': records})})
+    return batch
+
+
+def legacy_handler(worker_SQS, image_table, event):
+    # The original handler wrote every record with its own put_item call
+    for message in event['Records']:
+        for record in json.loads(message['body'])['Records']:
+            image_table.put_item(Item=worker_SQS.image_item(record))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=10, help='SQS batch size')
+    parser.add_argument('--records', type=int, default=10, help='S3 records per message')
+    parser.add_argument('--rtt-ms', type=float, default=5.0, help='simulated DynamoDB round-trip time')
+    args = parser.parse_args()
+
+    with mock_aws():
+        local_stack.create_tables(boto3.client('dynamodb'))
+        import worker_SQS
+        local_stack.add_latency(worker_SQS.dynamodb_client, args.rtt_ms)
+        image_table = boto3.resource('dynamodb').Table('Image_table')
+        local_stack.add_latency(image_table.meta.client, args.rtt_ms)
+        per_batch = args.messages * args.records
+
+        print(f"{'path':>8} {'records':>8} {'seconds':>9} {'records/s':>10} {'speedup':>8}")
+        results = {}
+        for path in ('legacy', 'batched'):
+            started = time.perf_counter()
+            for b in range(args.batches):
+                event = {'Records': make_batch(args.messages, args.records, b * per_batch)}
+                if path == 'legacy':
+                    legacy_handler(worker_SQS, image_table, event)
+                else:
+                    assert worker_SQS.lambda_handler(event, None) == {'batchItemFailures': []}
+            results[path] = time.perf_counter() - started
+
+        total = args.batches * per_batch
+        count = image_table.scan(Select='COUNT')['Count']
+        assert count == total, count
+        for path, seconds in results.items():
+            speedup = f"{results['legacy'] / seconds:>7.1f}x" if path != 'legacy' else ''
+            print(f"{path:>8} {total:>8} {seconds:>9.3f} {total / seconds:>10.0f} {speedup:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Local stand-ins for Redis and the AWS services the lambdas use, so handlers can be
+# exercised in-process without an AWS account. Redis is served by fakeredis and
+# DynamoDB/SQS by moto (see benchmarks/requirements.txt).
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_ROOT = os.path.join(ROOT, 'lambdas')
+LAMBDA_DIRS = ['booking', 'event', 'image', 'ticket', 'worker']
+
+def setup_paths():
+    for path in [LAMBDA_ROOT] + [os.path.join(LAMBDA_ROOT, name) for name in LAMBDA_DIRS]:
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def setup_env():
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ.setdefault('REDIS_HOST', 'localhost')
+    setup_paths()
+
+
+def redis_standin(rtt_ms=0.0, server=None, max_connections=100):
+    # Every packed send is one network round trip (a pipeline sends once), so sleeping
+    # there models the RTT to ElastiCache and counts round trips.
+    # fakeredis is imported here so importing this module leaves redis unloaded
+    # (bench_cold_start reports what each handler imports)
+    import fakeredis
+    stats = {'round_trips': 0}
+    # fakeredis does not export its connection class under a stable name
+    connection_class = fakeredis.FakeStrictRedis().connection_pool.connection_class
+
+    class LatencyConnection(connection_class):
+        def send_packed_command(self, command, check_health=True):
+            stats['round_trips'] += 1
+            if rtt_ms:
+                time.sleep(rtt_ms / 1000.0)
+            return super().send_packed_command(command, check_health)
+
+    client = fakeredis.FakeStrictRedis(server=server or fakeredis.FakeServer(), connection_class=LatencyConnection,
+                                      max_connections=max_connections)
+    client.stats = stats
+    return client
+
+
+def add_latency(client, rtt_ms):
+    # moto answers in-process; sleep before every call to model the service round trip
+    def sleep(**kwargs):
+        time.sleep(rtt_ms / 1000.0)
+
+    if rtt_ms:
+        client.meta.events.register('before-call.*.*', sleep)
+    return client
+
+
+_aws_wait = threading.local()
+
+
+def aws_lock_wait():
+    # Seconds the calling thread has spent queued for serialize_aws_calls' lock
+    return getattr(_aws_wait, 'seconds', 0.0)
+
+
+def serialize_aws_calls(rtt_ms=0.0):
+    # moto's in-memory backends are not thread safe; run one AWS call at a time. The
+    # simulated round trip is spent outside the lock so concurrent callers still overlap,
+    # and the time spent queued for the lock is tracked so harnesses can leave it out.
+    from botocore.client import BaseClient
+    lock = threading.Lock()
+    make_api_call = BaseClient._make_api_call
+
+    def locked_call(self, operation_name, api_params):
+        if rtt_ms:
+            time.sleep(rtt_ms / 1000.0)
+        queued = time.perf_counter()
+        with lock:
+            _aws_wait.seconds = aws_lock_wait() + time.perf_counter() - queued
+            return make_api_call(self, operation_name, api_params)
+
+    BaseClient._make_api_call = locked_call
+    return lambda: setattr(BaseClient, '_make_api_call', make_api_call)
+
+
+def index(name, hash_key, range_key=None):
+    key_schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    if range_key:
+        key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+    return {'IndexName': name, 'KeySchema': key_schema, 'Projection': {'ProjectionType': 'ALL'}}
+
+
+# Table name -> (hash key, global secondary indexes); all key attributes are strings
+TABLES = {
+    'Event_table': ('event_id', []),
+    'Event_counter_table': ('shard_id', []),
+    'Venue_table': ('venue_id', []),
+    'Booking_table': ('booking_id', []),
+    'Image_table': ('image_id', [
+        index('event_id-event_time-index', 'event_id', 'event_time'),
+        index('image_prefix-image_id-index', 'image_prefix', 'image_id')
+    ]),
+    'Idempotency_table': ('idempotency_key', []),
+    'Ticket_table': ('ticket_id', [index('event_id-ticket_status-index', 'event_id', 'ticket_status')]),
+}
+
+
+def create_tables(dynamodb_client):
+    for name, (key, indexes) in TABLES.items():
+        attributes = {key}
+        for gsi in indexes:
+            attributes.update(k['AttributeName'] for k in gsi['KeySchema'])
+        params = {
+            'TableName': name,
+            'KeySchema': [{'AttributeName': key, 'KeyType': 'HASH'}],
+            'AttributeDefinitions': [{'AttributeName': a, 'AttributeType': 'S'} for a in sorted(attributes)],
+            'BillingMode': 'PAY_PER_REQUEST'
+        }
+        if indexes:
+            params['GlobalSecondaryIndexes'] = indexes
+        dynamodb_client.create_table(**params)
@@ -3,6 +3,9 @@
 # Set necessary variables
 LAMBDA_FUNCTION_PREFIX="ticketmaster_"  # prefix for Lambda function names
 
+# Shared modules imported by every lambda (lambdas/common in this repo)
+COMMON_DIR="${COMMON_DIR:-$(dirname "$0")/lambdas/common}"
+
 # First positional argument is the Python file to deploy (e.g. event.py)
 FILE_NAME=$1
 
@@ -28,6 +31,9 @@ cp $FILE_NAME lambda_function.py
 # Include lambda_function.py and Redis-related folders when creating the zip
 zip -r $ZIP_FILE lambda_function.py redis redis-3.5.3.dist-info
 
+# Add the shared modules under common/ so `from common import ...` resolves
+(cd "$(dirname "$COMMON_DIR")" && zip -r "$OLDPWD/$ZIP_FILE" "$(basename "$COMMON_DIR")" -x "*/__pycache__/*")
+
 # Update Lambda function code
 aws lambda update-function-code --function-name $LAMBDA_FUNCTION_NAME --zip-file fileb://$ZIP_FILE
 
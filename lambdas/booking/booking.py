@@ -1,126 +1,340 @@
 import json
-import boto3
-import redis
-import time
 import uuid
-from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 import os
 
-# DynamoDB client
-dynamodb = boto3.client('dynamodb')
+from common import cache, clients, holds, idempotency, metrics, orders, purchase, seat_finder, seat_state, waiting_room
 
-# Redis connection: host configurable via `REDIS_HOST` environment variable
-REDIS_HOST = os.environ.get('REDIS_HOST', 'redis-ticket-if7udi.serverless.usw2.cache.amazonaws.com')
-redis_client = redis.StrictRedis(
-    host=REDIS_HOST,
-    port=int(os.environ.get('REDIS_PORT', 6379)), 
-    db=0,
-    ssl=bool(os.environ.get('REDIS_SSL', True))
-)
+# DynamoDB client and Redis connection, created on first use (see common.clients)
+dynamodb = clients.lazy('dynamodb_client')
+redis_client = clients.lazy('redis')
+sqs = clients.lazy('sqs')
 
-def reserve_ticket(event):
+# How long a seat hold lasts before it expires
+HOLD_SECONDS = int(os.environ.get('HOLD_SECONDS', 300))
+# Fresh searches after another buyer holds the chosen block first
+BEST_AVAILABLE_ATTEMPTS = 3
+# Queue every purchase (202 + order id); when off, a request can still opt in with "async"
+ASYNC_PURCHASE = os.environ.get('ASYNC_PURCHASE', 'false').lower() == 'true'
 
+def parse_hold_request(event):
+    # Returns (event_id, ticket_ids, token, error_response)
     body = json.loads(event['body'])
-    ticket_ids = body.get('ticket_ids', [])
+    ticket_ids = list(dict.fromkeys(body.get('ticket_ids', [])))
+    if not ticket_ids:
+        return None, None, None, {
+            'statusCode': 400,
+            'body': json.dumps({'error':'No ticket_ids found in request body'})
+        }
+    event_ids = {seat_state.ticket_event_id(ticket_id) for ticket_id in ticket_ids}
+    event_id = body.get('event_id') or next(iter(event_ids))
+    if event_ids != {event_id}:
+        return None, None, None, {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'All ticket_ids must belong to one event'})
+        }
+    error = invalid_seats_response(event_id, ticket_ids)
+    if error:
+        return None, None, None, error
+    return event_id, ticket_ids, body.get('hold_token'), None
+
+def invalid_seats_response(event_id, ticket_ids):
+    # Seats outside the venue layout are refused before they reach the seat-state bitmap
+    try:
+        seat_state.with_layout(redis_client, event_id,
+                               lambda layout: seat_state.ticket_ordinals(event_id, ticket_ids, layout) if layout else None)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid ticket_ids', 'details': str(e)})}
+    return None
 
-    if ticket_ids:
-        for ticket_id in ticket_ids:
-            redis_client.setex(ticket_id, 300, 'reserved')
+def closed_event_response(event_id):
+    # Events being deleted take no new holds or purchases; the stream retires cached
+    # event items, so this holds within the cache's generation check
+    event_item = cache.event(event_id)
+    if event_item and event_item.get('deletion_status'):
+        return {'statusCode': 409, 'body': json.dumps({'error': 'Event is being deleted', 'event_id': event_id})}
+    return None
 
+def not_admitted_response(event_id):
+    return {
+        'statusCode': 403,
+        'body': json.dumps({'error': 'Admission required; join the waiting room first', 'event_id': event_id})
+    }
+
+def reserve_ticket(event):
+    event_id, ticket_ids, token, error = parse_hold_request(event)
+    if error:
+        return error
+    if not waiting_room.is_admitted(redis_client, event, event_id):
+        return not_admitted_response(event_id)
+    closed = closed_event_response(event_id)
+    if closed:
+        return closed
+    token = token or str(uuid.uuid4())
+
+    held, conflicts, expires_at_ms = holds.hold(redis_client, event_id, ticket_ids, token, HOLD_SECONDS)
+    if not held:
         return {
-            'statusCode': 200,
-            'body': json.dumps({'message': 'Tickets saved in Redis for 5 minutes'})
+            'statusCode': 409,
+            'body': json.dumps({
+                'error': 'Some tickets are not available',
+                'conflicts': [{'ticket_id': ticket_id, 'reason': reason} for ticket_id, reason in conflicts.items()]
+            })
         }
-    else:
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': f'Tickets held for {HOLD_SECONDS} seconds',
+            'hold_token': token,
+            'expires_at': expires_at_ms,
+            'ticket_ids': ticket_ids
+        })
+    }
+
+def best_available(event):
+    # Finds the best block of adjacent free seats server-side and, with "hold": true,
+    # holds it in the same request. Optional filters: section / sections, max_price,
+    # min_row and max_row (row labels).
+    body = json.loads(event['body'])
+    event_id = body.get('event_id')
+    try:
+        quantity = int(body.get('quantity') or 0)
+    except (TypeError, ValueError):
+        quantity = 0
+    if not event_id or quantity < 1:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'event_id and a positive quantity are required'})}
+    if body.get('hold') and not waiting_room.is_admitted(redis_client, event, event_id):
+        return not_admitted_response(event_id)
+    closed = closed_event_response(event_id) if body.get('hold') else None
+    if closed:
+        return closed
+    try:
+        max_price = float(body['max_price']) if body.get('max_price') is not None else None
+    except (TypeError, ValueError):
+        return {'statusCode': 400, 'body': json.dumps({'error': 'max_price must be a number'})}
+    for row in (body.get('min_row'), body.get('max_row')):
+        if row and (not isinstance(row, str) or row.strip(seat_state.ROW_LETTERS)):
+            return {'statusCode': 400, 'body': json.dumps({'error': 'min_row and max_row must be row labels such as A or AB'})}
+    sections = body.get('sections') or ([body['section']] if body.get('section') else None)
+    first_row = seat_state.row_index(body['min_row']) if body.get('min_row') else 0
+    last_row = seat_state.row_index(body['max_row']) if body.get('max_row') else None
+    token = body.get('hold_token') or str(uuid.uuid4())
+
+    layout, bitmap = seat_state.snapshot(redis_client, event_id)
+    if layout is None:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'Event not found', 'event_id': event_id})}
+    row_ranges = seat_finder.section_rows(layout, sections, max_price)
+    if row_ranges is None and sections:
+        row_ranges = []
+    elif row_ranges is None and max_price is not None:
+        # One price for the whole event
+        event_item = cache.event(event_id) or {}
+        if event_item.get('ticket_price', 0) > max_price:
+            row_ranges = []
+    if row_ranges == []:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'No section matches the requested sections and max_price', 'event_id': event_id})}
+    for _ in range(BEST_AVAILABLE_ATTEMPTS):
+        ordinals = seat_finder.find(bitmap, layout, quantity, first_row, last_row, row_ranges)
+        if ordinals is None:
+            return {'statusCode': 404, 'body': json.dumps({'error': f'No {quantity} adjacent seats available', 'event_id': event_id})}
+        ticket_ids = seat_state.ordinal_ticket_ids(event_id, ordinals, layout)
+        section = seat_state.section_of(ordinals[0] // layout['seats_per_row'], layout)
+        if not body.get('hold'):
+            return {'statusCode': 200, 'body': json.dumps({'event_id': event_id, 'ticket_ids': ticket_ids, 'section': section})}
+        held, conflicts, expires_at_ms = holds.hold(redis_client, event_id, ticket_ids, token, HOLD_SECONDS)
+        if held:
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': f'Tickets held for {HOLD_SECONDS} seconds',
+                    'hold_token': token,
+                    'expires_at': expires_at_ms,
+                    'event_id': event_id,
+                    'ticket_ids': ticket_ids,
+                    'section': section
+                })
+            }
+        # Someone held part of the block first; the hold script already updated the bitmap
+        layout, bitmap = seat_state.snapshot(redis_client, event_id)
+    return {'statusCode': 409, 'body': json.dumps({'error': 'Seats were taken while holding; try again', 'event_id': event_id})}
+
+def extend_hold(event):
+    event_id, ticket_ids, token, error = parse_hold_request(event)
+    if error:
+        return error
+    if not token:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'hold_token is required'})}
+
+    extended, missing, expires_at_ms = holds.extend(redis_client, event_id, ticket_ids, token, HOLD_SECONDS)
+    if not extended:
         return {
-            'statusCode': 400,
-            'body': json.dumps({'error':'No ticket_ids found in request body for reserve ticket'})
+            'statusCode': 409,
+            'body': json.dumps({'error': 'Tickets are not held by this hold_token', 'ticket_ids': list(missing)})
         }
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Hold extended', 'hold_token': token, 'expires_at': expires_at_ms, 'ticket_ids': ticket_ids})
+    }
 
-def complete_purchase_ticket(event):
+def release_hold(event):
+    event_id, ticket_ids, token, error = parse_hold_request(event)
+    if error:
+        return error
+    if not token:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'hold_token is required'})}
+
+    released = holds.release(redis_client, event_id, ticket_ids, token)
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Hold released', 'released': released})
+    }
+
+def complete_purchase_ticket(event, booking_id=None):
     body = json.loads(event['body'])
     ticket_ids = body.get('ticket_ids', [])
     event_id = body.get('event_id')
-    
-    # ticket_ids printed for debugging removed
+    hold_token = body.get('hold_token')
+
     if not ticket_ids:
         return {
             'statusCode' : 400,
             'body' : json.dumps({'error' : 'No ticket_ids found in request'})
         }
-    
-    booking_id = str(uuid.uuid4())
+    if not event_id or not hold_token:
+        return {
+            'statusCode' : 400,
+            'body' : json.dumps({'error' : 'event_id and hold_token are required'})
+        }
+    error = invalid_seats_response(event_id, ticket_ids)
+    if error:
+        return error
 
-    created_at = str(int(time.time()))
+    if not waiting_room.is_admitted(redis_client, event, event_id):
+        return not_admitted_response(event_id)
+    closed = closed_event_response(event_id)
+    if closed:
+        return closed
 
-    update_expression = "SET ticket_status=:status"
-    expression_values = {
-        ':status': {'S': 'sold'},
-        ':current_status': {'S': 'available'}
-    }
+    # Clients cannot opt out of the queue that paces DynamoDB writes
+    if ASYNC_PURCHASE or body.get('async'):
+        return queue_purchase(event_id, ticket_ids, hold_token, order_id=booking_id)
 
-    transact_items = []
-
-    for ticket_id in ticket_ids:
-        transact_items.append({
-            'Update': {
-                'TableName' : 'Ticket_table',
-                'Key' : {
-                    'ticket_id': {'S' : ticket_id}
-                },
-                'UpdateExpression' : update_expression,
-                'ConditionExpression': "ticket_status = :current_status",
-                'ExpressionAttributeValues' : expression_values
-            }
-        })
-    
-    # transact_items debug output removed
-
-    transact_items.append({
-                'Put': {
-            'TableName' : 'Booking_table',
-            'Item' : {
-                'booking_id': {'S': booking_id},
-                'booking_status': {'S': 'purchase complete'},
-                'ticket_ids': {'L': [{'S': ticket_id} for ticket_id in ticket_ids]},  # List of ticket IDs
-                'createdAt': {'N': created_at}
-            }
-        }
-    })
-    ticket_count = len(ticket_ids)
-
-    transact_items.append({
-        'Update': {
-            'TableName' : 'Event_table',
-            'Key' : {
-                'event_id' : {'S' : event_id}
-            },
-            'UpdateExpression' : "SET available_tickets = available_tickets - :count",
-            'ConditionExpression' : "available_tickets >= :count",
-            'ExpressionAttributeValues' : {
-                        ':count': {'N': str(ticket_count)}
-                    }
+    try:
+        result = purchase.purchase(dynamodb, redis_client, event_id, ticket_ids, hold_token, booking_id=booking_id)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body' : json.dumps({'error' : 'Transaction failed', 'code': e.response.get('Error', {}).get('Code')})
         }
-    })
-    # transact_items debug output removed
 
-    try:
-        dynamodb.transact_write_items(TransactItems= transact_items)
+    if result['status'] == 'complete':
+        if waiting_room.is_active(redis_client, event_id):
+            waiting_room.record(redis_client, event_id, 'purchased')
+        return {
+            'statusCode' : 200,
+            'body' : json.dumps({'message' : 'complete booking tickets', 'booking_id' : result['booking_id']})
+        }
+    if result['status'] == 'not_held' and booking_id and orders.booking_exists(dynamodb, booking_id):
+        # A retry of a purchase that committed but whose response was never recorded;
+        # the holds went with the commit
         return {
             'statusCode' : 200,
             'body' : json.dumps({'message' : 'complete booking tickets', 'booking_id' : booking_id})
         }
-    except Exception as e:
-        # transaction failure details returned in response
+    # Tell the client which seats were lost so it only replaces those
+    retry_ticket_ids = [ticket_id for ticket_id, outcome in result['results'].items() if outcome != purchase.HELD]
+    return {
+        'statusCode': 409,
+        'body': json.dumps({
+            'error': 'Tickets are not held by this hold_token' if result['status'] == 'not_held' else 'Some tickets could not be purchased',
+            'results': [{'ticket_id': ticket_id, 'result': outcome} for ticket_id, outcome in result['results'].items()],
+            'retry_ticket_ids': retry_ticket_ids
+        })
+    }
+
+
+def queue_purchase(event_id, ticket_ids, hold_token, order_id=None):
+    # Checks the hold now and stretches it to outlive the queue wait; worker_purchase
+    # does the DynamoDB writes at the rate it is configured for
+    if not orders.QUEUE_URL:
+        # Checked before the claim, so a misconfigured lambda leaves holds and orders alone
+        return {'statusCode': 503, 'body': json.dumps({'error': 'PURCHASE_QUEUE_URL is not configured'})}
+    order_id = order_id or str(uuid.uuid4())
+    ticket_ids = list(dict.fromkeys(ticket_ids))
+    claimed, missing = holds.claim(redis_client, event_id, ticket_ids, hold_token, orders.ORDER_HOLD_SECONDS)
+    if not claimed:
+        return {
+            'statusCode': 409,
+            'body': json.dumps({
+                'error': 'Tickets are not held by this hold_token',
+                'results': [{'ticket_id': ticket_id, 'result': missing.get(ticket_id, purchase.HELD)} for ticket_id in ticket_ids],
+                'retry_ticket_ids': [ticket_id for ticket_id in ticket_ids if ticket_id in missing]
+            })
+        }
+    orders.write_status(redis_client, order_id, orders.QUEUED, event_id=event_id, ticket_ids=ticket_ids)
+    try:
+        orders.enqueue(sqs, {'order_id': order_id, 'event_id': event_id, 'ticket_ids': ticket_ids, 'hold_token': hold_token})
+    except ClientError as e:
+        redis_client.delete(orders.status_key(order_id))
         return {
             'statusCode': 500,
-            'body' : json.dumps({'error' : 'Transaction failed', 'details': str(e)})
+            'body': json.dumps({'error': 'Could not queue the order', 'code': e.response.get('Error', {}).get('Code')})
         }
+    return {
+        'statusCode': 202,
+        'body': json.dumps({'message': 'Order queued', 'order_id': order_id, 'status': orders.QUEUED})
+    }
 
-    
+def order_status(event):
+    order_id = (event.get('queryStringParameters') or {}).get('order_id')
+    if not order_id:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'order_id is required'})}
+    record = orders.read_status(redis_client, order_id)
+    if record is None and orders.booking_exists(dynamodb, order_id):
+        # The status record expired; the booking is the durable outcome
+        record = {'order_id': order_id, 'status': orders.COMPLETE, 'booking_id': order_id}
+    if record is None:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'Order not found'})}
+    return {'statusCode': 200, 'body': json.dumps(record)}
 
 
+def join_queue(event):
+    body = json.loads(event['body'])
+    event_id = body.get('event_id')
+    if not event_id:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'event_id is required'})}
+    visitor_id, _ = waiting_room.join(redis_client, event_id, body.get('visitor_id'))
+    return {'statusCode': 200, 'body': json.dumps(waiting_room.status(redis_client, event_id, visitor_id))}
+
+def queue_status(event):
+    params = event.get('queryStringParameters') or {}
+    if not params.get('event_id') or not params.get('visitor_id'):
+        return {'statusCode': 400, 'body': json.dumps({'error': 'event_id and visitor_id are required'})}
+    result = waiting_room.status(redis_client, params['event_id'], params['visitor_id'])
+    if result is None:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'Visitor not found in the waiting room'})}
+    return {'statusCode': 200, 'body': json.dumps(result)}
+
+def idempotent_purchase(event):
+    # Retries carrying the same Idempotency-Key get the recorded response back
+    key = idempotency.request_key(event)
+    if not key:
+        return complete_purchase_ticket(event)
+    # Refused admissions are answered before the key is taken, so they are never replayed
+    event_id = json.loads(event['body']).get('event_id')
+    if event_id and not waiting_room.is_admitted(redis_client, event, event_id):
+        return not_admitted_response(event_id)
+    return idempotency.run(
+        redis_client,
+        dynamodb,
+        'purchase',
+        key,
+        idempotency.fingerprint(event.get('body')),
+        lambda: complete_purchase_ticket(event, booking_id=idempotency.derived_id('purchase', key))
+    )
 
+
+@metrics.handler('booking')
 def lambda_handler(event, context):
     
     path = event['path']  
@@ -129,8 +343,26 @@ def lambda_handler(event, context):
     if path == "/default/ticketmaster_booking/reserve" and http_method == "POST":
         return reserve_ticket(event)
     
+    elif path == "/default/ticketmaster_booking/best-available" and http_method == "POST":
+        return best_available(event)
+
+    elif path == "/default/ticketmaster_booking/extend" and http_method == "POST":
+        return extend_hold(event)
+
+    elif path == "/default/ticketmaster_booking/release" and http_method == "POST":
+        return release_hold(event)
+
     elif path == "/default/ticketmaster_booking/purchase" and http_method == "POST":
-        return complete_purchase_ticket(event)
+        return idempotent_purchase(event)
+
+    elif path == "/default/ticketmaster_booking/order" and http_method == "GET":
+        return order_status(event)
+
+    elif path == "/default/ticketmaster_booking/queue/join" and http_method == "POST":
+        return join_queue(event)
+
+    elif path == "/default/ticketmaster_booking/queue/status" and http_method == "GET":
+        return queue_status(event)
     
     else:
         return {
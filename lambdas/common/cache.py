@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from common import clients, serialization
+
+# In-process cache for metadata that rarely changes (venue layouts, event items), shared
+# by every lambda that imports it. Entries expire after a TTL and the least recently
+# used are evicted past max_entries. Concurrent misses on one key wait for a single
+# DynamoDB read. The stream indexer (upload.py) bumps a per-cache generation in Redis
+# whenever the table changes; warm containers check it at most once per
+# GENERATION_CHECK_SECONDS and drop everything they hold when it moves.
+#
+#   venue = cache.venue(venue_id)   # plain dict, or None; do not mutate
+MAX_ENTRIES = int(os.environ.get('METADATA_CACHE_MAX_ENTRIES', 1024))
+VENUE_TTL_SECONDS = float(os.environ.get('VENUE_CACHE_TTL_SECONDS', 300))
+EVENT_TTL_SECONDS = float(os.environ.get('EVENT_CACHE_TTL_SECONDS', 60))
+GENERATION_CHECK_SECONDS = 1.0
+# Longest a caller waits on another thread's read before doing its own
+LOAD_WAIT_SECONDS = 5.0
+
+
+class Cache(object):
+    def __init__(self, name, ttl_seconds, max_entries=MAX_ENTRIES):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.generation_key = f"cache:{name}:generation"
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._checked_at = 0.0
+
+    def generation(self):
+        now = time.monotonic()
+        if now - self._checked_at < GENERATION_CHECK_SECONDS:
+            return self._generation
+        self._checked_at = now
+        try:
+            value = int(clients.get('redis').get(self.generation_key) or 0)
+        except Exception:
+            # Best effort; entries still expire after their TTL
+            return self._generation
+        with self._lock:
+            if value != self._generation:
+                self._entries.clear()
+                self._generation = value
+        return self._generation
+
+    def get(self, key, loader):
+        # loader() returns the value, or None for a missing item (not cached)
+        generation = self.generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+            flight = self._loading.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._loading[key] = {'done': threading.Event(), 'value': None, 'ok': False}
+
+        if not leader:
+            if flight['done'].wait(LOAD_WAIT_SECONDS) and flight['ok']:
+                return flight['value']
+            return loader()
+
+        try:
+            value = loader()
+            flight['value'], flight['ok'] = value, True
+            with self._lock:
+                # An invalidation that landed during the read makes the value suspect
+                if value is not None and generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            flight['done'].set()
+
+    def discard(self, key):
+        # Local only; for writes made by this container
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, redis_client=None):
+        # Retires the cache in every container
+        redis_client = redis_client if redis_client is not None else clients.get('redis')
+        value = int(redis_client.incr(self.generation_key))
+        with self._lock:
+            self._entries.clear()
+            self._generation = value
+            self._checked_at = time.monotonic()
+
+
+venues = Cache('venue', VENUE_TTL_SECONDS)
+events = Cache('event', EVENT_TTL_SECONDS)
+# Stream source table -> cache it retires
+TABLE_CACHES = {'Venue_table': venues, 'Event_table': events}
+# Progress counters written many times per bulk load or deletion; changes to them alone
+# do not retire a cache
+BOOKKEEPING_FIELDS = {'Event_table': {'ticket_load_checkpoint', 'tickets_deleted'}}
+
+
+def load_item(table_name, key_name, key):
+    item = clients.get('dynamodb_client').get_item(TableName=table_name, Key={key_name: {'S': key}}).get('Item')
+    return serialization.from_item(item) if item else None
+
+
+def venue(venue_id):
+    return venues.get(venue_id, lambda: load_item('Venue_table', 'venue_id', venue_id))
+
+
+def event(event_id):
+    return events.get(event_id, lambda: load_item('Event_table', 'event_id', event_id))
+
+
+def stream_table(record):
+    # arn:aws:dynamodb:<region>:<account>:table/<name>/stream/<label>
+    arn = record.get('eventSourceARN', '')
+    return arn.split(':table/', 1)[1].split('/', 1)[0] if ':table/' in arn else None
+
+
+def changes_cached_item(record, table_name):
+    event_name = record.get('eventName')
+    if event_name == 'INSERT':
+        # Missing items are never cached
+        return False
+    if event_name != 'MODIFY':
+        return True
+    new_image = record.get('dynamodb', {}).get('NewImage')
+    old_image = record.get('dynamodb', {}).get('OldImage')
+    ignored = BOOKKEEPING_FIELDS.get(table_name, set())
+    if new_image is not None and old_image is not None:
+        return ({k: v for k, v in new_image.items() if k not in ignored}
+                != {k: v for k, v in old_image.items() if k not in ignored})
+    # NEW_IMAGE streams: checkpoints of a ticket load in progress; the write that
+    # completes the load still retires the cache
+    return not (new_image and new_image.get('ticket_load_status') == {'S': 'loading'}
+                and 'deletion_status' not in new_image)
+
+
+def invalidate_for_records(records, redis_client=None):
+    # Bumps the generation of every cache whose table has a meaningful change in a stream
+    # batch. Records without a source ARN are taken to be Event_table's, the indexer's
+    # own stream.
+    tables = set()
+    for record in records:
+        table_name = stream_table(record) or 'Event_table'
+        if table_name not in tables and changes_cached_item(record, table_name):
+            tables.add(table_name)
+    for table_name in tables:
+        if table_name in TABLE_CACHES:
+            TABLE_CACHES[table_name].invalidate(redis_client)
+    return sorted(tables & set(TABLE_CACHES))
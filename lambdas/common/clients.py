@@ -0,0 +1,125 @@
+import os
+import threading
+
+from common import metrics
+
+# Process-wide SDK clients, created on first use and reused by warm invocations. Importing
+# boto3 or redis and building a client costs hundreds of milliseconds on a cold start, so
+# nothing is created until a route actually needs it. Handlers keep module-level names for
+# their clients, bound to lazy handles:
+#
+#   event_table = clients.table('Event_table')
+#   redis_client = clients.lazy('redis')
+#
+# override() swaps in a stand-in (fakeredis, a stubbed client) before or after first use.
+REDIS_HOST = os.environ.get('REDIS_HOST', 'redis-ticket-if7udi.serverless.usw2.cache.amazonaws.com')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+REDIS_SSL = bool(os.environ.get('REDIS_SSL', True))
+# One pool per container, shared by the threads of bulk loads and workers; a thread waits
+# up to REDIS_POOL_TIMEOUT for a free connection rather than failing past the limit
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 2))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 1))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 1))
+# Retries of a command that hit a dropped connection or a timeout (failovers, scaling);
+# every hold script is safe to repeat. With redis-py 3.5 only one retry on timeout.
+REDIS_RETRIES = int(os.environ.get('REDIS_RETRIES', 2))
+
+_instances = {}
+_lock = threading.RLock()
+
+
+def create_redis():
+    import redis
+    options = {}
+    try:
+        # redis-py 4+; deploy_lambda.sh bundles 3.5, which retries a timed-out command once
+        from redis.backoff import ExponentialBackoff
+        from redis.retry import Retry
+        options['retry'] = Retry(ExponentialBackoff(cap=0.5, base=0.02), REDIS_RETRIES)
+        options['retry_on_error'] = [redis.ConnectionError, redis.TimeoutError]
+    except ImportError:
+        options['retry_on_timeout'] = REDIS_RETRIES > 0
+    pool = redis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=0,
+        connection_class=redis.SSLConnection if REDIS_SSL else redis.Connection,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=30,
+        **options
+    )
+    return metrics.instrument_redis(redis.StrictRedis(connection_pool=pool))
+
+
+def create_boto3(kind, service):
+    import boto3
+    return metrics.instrument_boto3(getattr(boto3, kind)(service))
+
+
+FACTORIES = {
+    'dynamodb': lambda: create_boto3('resource', 'dynamodb'),
+    # Low-level client for batch and transactional writes (takes typed attribute values)
+    'dynamodb_client': lambda: create_boto3('client', 'dynamodb'),
+    'sqs': lambda: create_boto3('client', 'sqs'),
+    's3': lambda: create_boto3('client', 's3'),
+    'redis': create_redis,
+}
+
+
+def create(name):
+    if name.startswith('table:'):
+        return get('dynamodb').Table(name[len('table:'):])
+    return FACTORIES[name]()
+
+
+def get(name):
+    instance = _instances.get(name)
+    if instance is None:
+        # Handlers may first touch a client from worker threads
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = create(name)
+    return instance
+
+
+class Lazy(object):
+    # Resolves to the shared instance on every attribute access, so an override applies
+    # to handles that were bound at import time.
+    __slots__ = ('_name',)
+
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attribute):
+        return getattr(get(self._name), attribute)
+
+    def __repr__(self):
+        return f"<lazy {self._name}>"
+
+
+def lazy(name):
+    if name not in FACTORIES:
+        raise KeyError(name)
+    return Lazy(name)
+
+
+def table(name):
+    return Lazy(f"table:{name}")
+
+
+def override(name, instance):
+    if name == 'dynamodb':
+        # Table handles hang off the resource
+        for key in [key for key in _instances if key.startswith('table:')]:
+            del _instances[key]
+    _instances[name] = instance
+
+
+def reset():
+    _instances.clear()
@@ -0,0 +1,164 @@
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+# DynamoDB accepts at most 25 put/delete requests per BatchWriteItem call
+BATCH_SIZE = 25
+# and at most 100 keys per BatchGetItem call
+GET_BATCH_SIZE = 100
+MAX_RETRIES = 8
+BASE_BACKOFF = 0.05
+MAX_BACKOFF = 2.0
+
+_serializer = None
+
+
+def serialize(value):
+    # boto3 is imported on first use so handlers that import this module for one route
+    # do not pay for it on every cold start
+    global _serializer
+    if _serializer is None:
+        from boto3.dynamodb.types import TypeSerializer
+        _serializer = TypeSerializer()
+    return _serializer.serialize(value)
+
+
+class BatchWriteError(Exception):
+    def __init__(self, table_name, unprocessed):
+        super().__init__(f"{len(unprocessed)} requests for {table_name} still unprocessed after {MAX_RETRIES} retries")
+        self.table_name = table_name
+        self.unprocessed = unprocessed
+
+
+class BatchGetError(Exception):
+    def __init__(self, table_name, unprocessed):
+        super().__init__(f"{len(unprocessed)} keys for {table_name} still unprocessed after {MAX_RETRIES} retries")
+        self.table_name = table_name
+        self.unprocessed = unprocessed
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def backoff_delay(attempt):
+    # Full jitter exponential backoff
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt)))
+
+
+def put_request(item):
+    return {'PutRequest': {'Item': {k: serialize(v) for k, v in item.items()}}}
+
+
+def delete_request(key):
+    return {'DeleteRequest': {'Key': {k: serialize(v) for k, v in key.items()}}}
+
+
+def write_batch(client, table_name, requests):
+    # Send up to 25 requests, retrying UnprocessedItems with backoff until all land
+    pending = requests
+    attempt = 0
+    while pending:
+        response = client.batch_write_item(RequestItems={table_name: pending})
+        pending = response.get('UnprocessedItems', {}).get(table_name, [])
+        if not pending:
+            break
+        if attempt >= MAX_RETRIES:
+            raise BatchWriteError(table_name, pending)
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+    return len(requests)
+
+
+def get_batch(client, table_name, keys, projection=None, attribute_names=None, consistent=False):
+    # Fetch up to 100 distinct keys, retrying UnprocessedKeys with backoff; returns the
+    # items found, in no particular order
+    request = {'Keys': keys, 'ConsistentRead': consistent}
+    if projection:
+        request['ProjectionExpression'] = projection
+    if attribute_names:
+        request['ExpressionAttributeNames'] = attribute_names
+    pending = {table_name: request}
+    items = []
+    attempt = 0
+    while pending:
+        response = client.batch_get_item(RequestItems=pending)
+        items.extend(response.get('Responses', {}).get(table_name, []))
+        pending = response.get('UnprocessedKeys') or {}
+        if not pending:
+            break
+        if attempt >= MAX_RETRIES:
+            raise BatchGetError(table_name, pending[table_name]['Keys'])
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+    return items
+
+
+def write_segment(client, table_name, requests):
+    written = 0
+    for batch in chunked(requests, BATCH_SIZE):
+        written += write_batch(client, table_name, batch)
+    return written
+
+
+def bulk_write(client, table_name, requests, workers=8, segment_size=500, on_checkpoint=None, should_stop=None):
+    # Write `requests` (an iterable in a deterministic order) through `workers` concurrent
+    # streams of 25-item batches. Every segment of `segment_size` requests is one unit of
+    # work; `on_checkpoint(n)` is called whenever the first n requests are known to be
+    # written, so a caller can persist n and resume with islice(requests, n, None).
+    started = time.monotonic()
+    segments = enumerate(chunked(requests, segment_size))
+    segment_sizes = {}
+    done = set()
+    in_flight = {}
+    checkpoint = 0
+    next_segment = 0
+    written = 0
+    exhausted = False
+    stopped = False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while not exhausted and not stopped and len(in_flight) < workers * 2:
+                if should_stop and should_stop():
+                    stopped = True
+                    break
+                segment = next(segments, None)
+                if segment is None:
+                    exhausted = True
+                    break
+                index, chunk = segment
+                segment_sizes[index] = len(chunk)
+                in_flight[executor.submit(write_segment, client, table_name, chunk)] = index
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = in_flight.pop(future)
+                written += future.result()
+                done.add(index)
+
+            advanced = False
+            while next_segment in done:
+                done.discard(next_segment)
+                checkpoint += segment_sizes.pop(next_segment)
+                next_segment += 1
+                advanced = True
+            if advanced and on_checkpoint:
+                on_checkpoint(checkpoint)
+
+    elapsed = time.monotonic() - started
+    return {
+        'written': written,
+        'checkpoint': checkpoint,
+        'complete': exhausted and not stopped,
+        'seconds': round(elapsed, 3),
+        'items_per_second': round(written / elapsed, 1) if elapsed > 0 else None
+    }
@@ -0,0 +1,45 @@
+import json
+import os
+import time
+
+# Event deletion runs in the background: the event lambda marks the Event_table item
+# deleting and queues the event id; worker_delete removes the tickets, counter shards,
+# Redis state and search document, then the item itself. Progress lives on the item
+# while it exists and in a Redis summary once it is gone.
+QUEUE_URL = os.environ.get('EVENT_DELETE_QUEUE_URL')
+SUMMARY_TTL_SECONDS = int(os.environ.get('EVENT_DELETE_SUMMARY_TTL_SECONDS', 7 * 24 * 3600))
+DELETING = 'deleting'
+
+
+def summary_key(event_id):
+    return f"eventdelete:{{{event_id}}}"
+
+
+def now_iso():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def enqueue(sqs, event_id):
+    if not QUEUE_URL:
+        raise RuntimeError('EVENT_DELETE_QUEUE_URL is not configured')
+    sqs.send_message(QueueUrl=QUEUE_URL, MessageBody=json.dumps({'event_id': event_id}))
+
+
+def write_summary(redis_client, event_id, summary):
+    redis_client.set(summary_key(event_id), json.dumps(summary), ex=SUMMARY_TTL_SECONDS)
+
+
+def progress(redis_client, event_id, event_item):
+    # event_item: the Event_table item read consistently, or None. Returns None when the
+    # event is neither being deleted nor recently deleted.
+    if event_item and event_item.get('deletion_status') == DELETING:
+        return {
+            'event_id': event_id,
+            'status': DELETING,
+            'tickets_deleted': int(event_item.get('tickets_deleted', 0)),
+            'requested_at': event_item.get('deletion_requested_at')
+        }
+    if event_item:
+        return None
+    raw = redis_client.get(summary_key(event_id))
+    return json.loads(raw) if raw else None
@@ -0,0 +1,127 @@
+import base64
+import json
+
+from common import search_client
+
+# Filtered, paginated and faceted queries against the `event` index maintained by the
+# stream indexer. String fields are dynamically mapped, so exact matches and sorting use
+# their `.keyword` sub-fields.
+DEFAULT_FIELDS = ['event_id', 'event_name', 'event_date', 'venue_id', 'ticket_price']
+# What the indexer copies from Event_table; bookkeeping attributes (ticket load,
+# counter shards, section prices, deletion) stay out of the index
+DOCUMENT_FIELDS = DEFAULT_FIELDS
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+AUTOCOMPLETE_SIZE = 10
+FACET_VENUE_COUNT = 20
+SORT = [{'event_date': 'asc'}, {'event_id.keyword': 'asc'}]
+ADVANCED_KEYS = {'prefix', 'date_from', 'date_to', 'venue_id', 'price_min', 'price_max', 'size', 'cursor', 'fields', 'facets'}
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+def is_advanced(payload):
+    return payload.get('mode') in ('advanced', 'autocomplete') or bool(ADVANCED_KEYS & set(payload))
+
+
+def encode_cursor(sort_values):
+    return base64.urlsafe_b64encode(json.dumps(sort_values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise InvalidSearch('Invalid cursor')
+    if not isinstance(sort_values, list):
+        raise InvalidSearch('Invalid cursor')
+    return sort_values
+
+
+def range_filter(field, low, high):
+    bounds = {}
+    if low is not None:
+        bounds['gte'] = low
+    if high is not None:
+        bounds['lte'] = high
+    return {'range': {field: bounds}} if bounds else None
+
+
+def autocomplete_query(prefix):
+    return {
+        '_source': ['event_id', 'event_name'],
+        'size': AUTOCOMPLETE_SIZE,
+        'query': {'match_phrase_prefix': {'event_name': {'query': search_client.normalize(prefix)}}}
+    }
+
+
+def build_query(payload):
+    try:
+        size = min(int(payload.get('size', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise InvalidSearch('size must be an integer')
+    if size < 1:
+        raise InvalidSearch('size must be positive')
+
+    must = []
+    if payload.get('keyword'):
+        must.append({'match': {'event_name': search_client.normalize(payload['keyword'])}})
+    if payload.get('prefix'):
+        must.append({'match_phrase_prefix': {'event_name': {'query': search_client.normalize(payload['prefix'])}}})
+
+    filters = [
+        range_filter('event_date', payload.get('date_from'), payload.get('date_to')),
+        range_filter('ticket_price', payload.get('price_min'), payload.get('price_max'))
+    ]
+    venue_ids = payload.get('venue_id')
+    if venue_ids:
+        filters.append({'terms': {'venue_id.keyword': venue_ids if isinstance(venue_ids, list) else [venue_ids]}})
+    filters = [f for f in filters if f]
+
+    fields = payload.get('fields') or DEFAULT_FIELDS
+    query = {
+        '_source': fields,
+        'size': size,
+        'sort': SORT,
+        'query': {'bool': {'must': must or [{'match_all': {}}], 'filter': filters}}
+    }
+    if payload.get('cursor'):
+        query['search_after'] = decode_cursor(payload['cursor'])
+        # Totals and facets only come with the first page
+        query['track_total_hits'] = False
+    elif payload.get('facets'):
+        query['aggs'] = {
+            'venues': {'terms': {'field': 'venue_id.keyword', 'size': FACET_VENUE_COUNT}},
+            'months': {'date_histogram': {'field': 'event_date', 'calendar_interval': 'month', 'format': 'yyyy-MM', 'min_doc_count': 1}}
+        }
+    return query
+
+
+def format_results(query, results):
+    hits = results.get('hits', {}).get('hits', [])
+    response = {'events': [hit.get('_source', {}) for hit in hits]}
+    if 'sort' in query:
+        response['next_cursor'] = encode_cursor(hits[-1]['sort']) if len(hits) == query['size'] and 'sort' in hits[-1] else None
+    total = results.get('hits', {}).get('total')
+    if isinstance(total, dict):
+        response['total'] = total.get('value')
+    aggregations = results.get('aggregations')
+    if aggregations:
+        response['facets'] = {
+            'venues': [{'venue_id': b['key'], 'count': b['doc_count']} for b in aggregations['venues']['buckets']],
+            'months': [{'month': b['key_as_string'], 'count': b['doc_count']} for b in aggregations['months']['buckets']]
+        }
+    return response
+
+
+def search(url, payload, redis_client=None):
+    # Raises InvalidSearch for bad input and requests exceptions for OpenSearch failures
+    if payload.get('mode') == 'autocomplete':
+        if not payload.get('prefix'):
+            raise InvalidSearch('prefix is required for autocomplete')
+        query = autocomplete_query(payload['prefix'])
+    else:
+        query = build_query(payload)
+    return format_results(query, search_client.search(url, query, redis_client=redis_client))
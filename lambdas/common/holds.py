@@ -0,0 +1,352 @@
+import os
+
+from common import seat_state
+
+# Seat holds: one Redis key per ticket whose value is the holder's token. All multi-seat
+# operations run as one Lua script, so a hold either covers every requested seat or none
+# of them, and only the token holder can release or extend it. The event's seat-state
+# bitmap is updated inside the same script.
+#
+# Keys are hash-tagged by event ("hold:{<event_id>}:<ticket_id>"), so an event's holds
+# share a cluster slot with its seat bitmap and expiry zset and every script below
+# touches a single slot, as ElastiCache Serverless requires. A per-event index zset
+# ("holds:{<event_id>}", ticket_id -> expires_at_ms) answers count / list / release-all
+# without scanning the keyspace.
+#
+# KEYS = [seat bitmap, hold expiry zset, hold index, layout version, hold_1 .. hold_n]
+# ARGV = [token, ttl_ms, expires_at_ms, track_bitmap (0/1), layout version, ticket_1 .. ticket_n, ordinal_1 .. ordinal_n]
+# Keys per Redis pipeline round trip in hold lookups
+PIPELINE_CHUNK_SIZE = int(os.environ.get('HOLD_LOOKUP_CHUNK_SIZE', 10000))
+# Also consult the bare ticket_id keys written before holds were hash-tagged; turn on
+# while those can still be live (HOLD_SECONDS after the rollout) or until migrate() ran.
+# Scripts then move the seats' bare keys first, so a legacy hold still blocks other buyers.
+LEGACY_KEYS = os.environ.get('HOLD_LEGACY_KEYS', 'false').lower() == 'true'
+RELEASE_ALL_CHUNK_SIZE = 1000
+
+# Runs first in every script: seat ordinals are only valid for the layout they came from
+LAYOUT_GUARD = """
+if (redis.call('GET', KEYS[4]) or '') ~= ARGV[5] then
+    return redis.error_reply('STALE_LAYOUT')
+end
+"""
+
+HOLD_SCRIPT = LAYOUT_GUARD + """
+local n = #KEYS - 4
+local token = ARGV[1]
+local track = ARGV[4] == '1'
+local conflicts = {}
+for j = 1, n do
+    local owner = redis.call('GET', KEYS[4 + j])
+    if owner and owner ~= token then
+        table.insert(conflicts, ARGV[5 + j])
+        table.insert(conflicts, 'held')
+    elseif track and redis.call('BITFIELD', KEYS[1], 'GET', 'u2', '#' .. ARGV[5 + n + j])[1] == 2 then
+        table.insert(conflicts, ARGV[5 + j])
+        table.insert(conflicts, 'sold')
+    end
+end
+if #conflicts > 0 then
+    return {0, conflicts}
+end
+-- Index entries of holds that have since expired
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', tonumber(ARGV[3]) - tonumber(ARGV[2]))
+for j = 1, n do
+    redis.call('SET', KEYS[4 + j], token, 'PX', ARGV[2])
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[5 + j])
+    if track then
+        redis.call('BITFIELD', KEYS[1], 'SET', 'u2', '#' .. ARGV[5 + n + j], 1)
+        redis.call('ZADD', KEYS[2], ARGV[3], ARGV[5 + n + j])
+    end
+end
+if redis.call('PTTL', KEYS[3]) < tonumber(ARGV[2]) then
+    redis.call('PEXPIRE', KEYS[3], ARGV[2])
+end
+return {1, {}}
+"""
+
+EXTEND_SCRIPT = LAYOUT_GUARD + """
+local n = #KEYS - 4
+local token = ARGV[1]
+local track = ARGV[4] == '1'
+local missing = {}
+for j = 1, n do
+    if redis.call('GET', KEYS[4 + j]) ~= token then
+        table.insert(missing, ARGV[5 + j])
+        table.insert(missing, 'not_held')
+    end
+end
+if #missing > 0 then
+    return {0, missing}
+end
+for j = 1, n do
+    redis.call('PEXPIRE', KEYS[4 + j], ARGV[2])
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[5 + j])
+    if track then
+        redis.call('ZADD', KEYS[2], ARGV[3], ARGV[5 + n + j])
+    end
+end
+if redis.call('PTTL', KEYS[3]) < tonumber(ARGV[2]) then
+    redis.call('PEXPIRE', KEYS[3], ARGV[2])
+end
+return {1, {}}
+"""
+
+RELEASE_SCRIPT = LAYOUT_GUARD + """
+local n = #KEYS - 4
+local token = ARGV[1]
+local track = ARGV[4] == '1'
+local released = 0
+for j = 1, n do
+    if redis.call('GET', KEYS[4 + j]) == token then
+        redis.call('DEL', KEYS[4 + j])
+        redis.call('ZREM', KEYS[3], ARGV[5 + j])
+        released = released + 1
+        if track then
+            local offset = '#' .. ARGV[5 + n + j]
+            if redis.call('BITFIELD', KEYS[1], 'GET', 'u2', offset)[1] == 1 then
+                redis.call('BITFIELD', KEYS[1], 'SET', 'u2', offset, 0)
+            end
+            redis.call('ZREM', KEYS[2], ARGV[5 + n + j])
+        end
+    end
+end
+return released
+"""
+
+# Verify every seat is held by the token and make sure the holds outlive the purchase
+CLAIM_SCRIPT = LAYOUT_GUARD + """
+local n = #KEYS - 4
+local token = ARGV[1]
+local track = ARGV[4] == '1'
+local missing = {}
+for j = 1, n do
+    if redis.call('GET', KEYS[4 + j]) ~= token then
+        table.insert(missing, ARGV[5 + j])
+        table.insert(missing, 'not_held')
+    end
+end
+if #missing > 0 then
+    return {0, missing}
+end
+for j = 1, n do
+    if redis.call('PTTL', KEYS[4 + j]) < tonumber(ARGV[2]) then
+        redis.call('PEXPIRE', KEYS[4 + j], ARGV[2])
+        redis.call('ZADD', KEYS[3], ARGV[3], ARGV[5 + j])
+        if track then
+            redis.call('ZADD', KEYS[2], ARGV[3], ARGV[5 + n + j])
+        end
+    end
+end
+if redis.call('PTTL', KEYS[3]) < tonumber(ARGV[2]) then
+    redis.call('PEXPIRE', KEYS[3], ARGV[2])
+end
+return {1, {}}
+"""
+
+# Purchased seats: drop the token's hold keys and mark the seats sold
+COMPLETE_SCRIPT = LAYOUT_GUARD + """
+local n = #KEYS - 4
+local token = ARGV[1]
+local track = ARGV[4] == '1'
+for j = 1, n do
+    if redis.call('GET', KEYS[4 + j]) == token then
+        redis.call('DEL', KEYS[4 + j])
+        redis.call('ZREM', KEYS[3], ARGV[5 + j])
+    end
+    if track then
+        redis.call('BITFIELD', KEYS[1], 'SET', 'u2', '#' .. ARGV[5 + n + j], 2)
+        redis.call('ZREM', KEYS[2], ARGV[5 + n + j])
+    end
+end
+return n
+"""
+
+# Release whoever holds the seats (release_all, event deletion)
+CLEAR_SCRIPT = LAYOUT_GUARD + """
+local n = #KEYS - 4
+local track = ARGV[4] == '1'
+local released = 0
+for j = 1, n do
+    released = released + redis.call('DEL', KEYS[4 + j])
+    redis.call('ZREM', KEYS[3], ARGV[5 + j])
+    if track then
+        local offset = '#' .. ARGV[5 + n + j]
+        if redis.call('BITFIELD', KEYS[1], 'GET', 'u2', offset)[1] == 1 then
+            redis.call('BITFIELD', KEYS[1], 'SET', 'u2', offset, 0)
+        end
+        redis.call('ZREM', KEYS[2], ARGV[5 + n + j])
+    end
+end
+return released
+"""
+
+
+def hold_key(event_id, ticket_id):
+    return f"hold:{{{event_id}}}:{ticket_id}"
+
+
+def index_key(event_id):
+    return f"holds:{{{event_id}}}"
+
+
+def ticket_hold_key(ticket_id):
+    # For lookups that span events; ticket ids carry their event id
+    return hold_key(seat_state.ticket_event_id(ticket_id), ticket_id)
+
+
+def run_script(redis_client, source, event_id, ticket_ids, token, ttl_ms=0):
+    if LEGACY_KEYS:
+        migrate(redis_client, event_id, ticket_ids)
+    script = redis_client.register_script(source)
+
+    def run(layout):
+        ordinals = seat_state.ticket_ordinals(event_id, ticket_ids, layout) if layout else []
+        expires_at_ms = seat_state.now_ms() + ttl_ms
+        result = script(
+            keys=[seat_state.bitmap_key(event_id), seat_state.expiry_key(event_id), index_key(event_id),
+                  seat_state.version_key(event_id)] + [hold_key(event_id, ticket_id) for ticket_id in ticket_ids],
+            args=[token, ttl_ms, expires_at_ms, 1 if layout else 0, seat_state.layout_version(layout)] + list(ticket_ids) + ordinals
+        )
+        return result, expires_at_ms
+    return seat_state.with_layout(redis_client, event_id, run)
+
+
+def to_str(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def parse_conflicts(flat):
+    return {to_str(flat[i]): to_str(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+
+def hold(redis_client, event_id, ticket_ids, token, ttl_seconds):
+    # Returns (held, conflicts, expires_at_ms); conflicts maps ticket_id -> 'held' | 'sold'
+    (ok, conflicts), expires_at_ms = run_script(redis_client, HOLD_SCRIPT, event_id, ticket_ids, token, ttl_seconds * 1000)
+    return bool(ok), parse_conflicts(conflicts), expires_at_ms
+
+
+def extend(redis_client, event_id, ticket_ids, token, ttl_seconds):
+    (ok, missing), expires_at_ms = run_script(redis_client, EXTEND_SCRIPT, event_id, ticket_ids, token, ttl_seconds * 1000)
+    return bool(ok), parse_conflicts(missing), expires_at_ms
+
+
+def release(redis_client, event_id, ticket_ids, token):
+    released, _ = run_script(redis_client, RELEASE_SCRIPT, event_id, ticket_ids, token)
+    return released
+
+
+def claim(redis_client, event_id, ticket_ids, token, min_ttl_seconds):
+    (ok, missing), _ = run_script(redis_client, CLAIM_SCRIPT, event_id, ticket_ids, token, min_ttl_seconds * 1000)
+    return bool(ok), parse_conflicts(missing)
+
+
+def complete(redis_client, event_id, ticket_ids, token):
+    completed, _ = run_script(redis_client, COMPLETE_SCRIPT, event_id, ticket_ids, token)
+    return completed
+
+
+# Pipelined lookups: one round trip per PIPELINE_CHUNK_SIZE keys instead of one per key
+
+def pipelined(redis_client, command, keys, chunk_size=PIPELINE_CHUNK_SIZE):
+    # Runs `command` (a redis-py method name taking one key) on every key; results in key order
+    keys = list(keys)
+    results = []
+    for start in range(0, len(keys), chunk_size):
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys[start:start + chunk_size]:
+            getattr(pipe, command)(key)
+        results.extend(pipe.execute())
+    return results
+
+
+def lookup_keys(ticket_ids, event_id=None):
+    if event_id is None:
+        keys = [ticket_hold_key(ticket_id) for ticket_id in ticket_ids]
+    else:
+        keys = [hold_key(event_id, ticket_id) for ticket_id in ticket_ids]
+    return keys + list(ticket_ids) if LEGACY_KEYS else keys
+
+
+def held(redis_client, ticket_ids, event_id=None):
+    # Set of the ticket ids currently held
+    ticket_ids = list(ticket_ids)
+    found = pipelined(redis_client, 'exists', lookup_keys(ticket_ids, event_id))
+    count = len(ticket_ids)
+    return {ticket_id for i, ticket_id in enumerate(ticket_ids) if found[i] or (LEGACY_KEYS and found[count + i])}
+
+
+def remaining_ms(redis_client, ticket_ids, event_id=None):
+    # {ticket_id: ms left} for the seats currently held
+    ticket_ids = list(ticket_ids)
+    ttls = pipelined(redis_client, 'pttl', lookup_keys(ticket_ids, event_id))
+    count = len(ticket_ids)
+    remaining = {}
+    for i, ticket_id in enumerate(ticket_ids):
+        ttl = max(ttls[i], ttls[count + i]) if LEGACY_KEYS else ttls[i]
+        if ttl > 0:
+            remaining[ticket_id] = ttl
+    return remaining
+
+
+# Per-event operations, served from the hold index
+
+def count(redis_client, event_id):
+    return redis_client.zcount(index_key(event_id), seat_state.now_ms() + 1, '+inf')
+
+
+def active(redis_client, event_id, limit=None):
+    # [{'ticket_id', 'expires_at_ms'}] for the event's live holds, soonest to expire first
+    entries = redis_client.zrangebyscore(
+        index_key(event_id), seat_state.now_ms() + 1, '+inf',
+        start=0 if limit else None, num=limit, withscores=True
+    )
+    return [{'ticket_id': to_str(ticket_id), 'expires_at_ms': int(score)} for ticket_id, score in entries]
+
+
+def release_all(redis_client, event_id):
+    # Drops every hold of the event, whoever owns it; returns the number released
+    released = 0
+    while True:
+        ticket_ids = [to_str(t) for t in redis_client.zrange(index_key(event_id), 0, RELEASE_ALL_CHUNK_SIZE - 1)]
+        if not ticket_ids:
+            return released
+        result, _ = run_script(redis_client, CLEAR_SCRIPT, event_id, ticket_ids, '')
+        released += result
+
+
+def clear(redis_client, event_id, ticket_ids):
+    # Drops holds on the given seats whoever owns them, in both key formats (event
+    # deletion). Legacy keys go one DEL each: they can sit in different cluster slots.
+    ticket_ids = list(ticket_ids)
+    if not ticket_ids:
+        return 0
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.delete(*[hold_key(event_id, ticket_id) for ticket_id in ticket_ids])
+    pipe.zrem(index_key(event_id), *ticket_ids)
+    for ticket_id in ticket_ids:
+        pipe.delete(ticket_id)
+    results = pipe.execute()
+    return results[0] + sum(results[2:])
+
+
+def migrate(redis_client, event_id, ticket_ids):
+    # Moves holds still under bare ticket_id keys to the hash-tagged keys, keeping the
+    # token and the time left. Safe to repeat; returns the number moved.
+    ticket_ids = list(ticket_ids)
+    values = pipelined(redis_client, 'get', ticket_ids)
+    ttls = pipelined(redis_client, 'pttl', ticket_ids)
+    legacy = [(ticket_id, token, ttl) for ticket_id, token, ttl in zip(ticket_ids, values, ttls) if token is not None and ttl > 0]
+    if not legacy:
+        return 0
+    now = seat_state.now_ms()
+    for start in range(0, len(legacy), PIPELINE_CHUNK_SIZE):
+        pipe = redis_client.pipeline(transaction=False)
+        for ticket_id, token, ttl in legacy[start:start + PIPELINE_CHUNK_SIZE]:
+            pipe.set(hold_key(event_id, ticket_id), token, px=ttl, nx=True)
+            pipe.zadd(index_key(event_id), {ticket_id: now + ttl})
+            pipe.delete(ticket_id)
+        pipe.execute()
+    longest = max(ttl for _, _, ttl in legacy)
+    if redis_client.pttl(index_key(event_id)) < longest:
+        redis_client.pexpire(index_key(event_id), longest)
+    return len(legacy)
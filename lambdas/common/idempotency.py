@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+# Idempotency-Key support: the first request with a key runs the handler and records its
+# final response in Redis (fast path, TTL) and in DynamoDB (durable). Repeats return the
+# recorded response; duplicates that arrive while the first is still running wait for it.
+HEADER = 'idempotency-key'
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE', 'Idempotency_table')
+RESULT_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+# A pending marker outlives the handler's worst case so a crashed attempt frees the key
+IN_FLIGHT_TTL_SECONDS = 60
+WAIT_SECONDS = 10
+POLL_SECONDS = 0.05
+
+PENDING = 'pending'
+COMPLETE = 'complete'
+# The first attempt gave up (server error or crash) and freed the key
+RELEASED = 'released'
+# Client errors that a later retry can get past (admission, throttling); not recorded
+RETRYABLE_STATUS_CODES = (403, 408, 429)
+
+# Namespace for booking ids derived from idempotency keys
+BOOKING_NAMESPACE = uuid.UUID('5d0c8bd2-9a4e-4c8e-8f57-2b1b9f6e4a10')
+
+
+def request_key(event):
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == HEADER and value:
+            return value
+    return None
+
+
+def fingerprint(body):
+    try:
+        canonical = json.dumps(json.loads(body or '{}'), sort_keys=True)
+    except ValueError:
+        canonical = body or ''
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def derived_id(scope, key):
+    return str(uuid.uuid5(BOOKING_NAMESPACE, f"{scope}:{key}"))
+
+
+def redis_key(scope, key):
+    return f"idem:{scope}:{key}"
+
+
+def load_durable(dynamodb, scope, key):
+    item = dynamodb.get_item(
+        TableName=IDEMPOTENCY_TABLE,
+        Key={'idempotency_key': {'S': f"{scope}:{key}"}},
+        ConsistentRead=True
+    ).get('Item')
+    if not item or int(item['expires_at']['N']) < time.time():
+        return None
+    return {'state': COMPLETE, 'fingerprint': item['fingerprint']['S'], 'response': json.loads(item['response']['S'])}
+
+
+def store(redis_client, dynamodb, scope, key, record):
+    redis_client.set(redis_key(scope, key), json.dumps(record), ex=RESULT_TTL_SECONDS)
+    dynamodb.put_item(
+        TableName=IDEMPOTENCY_TABLE,
+        Item={
+            'idempotency_key': {'S': f"{scope}:{key}"},
+            'fingerprint': {'S': record['fingerprint']},
+            'response': {'S': json.dumps(record['response'])},
+            # DynamoDB TTL attribute
+            'expires_at': {'N': str(int(time.time()) + RESULT_TTL_SECONDS)}
+        }
+    )
+
+
+def replay(record, request_fingerprint):
+    if record['fingerprint'] != request_fingerprint:
+        return {'statusCode': 422, 'body': json.dumps({'error': 'Idempotency-Key was already used with a different request body'})}
+    response = dict(record['response'])
+    response['headers'] = dict(response.get('headers') or {}, **{'Idempotent-Replayed': 'true'})
+    return response
+
+
+def wait_for_result(redis_client, scope, key):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        raw = redis_client.get(redis_key(scope, key))
+        if raw is None:
+            return {'state': RELEASED}
+        record = json.loads(raw)
+        if record['state'] == COMPLETE:
+            return record
+    return None
+
+
+def run(redis_client, dynamodb, scope, key, request_fingerprint, handler):
+    pending = json.dumps({'state': PENDING, 'fingerprint': request_fingerprint})
+    while True:
+        if redis_client.set(redis_key(scope, key), pending, nx=True, ex=IN_FLIGHT_TTL_SECONDS):
+            break
+        raw = redis_client.get(redis_key(scope, key))
+        if raw is None:
+            continue
+        record = json.loads(raw)
+        if record['state'] == COMPLETE or record['fingerprint'] != request_fingerprint:
+            return replay(record, request_fingerprint)
+        record = wait_for_result(redis_client, scope, key)
+        if record is None:
+            return {'statusCode': 409, 'body': json.dumps({'error': 'A request with this Idempotency-Key is still in progress'})}
+        if record['state'] == COMPLETE:
+            return replay(record, request_fingerprint)
+
+    # Redis may have lost the result (eviction, failover); DynamoDB still has it
+    record = load_durable(dynamodb, scope, key)
+    if record:
+        redis_client.set(redis_key(scope, key), json.dumps(record), ex=RESULT_TTL_SECONDS)
+        return replay(record, request_fingerprint)
+
+    try:
+        response = handler()
+    except Exception:
+        redis_client.delete(redis_key(scope, key))
+        raise
+    if response['statusCode'] >= 500 or response['statusCode'] in RETRYABLE_STATUS_CODES:
+        # Not final; let the client retry with the same key
+        redis_client.delete(redis_key(scope, key))
+    else:
+        store(redis_client, dynamodb, scope, key, {'state': COMPLETE, 'fingerprint': request_fingerprint, 'response': response})
+    return response
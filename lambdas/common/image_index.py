@@ -0,0 +1,13 @@
+# Index attributes of an Image_table item, derived from its object key. worker_SQS sets
+# them on every write and read_imageDB lists by them: images uploaded under
+# events/<event_id>/ are listed per event, any image by its top-level folder.
+EVENT_IMAGE_PREFIX = 'events/'
+
+
+def attributes(object_key):
+    attributes = {'image_prefix': object_key.split('/', 1)[0]}
+    if object_key.startswith(EVENT_IMAGE_PREFIX):
+        event_id = object_key[len(EVENT_IMAGE_PREFIX):].split('/', 1)[0]
+        if event_id:
+            attributes['event_id'] = event_id
+    return attributes
@@ -0,0 +1,250 @@
+import json
+import os
+import random
+import threading
+import time
+from functools import wraps
+
+# Per-call latency for DynamoDB, Redis and OpenSearch, written as CloudWatch Embedded
+# Metric Format (EMF) log lines at the end of each sampled invocation. Nothing is
+# installed unless METRICS_SAMPLE_RATE > 0, so the default no-op mode costs nothing on
+# the client calls themselves. Sampling is per invocation, so every call made while
+# serving a sampled request is recorded together.
+#
+#   @metrics.handler('booking')
+#   def lambda_handler(event, context): ...
+#
+# common.clients instruments the clients it creates; search_client its HTTP session.
+SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0))
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Ticketmaster')
+# EMF accepts at most 100 values per metric in one log line
+MAX_VALUES = 100
+
+# DynamoDB operations that can report ConsumedCapacity
+CAPACITY_OPERATIONS = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'
+}
+
+_sampled = False
+_samples = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    return SAMPLE_RATE > 0
+
+
+def configure(sample_rate=None, namespace=None):
+    # Clients instrument themselves when created, so configure before first use
+    global SAMPLE_RATE, NAMESPACE
+    if sample_rate is not None:
+        SAMPLE_RATE = float(sample_rate)
+    if namespace is not None:
+        NAMESPACE = namespace
+
+
+def record(client, operation, seconds, items=None, capacity=None, error=False):
+    if not _sampled:
+        return
+    with _lock:
+        sample = _samples.get((client, operation))
+        if sample is None:
+            sample = _samples[(client, operation)] = {'Latency': [], 'Items': [], 'ConsumedCapacity': [], 'Errors': []}
+        sample['Latency'].append(round(seconds * 1000, 3))
+        if items is not None:
+            sample['Items'].append(items)
+        if capacity is not None:
+            sample['ConsumedCapacity'].append(capacity)
+        sample['Errors'].append(1 if error else 0)
+
+
+def emf_lines(service, samples, timestamp_ms):
+    units = {'Latency': 'Milliseconds', 'Items': 'Count', 'ConsumedCapacity': 'Count', 'Errors': 'Count'}
+    for (client, operation), sample in samples.items():
+        for start in range(0, len(sample['Latency']), MAX_VALUES):
+            values = {name: sample[name][start:start + MAX_VALUES] for name in units}
+            values = {name: v for name, v in values.items() if v}
+            yield json.dumps({
+                '_aws': {
+                    'Timestamp': timestamp_ms,
+                    'CloudWatchMetrics': [{
+                        'Namespace': NAMESPACE,
+                        'Dimensions': [['Service', 'Client', 'Operation']],
+                        'Metrics': [{'Name': name, 'Unit': units[name]} for name in values]
+                    }]
+                },
+                'Service': service,
+                'Client': client,
+                'Operation': operation,
+                'SampleRate': SAMPLE_RATE,
+                **values
+            }, separators=(',', ':'))
+
+
+def flush(service):
+    global _samples
+    with _lock:
+        samples, _samples = _samples, {}
+    for line in emf_lines(service, samples, int(time.time() * 1000)):
+        print(line)
+
+
+def invocation_name(event):
+    if isinstance(event, dict) and 'httpMethod' in event:
+        return f"{event['httpMethod']} {event.get('path', '')}"
+    return 'invoke'
+
+
+def handler(service):
+    # Decorates a lambda_handler; returns it untouched when metrics are off
+    def decorate(fn):
+        if not enabled():
+            return fn
+
+        @wraps(fn)
+        def wrapper(event, context):
+            global _sampled
+            _sampled = random.random() < SAMPLE_RATE
+            if not _sampled:
+                return fn(event, context)
+            started = time.perf_counter()
+            error = True
+            try:
+                response = fn(event, context)
+                error = isinstance(response, dict) and response.get('statusCode', 200) >= 500
+                return response
+            finally:
+                record('lambda', invocation_name(event), time.perf_counter() - started, error=error)
+                _sampled = False
+                flush(service)
+        return wrapper
+    return decorate
+
+
+# DynamoDB (and any botocore client), through botocore's event hooks
+
+def dynamodb_request_items(operation, params):
+    if operation == 'BatchWriteItem':
+        return sum(len(requests) for requests in params.get('RequestItems', {}).values())
+    if operation == 'BatchGetItem':
+        return sum(len(request.get('Keys', [])) for request in params.get('RequestItems', {}).values())
+    if operation in ('TransactWriteItems', 'TransactGetItems'):
+        return len(params.get('TransactItems', []))
+    return None
+
+
+def dynamodb_response_items(parsed):
+    if 'Count' in parsed:
+        return parsed['Count']
+    if 'Responses' in parsed:
+        responses = parsed['Responses']
+        return sum(len(items) for items in responses.values()) if isinstance(responses, dict) else len(responses)
+    if 'Item' in parsed:
+        return 1
+    return None
+
+
+def consumed_capacity(parsed):
+    capacity = parsed.get('ConsumedCapacity')
+    if capacity is None:
+        return None
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    return sum(c.get('CapacityUnits', 0) for c in capacity)
+
+
+def before_boto3_call(params, model, context, **kwargs):
+    if not _sampled:
+        return
+    context['metrics_started'] = time.perf_counter()
+    context['metrics_items'] = dynamodb_request_items(model.name, params)
+    if model.name in CAPACITY_OPERATIONS and model.service_model.service_name == 'dynamodb':
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def after_boto3_call(http_response, parsed, model, context, **kwargs):
+    started = context.get('metrics_started')
+    if started is None:
+        return
+    items = context.get('metrics_items')
+    record(
+        model.service_model.service_name,
+        model.name,
+        time.perf_counter() - started,
+        items=items if items is not None else dynamodb_response_items(parsed),
+        capacity=consumed_capacity(parsed),
+        error=http_response.status_code >= 300
+    )
+
+
+def instrument_boto3(client):
+    # Accepts a client or a resource; returns it
+    if enabled():
+        events = client.meta.events if hasattr(client.meta, 'events') else client.meta.client.meta.events
+        events.register('provide-client-params.*.*', before_boto3_call)
+        events.register('after-call.*.*', after_boto3_call)
+    return client
+
+
+# Redis: every command and script goes through execute_command, pipelines through execute
+
+def instrument_redis(client):
+    if not enabled():
+        return client
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    def timed_command(*args, **options):
+        if not _sampled:
+            return execute_command(*args, **options)
+        started = time.perf_counter()
+        error = False
+        try:
+            return execute_command(*args, **options)
+        except Exception as e:
+            # redis-py answers NOSCRIPT with SCRIPT LOAD and a retry; that is not a failure
+            error = type(e).__name__ != 'NoScriptError'
+            raise
+        finally:
+            record('redis', str(args[0]).upper(), time.perf_counter() - started, error=error)
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def timed_execute(*execute_args, **execute_kwargs):
+            if not _sampled:
+                return execute(*execute_args, **execute_kwargs)
+            commands = len(pipe.command_stack)
+            started = time.perf_counter()
+            error = True
+            try:
+                result = execute(*execute_args, **execute_kwargs)
+                error = False
+                return result
+            finally:
+                record('redis', 'PIPELINE', time.perf_counter() - started, items=commands, error=error)
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_command
+    client.pipeline = timed_pipeline
+    return client
+
+
+# HTTP (OpenSearch) through a requests response hook
+
+def record_response(response, *args, **kwargs):
+    if not _sampled:
+        return
+    path = response.request.path_url.split('?', 1)[0].rstrip('/')
+    record('opensearch', f"{response.request.method} {path.rsplit('/', 1)[-1]}",
+           response.elapsed.total_seconds(), error=response.status_code >= 500)
+
+
+def instrument_session(session):
+    if enabled():
+        session.hooks['response'].append(record_response)
+    return session
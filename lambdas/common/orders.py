@@ -0,0 +1,56 @@
+import json
+import os
+import time
+
+# Asynchronous purchases: the booking lambda checks the hold, queues the order on an SQS
+# FIFO queue (one message group per event, so an event's orders are processed in
+# arrival order) and answers 202 with an order id; worker_purchase runs the purchase and
+# records the outcome here. Clients poll GET /default/ticketmaster_booking/order, which
+# reads one small Redis key. The order id doubles as the booking id, so a completed
+# order can still be confirmed from Booking_table after its status record expires.
+QUEUE_URL = os.environ.get('PURCHASE_QUEUE_URL')
+# Queued orders keep their seats held at least this long; size it above the worst
+# expected queue wait during an on-sale
+ORDER_HOLD_SECONDS = int(os.environ.get('ORDER_HOLD_SECONDS', 300))
+STATUS_TTL_SECONDS = int(os.environ.get('ORDER_STATUS_TTL_SECONDS', 24 * 3600))
+
+QUEUED = 'queued'
+PROCESSING = 'processing'
+COMPLETE = 'complete'
+FAILED = 'failed'
+FINAL = (COMPLETE, FAILED)
+
+
+def status_key(order_id):
+    return f"order:{order_id}"
+
+
+def enqueue(sqs, order):
+    if not QUEUE_URL:
+        raise RuntimeError('PURCHASE_QUEUE_URL is not configured')
+    sqs.send_message(
+        QueueUrl=QUEUE_URL,
+        MessageBody=json.dumps(order),
+        MessageGroupId=order['event_id'],
+        MessageDeduplicationId=order['order_id']
+    )
+
+
+def write_status(redis_client, order_id, status, **fields):
+    record = {'order_id': order_id, 'status': status, 'updated_at': int(time.time()), **fields}
+    redis_client.set(status_key(order_id), json.dumps(record), ex=STATUS_TTL_SECONDS)
+    return record
+
+
+def read_status(redis_client, order_id):
+    raw = redis_client.get(status_key(order_id))
+    return json.loads(raw) if raw else None
+
+
+def booking_exists(dynamodb, order_id):
+    return 'Item' in dynamodb.get_item(
+        TableName='Booking_table',
+        Key={'booking_id': {'S': order_id}},
+        ProjectionExpression='booking_id',
+        ConsistentRead=True
+    )
@@ -0,0 +1,220 @@
+import random
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+from common import holds, ticket_counter
+
+# DynamoDB allows 100 items per TransactWriteItems call; each chunk also carries the
+# available-ticket counter update and the final chunk the Booking_table put.
+MAX_TRANSACTION_ITEMS = 100
+TICKETS_PER_CHUNK = MAX_TRANSACTION_ITEMS - 2
+# Holds are stretched to at least this long while the purchase is in flight
+PURCHASE_HOLD_SECONDS = 60
+ROLLBACK_RETRIES = 5
+# Other counter shards tried when the chosen one cannot cover a chunk
+COUNTER_RETRIES = 3
+
+# Per-seat results. HELD means the seat was not bought but is still held by the
+# caller's token, so a retry only needs replacements for the other seats.
+PURCHASED = 'purchased'
+HELD = 'held'
+NOT_HELD = 'not_held'
+SOLD = 'sold'
+CONTENDED = 'contended'
+SOLD_OUT = 'sold_out'
+
+# Cancellation reason codes that mean "try the same seat again"
+RETRYABLE_CODES = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded', 'RequestLimitExceeded'}
+
+
+def chunk_tickets(ticket_ids):
+    return [ticket_ids[i:i + TICKETS_PER_CHUNK] for i in range(0, len(ticket_ids), TICKETS_PER_CHUNK)]
+
+
+def ticket_update(ticket_id, booking_id):
+    return {
+        'Update': {
+            'TableName': 'Ticket_table',
+            'Key': {'ticket_id': {'S': ticket_id}},
+            'UpdateExpression': "SET ticket_status=:status, booking_id=:booking",
+            'ConditionExpression': "ticket_status = :current_status",
+            'ExpressionAttributeValues': {
+                ':status': {'S': 'sold'},
+                ':current_status': {'S': 'available'},
+                ':booking': {'S': booking_id}
+            },
+            # Lets already_applied() see whose booking a sold seat belongs to
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
+    }
+
+
+def ticket_rollback(ticket_id, booking_id):
+    return {
+        'Update': {
+            'TableName': 'Ticket_table',
+            'Key': {'ticket_id': {'S': ticket_id}},
+            'UpdateExpression': "SET ticket_status=:status REMOVE booking_id",
+            'ConditionExpression': "booking_id = :booking",
+            'ExpressionAttributeValues': {
+                ':status': {'S': 'available'},
+                ':booking': {'S': booking_id}
+            }
+        }
+    }
+
+
+def booking_put(booking_id, event_id, ticket_ids):
+    return {
+        'Put': {
+            'TableName': 'Booking_table',
+            'Item': {
+                'booking_id': {'S': booking_id},
+                'booking_status': {'S': 'purchase complete'},
+                'event_id': {'S': event_id},
+                'ticket_ids': {'L': [{'S': ticket_id} for ticket_id in ticket_ids]},
+                'createdAt': {'N': str(int(time.time()))}
+            },
+            'ConditionExpression': "attribute_not_exists(booking_id)"
+        }
+    }
+
+
+def cancellation_codes(error, chunk):
+    reasons = [reason.get('Code', 'None') for reason in error.response.get('CancellationReasons', [])]
+    return reasons + ['None'] * (len(chunk) + 1 - len(reasons))
+
+
+def counter_refused(error, chunk):
+    # Only the counter shard's condition failed; every seat in the chunk was still free
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return False
+    reasons = cancellation_codes(error, chunk)
+    return reasons[len(chunk)] == 'ConditionalCheckFailed' and all(code == 'None' for code in reasons[:len(chunk)])
+
+
+def already_applied(error, chunk, booking_id):
+    # A replayed order (same booking_id) finding a chunk it committed before: every seat
+    # refused because it is already sold to this booking
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return False
+    reasons = error.response.get('CancellationReasons', [])[:len(chunk)]
+    return len(reasons) == len(chunk) and all(
+        reason.get('Code') == 'ConditionalCheckFailed' and reason.get('Item', {}).get('booking_id', {}).get('S') == booking_id
+        for reason in reasons)
+
+
+def cancellation_results(error, chunk):
+    # CancellationReasons line up with TransactItems: the chunk's tickets, then the
+    # event counter, then (on the last chunk) the booking put.
+    reasons = cancellation_codes(error, chunk)
+    event_code = reasons[len(chunk)]
+    results = {}
+    for ticket_id, code in zip(chunk, reasons):
+        if code == 'ConditionalCheckFailed':
+            results[ticket_id] = SOLD
+        elif code in RETRYABLE_CODES:
+            results[ticket_id] = CONTENDED
+        elif event_code == 'ConditionalCheckFailed':
+            results[ticket_id] = SOLD_OUT
+        elif event_code in RETRYABLE_CODES:
+            results[ticket_id] = CONTENDED
+        else:
+            results[ticket_id] = HELD
+    if all(result == HELD for result in results.values()):
+        # Cancelled for a reason not tied to any seat
+        results = {ticket_id: CONTENDED for ticket_id in chunk}
+    return results
+
+
+def spread_shards(dynamodb, event_id, need):
+    # After a shard refused a chunk: (shard count, shards that can cover it), with None
+    # for the shards when the event as a whole cannot
+    shards = ticket_counter.shard_count(dynamodb, event_id, refresh=True)
+    if not shards:
+        return shards, None
+    counts = ticket_counter.read_shards(dynamodb, event_id, shards)
+    if sum(counts) < need:
+        return shards, None
+    candidates = ticket_counter.candidates(counts, need)
+    if not candidates:
+        counts = ticket_counter.rebalance(dynamodb, event_id, counts, need)
+        candidates = ticket_counter.candidates(counts, need) if counts else []
+    return shards, candidates
+
+
+def write_chunk(dynamodb, event_id, booking_id, chunk, final_item=None):
+    # Returns the counter shard the chunk was charged to. A shard that runs short while
+    # others still hold seats is not a sell-out, so those are retried on another shard;
+    # so is a refusal on a shard count that has since changed.
+    shards = ticket_counter.shard_count(dynamodb, event_id)
+    candidates = None
+    for attempt in range(COUNTER_RETRIES + 1):
+        shard = ticket_counter.pick_shard(shards, candidates)
+        transact_items = [ticket_update(ticket_id, booking_id) for ticket_id in chunk]
+        transact_items.append(ticket_counter.decrement(event_id, shard, len(chunk)))
+        if final_item:
+            transact_items.append(final_item)
+        try:
+            dynamodb.transact_write_items(TransactItems=transact_items)
+            return shard
+        except ClientError as e:
+            if already_applied(e, chunk, booking_id):
+                # Charged when it committed; a rollback may credit any shard
+                return ticket_counter.pick_shard(shards)
+            if attempt == COUNTER_RETRIES or not counter_refused(e, chunk):
+                raise
+            shards, candidates = spread_shards(dynamodb, event_id, len(chunk))
+            if candidates is None:
+                raise
+
+
+def rollback(dynamodb, event_id, booking_id, committed_chunks):
+    # Compensate chunks that already committed; every step is conditional on booking_id,
+    # so replaying a partially applied rollback is harmless.
+    for chunk, shard in committed_chunks:
+        transact_items = [ticket_rollback(ticket_id, booking_id) for ticket_id in chunk]
+        transact_items.append(ticket_counter.increment(event_id, shard, len(chunk)))
+        for attempt in range(ROLLBACK_RETRIES + 1):
+            try:
+                dynamodb.transact_write_items(TransactItems=transact_items)
+                break
+            except ClientError:
+                if attempt == ROLLBACK_RETRIES:
+                    raise
+                time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+
+
+def purchase(dynamodb, redis_client, event_id, ticket_ids, hold_token, booking_id=None):
+    # Returns {'status': 'complete' | 'not_held' | 'conflict', 'booking_id', 'results'}
+    # where results maps every ticket_id to its outcome.
+    booking_id = booking_id or str(uuid.uuid4())
+    ticket_ids = list(dict.fromkeys(ticket_ids))
+
+    claimed, missing = holds.claim(redis_client, event_id, ticket_ids, hold_token, PURCHASE_HOLD_SECONDS)
+    if not claimed:
+        results = {ticket_id: missing.get(ticket_id, HELD) for ticket_id in ticket_ids}
+        return {'status': 'not_held', 'booking_id': None, 'results': results}
+
+    chunks = chunk_tickets(ticket_ids)
+    committed = []
+    for index, chunk in enumerate(chunks):
+        final_item = booking_put(booking_id, event_id, ticket_ids) if index == len(chunks) - 1 else None
+        try:
+            shard = write_chunk(dynamodb, event_id, booking_id, chunk, final_item)
+        except ClientError as e:
+            rollback(dynamodb, event_id, booking_id, committed)
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                raise
+            results = {ticket_id: HELD for ticket_id in ticket_ids}
+            results.update(cancellation_results(e, chunk))
+            lost = [ticket_id for ticket_id, result in results.items() if result == SOLD]
+            if lost:
+                holds.complete(redis_client, event_id, lost, hold_token)
+            return {'status': 'conflict', 'booking_id': None, 'results': results}
+        committed.append((chunk, shard))
+
+    holds.complete(redis_client, event_id, ticket_ids, hold_token)
+    return {'status': 'complete', 'booking_id': booking_id, 'results': {ticket_id: PURCHASED for ticket_id in ticket_ids}}
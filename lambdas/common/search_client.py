@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from common import metrics
+
+# Shared OpenSearch client. The session (and its keep-alive connection pool) lives at
+# module level, so warm invocations reuse open TLS connections. Search results are cached
+# in process (TTL + LRU) and optionally in Redis; the stream indexer bumps a generation
+# counter in Redis whenever an event document changes, which retires every cached result.
+OPENSEARCH_USER = os.environ.get('OPENSEARCH_USER')
+OPENSEARCH_PASS = os.environ.get('OPENSEARCH_PASS')
+POOL_SIZE = int(os.environ.get('OPENSEARCH_POOL_SIZE', 10))
+MAX_RETRIES = int(os.environ.get('OPENSEARCH_MAX_RETRIES', 2))
+TIMEOUT = (3, 10)
+
+CACHE_TTL_SECONDS = float(os.environ.get('SEARCH_CACHE_TTL_SECONDS', 30))
+CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 512))
+REDIS_CACHE_ENABLED = os.environ.get('SEARCH_CACHE_REDIS', 'false').lower() == 'true'
+# How often a warm container re-reads the invalidation generation from Redis
+GENERATION_CHECK_SECONDS = 1.0
+GENERATION_KEY = 'search:generation'
+
+_session = None
+_cache = OrderedDict()
+_generation = {'value': 0, 'checked_at': 0.0}
+
+
+def session():
+    global _session
+    if _session is None:
+        # Imported here so handlers that never search do not pay for requests at cold start
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=MAX_RETRIES,
+            backoff_factor=0.1,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD', 'DELETE'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE, max_retries=retry)
+        _session = requests.Session()
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+        _session.headers['Content-Type'] = 'application/json'
+        if OPENSEARCH_USER and OPENSEARCH_PASS:
+            _session.auth = (OPENSEARCH_USER, OPENSEARCH_PASS)
+        metrics.instrument_session(_session)
+    return _session
+
+
+def normalize(keyword):
+    # "  BTS ", "bts" and "Bts" share one cache entry
+    return ' '.join(str(keyword).lower().split())
+
+
+def cache_key(url, query):
+    return hashlib.sha256((url + json.dumps(query, sort_keys=True, separators=(',', ':'))).encode()).hexdigest()
+
+
+def current_generation(redis_client):
+    if redis_client is None:
+        return 0
+    now = time.monotonic()
+    if now - _generation['checked_at'] >= GENERATION_CHECK_SECONDS:
+        try:
+            _generation['value'] = int(redis_client.get(GENERATION_KEY) or 0)
+            _generation['checked_at'] = now
+        except Exception:
+            # The cache is best effort; fall back to TTL expiry if Redis is unreachable
+            pass
+    return _generation['value']
+
+
+def cache_get(key, generation):
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    expires_at, entry_generation, result = entry
+    if expires_at < time.monotonic() or entry_generation != generation:
+        del _cache[key]
+        return None
+    _cache.move_to_end(key)
+    return result
+
+
+def cache_put(key, generation, result):
+    _cache[key] = (time.monotonic() + CACHE_TTL_SECONDS, generation, result)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def search(url, query, redis_client=None, use_cache=True):
+    # Returns the parsed OpenSearch response; raises requests exceptions on failure
+    generation = current_generation(redis_client)
+    key = cache_key(url, query)
+    if use_cache:
+        result = cache_get(key, generation)
+        if result is not None:
+            return result
+        if redis_client is not None and REDIS_CACHE_ENABLED:
+            try:
+                raw = redis_client.get(f"search:{generation}:{key}")
+            except Exception:
+                raw = None
+            if raw is not None:
+                result = json.loads(raw)
+                cache_put(key, generation, result)
+                return result
+
+    response = session().get(url, data=json.dumps(query), timeout=TIMEOUT)
+    response.raise_for_status()
+    result = response.json()
+
+    if use_cache:
+        cache_put(key, generation, result)
+        if redis_client is not None and REDIS_CACHE_ENABLED:
+            try:
+                redis_client.set(f"search:{generation}:{key}", response.content, ex=int(CACHE_TTL_SECONDS))
+            except Exception:
+                pass
+    return result
+
+
+def invalidate(redis_client=None):
+    _cache.clear()
+    if redis_client is not None:
+        _generation['value'] = redis_client.incr(GENERATION_KEY)
+        _generation['checked_at'] = time.monotonic()
@@ -0,0 +1,116 @@
+# Best-available search over an event's seat-state bitmap (see seat_state). The packed
+# 2-bit states are read as one integer, so finding every run of n adjacent free seats in
+# a row is a handful of big-integer shifts and ANDs rather than a loop over seats; a
+# 50k-seat venue is a 100k-bit integer. Ranking then only looks at the frontmost row that
+# has a run, and picks the run closest to the centre of it.
+from common import seat_state
+
+# Integer masks depend only on the layout and party size, so they are kept per process
+# (keyed by seat count, or by (rows, seats per row, party size))
+_masks = {}
+
+
+def seat_bits(seat_count):
+    # 0b0101...01: the low bit of every seat's 2-bit field
+    mask = _masks.get(seat_count)
+    if mask is None:
+        mask = _masks[seat_count] = (4 ** seat_count - 1) // 3
+    return mask
+
+
+def position(ordinal, seat_count):
+    # Bit index of a seat's low bit; the bitmap is big-endian, so seat 0 is the top field
+    return 2 * (seat_count - 1 - ordinal)
+
+
+def free_seats(bitmap, layout):
+    # One bit per seat (at its low bit) set when the seat is available
+    seat_count = layout['seat_count']
+    size = (seat_count * seat_state.BITS_PER_SEAT + 7) // 8
+    value = int.from_bytes(bytes(bitmap[:size]).ljust(size, b'\0'), 'big') >> (size * 8 - 2 * seat_count)
+    ones = seat_bits(seat_count)
+    return ones ^ ((value | (value >> 1)) & ones)
+
+
+def run_starts(free, quantity):
+    # Bit set at a seat when it and the quantity - 1 seats after it are all free. Seats
+    # after `o` sit at lower bit positions, so shifting left lines them up with `o`.
+    result = None
+    span = free
+    length = 1
+    offset = 0
+    while quantity:
+        if quantity & 1:
+            shifted = span << (2 * offset)
+            result = shifted if result is None else result & shifted
+            offset += length
+        quantity >>= 1
+        if quantity:
+            span &= span << (2 * length)
+            length *= 2
+    return result
+
+
+def row_starts(layout, quantity):
+    # Starts whose run stays inside one row
+    key = (layout['row_count'], layout['seats_per_row'], quantity)
+    mask = _masks.get(key)
+    if mask is None:
+        seats_per_row, row_count = layout['seats_per_row'], layout['row_count']
+        # Within one row's 2 * seats_per_row bits, seats 0 .. seats_per_row - quantity
+        row = 4 ** (quantity - 1) * seat_bits(seats_per_row - quantity + 1)
+        # Repeated once per row: row * (1 + 2^w + 2^2w + ...)
+        width = 2 * seats_per_row
+        mask = _masks[key] = row * (((1 << (width * row_count)) - 1) // ((1 << width) - 1))
+    return mask
+
+
+def row_range(layout, first_row, last_row):
+    seats_per_row, seat_count = layout['seats_per_row'], layout['seat_count']
+    low = position((last_row + 1) * seats_per_row - 1, seat_count)
+    return ((1 << (2 * (last_row - first_row + 1) * seats_per_row)) - 1) << low
+
+
+def best_in_row(starts, row, quantity, layout):
+    seats_per_row, seat_count = layout['seats_per_row'], layout['seat_count']
+    bits = starts >> position((row + 1) * seats_per_row - 1, seat_count)
+    centre = (seats_per_row - quantity) / 2.0
+    best = None
+    for seat in range(seats_per_row - quantity + 1):
+        if (bits >> (2 * (seats_per_row - 1 - seat))) & 1 and (best is None or abs(seat - centre) < abs(best - centre)):
+            best = seat
+    return row * seats_per_row + best
+
+
+def section_rows(layout, names=None, max_price=None):
+    # Row ranges of the layout's sections matching `names` and priced at or under
+    # `max_price`; None when the layout has no sections
+    if not layout.get('sections'):
+        return None
+    return [(section['first_row'], section['last_row']) for section in layout['sections']
+            if (not names or section['name'] in names)
+            and (max_price is None or section['price'] is None or section['price'] <= max_price)]
+
+
+def find(bitmap, layout, quantity, first_row=0, last_row=None, row_ranges=None):
+    # Ordinals of the best block of `quantity` adjacent free seats, or None. Rows nearer
+    # the front win; within a row, the block nearest the centre. row_ranges, if given,
+    # limits the search to those (first_row, last_row) ranges as well.
+    seats_per_row, seat_count = layout['seats_per_row'], layout['seat_count']
+    last_row = layout['row_count'] - 1 if last_row is None else min(last_row, layout['row_count'] - 1)
+    if quantity < 1 or quantity > seats_per_row or first_row > last_row:
+        return None
+    rows = row_range(layout, first_row, last_row)
+    if row_ranges is not None:
+        allowed = 0
+        for low, high in row_ranges:
+            if max(low, first_row) <= min(high, last_row):
+                allowed |= row_range(layout, max(low, first_row), min(high, last_row))
+        rows &= allowed
+    starts = run_starts(free_seats(bitmap, layout), quantity) & row_starts(layout, quantity) & rows
+    if not starts:
+        return None
+    # The highest set bit is the lowest ordinal, so its row is the frontmost with a run
+    row = (seat_count - 1 - (starts.bit_length() - 1) // 2) // seats_per_row
+    start = best_in_row(starts, row, quantity, layout)
+    return list(range(start, start + quantity))
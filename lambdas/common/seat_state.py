@@ -0,0 +1,231 @@
+import base64
+import json
+import time
+import uuid
+
+# Per-event seat state kept in Redis as a packed array of 2-bit values, one per seat,
+# indexed by the seat's position in generate_seat_map order. A 50k-seat venue fits in
+# 12.5 KB. DynamoDB stays the durable record; rebuild() repopulates from Ticket_table.
+AVAILABLE = 0
+HELD = 1
+SOLD = 2
+STATE_NAMES = {AVAILABLE: 'available', HELD: 'held', SOLD: 'sold'}
+BITS_PER_SEAT = 2
+ROW_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# Expired holds are cleared from the bitmap before it is returned, since the hold keys
+# themselves expire without notifying anyone.
+# KEYS = [bitmap, expiry zset, layout version]; ARGV = [now_ms, layout version]
+SNAPSHOT_SCRIPT = """
+if (redis.call('GET', KEYS[3]) or '') ~= ARGV[2] then
+    return redis.error_reply('STALE_LAYOUT')
+end
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, ordinal in ipairs(expired) do
+    local offset = '#' .. ordinal
+    if redis.call('BITFIELD', KEYS[1], 'GET', 'u2', offset)[1] == 1 then
+        redis.call('BITFIELD', KEYS[1], 'SET', 'u2', offset, 0)
+    end
+end
+if #expired > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+end
+return redis.call('GET', KEYS[1])
+"""
+
+# Layouts are cached per process. A deleted event's id can come back on another venue,
+# so every write() stamps the layout with a fresh version, kept in its own key; scripts
+# that address seats by ordinal refuse a different version with STALE_LAYOUT and
+# with_layout() reloads the layout and runs again.
+_layouts = {}
+STALE_LAYOUT = 'STALE_LAYOUT'
+
+
+# Keys share a {event_id} hash tag so one event's state lives in one cluster slot
+def bitmap_key(event_id):
+    return f"seatmap:{{{event_id}}}"
+
+
+def layout_key(event_id):
+    return f"seatmeta:{{{event_id}}}"
+
+
+def expiry_key(event_id):
+    return f"seatexp:{{{event_id}}}"
+
+
+def version_key(event_id):
+    return f"seatver:{{{event_id}}}"
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def row_index(row_label):
+    # Bijective base-26: A=0 ... Z=25, AA=26 ...
+    index = 0
+    for char in row_label:
+        index = index * 26 + (ord(char) - ord('A') + 1)
+    return index - 1
+
+
+def row_label(index):
+    # Inverse of row_index
+    label = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(ord('A') + remainder) + label
+    return label
+
+
+def seat_number(ordinal, layout):
+    row, seat = divmod(ordinal, layout['seats_per_row'])
+    return f"{row_label(row)}{seat + 1}"
+
+
+def ordinal_ticket_ids(event_id, ordinals, layout):
+    return [f"{event_id}_{seat_number(ordinal, layout)}" for ordinal in ordinals]
+
+
+def seat_ordinal(seat_number, layout):
+    # Raises ValueError for a seat outside the layout; its ordinal would land on another
+    # seat's bits, or far past the end of the bitmap
+    split = len(seat_number.rstrip('0123456789'))
+    row, seat = seat_number[:split], seat_number[split:]
+    if not row or row.strip(ROW_LETTERS) or not seat or seat.startswith('0'):
+        raise ValueError(f"Invalid seat number: {seat_number}")
+    row, seat = row_index(row), int(seat)
+    if row >= layout['row_count'] or seat > layout['seats_per_row']:
+        raise ValueError(f"Seat {seat_number} is not in the venue layout")
+    return row * layout['seats_per_row'] + seat - 1
+
+
+def ticket_event_id(ticket_id):
+    # ticket ids are f"{event_id}_{seat_number}"; seat numbers never contain '_'
+    return ticket_id.rsplit('_', 1)[0]
+
+
+def ticket_ordinals(event_id, ticket_ids, layout):
+    prefix = f"{event_id}_"
+    ordinals = []
+    for ticket_id in ticket_ids:
+        if not ticket_id.startswith(prefix):
+            raise ValueError(f"Ticket {ticket_id} does not belong to event {event_id}")
+        ordinals.append(seat_ordinal(ticket_id[len(prefix):], layout))
+    return ordinals
+
+
+def build_layout(row_count, seats_per_row, sections=None):
+    # sections: [{'name', 'rows', 'price'}, ...] in row order, front to back, covering
+    # every row; stored with their row range so readers can map rows to sections
+    layout = {'row_count': row_count, 'seats_per_row': seats_per_row, 'seat_count': row_count * seats_per_row}
+    if sections:
+        ranged = []
+        first_row = 0
+        for section in sections:
+            rows = int(section['rows'])
+            ranged.append({'name': section['name'], 'first_row': first_row, 'last_row': first_row + rows - 1,
+                           'price': section.get('price')})
+            first_row += rows
+        if first_row != row_count:
+            raise ValueError(f"Sections cover {first_row} of {row_count} rows")
+        layout['sections'] = ranged
+    return layout
+
+
+def section_of(row, layout):
+    for section in layout.get('sections', []):
+        if section['first_row'] <= row <= section['last_row']:
+            return section
+    return None
+
+
+def get_layout(redis_client, event_id, refresh=False):
+    layout = None if refresh else _layouts.get(event_id)
+    if layout is None:
+        _layouts.pop(event_id, None)
+        raw = redis_client.get(layout_key(event_id))
+        if raw is None:
+            return None
+        layout = _layouts[event_id] = json.loads(raw)
+    return layout
+
+
+def layout_version(layout):
+    # '' for no layout, and for layouts written before versions existed
+    return layout.get('version', '') if layout else ''
+
+
+def with_layout(redis_client, event_id, run):
+    # run(layout) with the cached layout (None if the event has none). If the layout
+    # turns out stale (STALE_LAYOUT from a script, or seats it does not know), runs once
+    # more with the layout reloaded from Redis.
+    try:
+        return run(get_layout(redis_client, event_id))
+    except Exception as e:
+        if not isinstance(e, ValueError) and STALE_LAYOUT not in str(e):
+            raise
+    return run(get_layout(redis_client, event_id, refresh=True))
+
+
+def pack(states, seat_count):
+    # states: {ordinal: state}; matches Redis BITFIELD u2 layout (big-endian within a byte)
+    bitmap = bytearray((seat_count * BITS_PER_SEAT + 7) // 8)
+    for ordinal, state in states.items():
+        bitmap[ordinal // 4] |= state << (6 - 2 * (ordinal % 4))
+    return bytes(bitmap)
+
+
+def write(redis_client, event_id, layout, states=None, hold_expiries=None):
+    # Replace the whole state for an event in one MULTI/EXEC, under a new layout version
+    layout = dict(layout, version=uuid.uuid4().hex)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.set(layout_key(event_id), json.dumps(layout))
+    pipe.set(version_key(event_id), layout['version'])
+    pipe.set(bitmap_key(event_id), pack(states or {}, layout['seat_count']))
+    pipe.delete(expiry_key(event_id))
+    if hold_expiries:
+        pipe.zadd(expiry_key(event_id), hold_expiries)
+    pipe.execute()
+    _layouts[event_id] = layout
+
+
+def snapshot(redis_client, event_id):
+    script = redis_client.register_script(SNAPSHOT_SCRIPT)
+
+    def run(layout):
+        if layout is None:
+            return None, None
+        bitmap = script(keys=[bitmap_key(event_id), expiry_key(event_id), version_key(event_id)],
+                        args=[now_ms(), layout_version(layout)])
+        return layout, bitmap or b''
+    return with_layout(redis_client, event_id, run)
+
+
+def encode_snapshot(event_id, layout, bitmap):
+    return {
+        'event_id': event_id,
+        'encoding': 'u2',
+        'states': {str(k): v for k, v in STATE_NAMES.items()},
+        'layout': layout,
+        'seat_state': base64.b64encode(bitmap).decode('ascii')
+    }
+
+
+def rebuild(redis_client, event_id, layout, sold_ticket_ids, held_ticket_ttls):
+    # sold_ticket_ids: iterable of ticket ids sold in DynamoDB
+    # held_ticket_ttls: {ticket_id: remaining hold ttl in ms} read from the hold keys
+    states = {}
+    for ordinal in ticket_ordinals(event_id, list(sold_ticket_ids), layout):
+        states[ordinal] = SOLD
+    hold_expiries = {}
+    now = now_ms()
+    held_ids = list(held_ticket_ttls)
+    for ticket_id, ordinal in zip(held_ids, ticket_ordinals(event_id, held_ids, layout)):
+        if states.get(ordinal) != SOLD:
+            states[ordinal] = HELD
+            hold_expiries[ordinal] = now + held_ticket_ttls[ticket_id]
+    write(redis_client, event_id, layout, states, hold_expiries)
+    return {'sold': sum(1 for s in states.values() if s == SOLD), 'held': len(hold_expiries)}
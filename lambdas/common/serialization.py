@@ -0,0 +1,120 @@
+import base64
+import json
+from decimal import Decimal
+from itertools import islice
+
+# Compact JSON for DynamoDB data. boto3's resource layer returns numbers as Decimal, while raw
+# attribute values (low-level client, stream images) carry them as strings. Both become
+# int when integral and float otherwise, sets become lists and binary becomes base64.
+STREAM_CHUNK_SIZE = 500
+# Prices and counts repeat across items, so converted numbers are memoized
+NUMBER_CACHE_SIZE = 4096
+_numbers = {}
+
+
+def number(value):
+    # Decimal or the string form of an N attribute
+    result = _numbers.get(value)
+    if result is None:
+        if type(value) is str:
+            try:
+                result = int(value)
+            except ValueError:
+                result = float(value)
+        else:
+            result = float(value) if value % 1 else int(value)
+        if len(_numbers) < NUMBER_CACHE_SIZE:
+            _numbers[value] = result
+    return result
+
+
+def default(obj):
+    # json hook for values the C encoder does not know; hot path first
+    if type(obj) is Decimal:
+        return number(obj)
+    if isinstance(obj, (set, frozenset)):
+        return [number(v) if type(v) is Decimal else v for v in obj]
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode()
+    # boto3.dynamodb.types.Binary, without importing boto3
+    if isinstance(getattr(obj, 'value', None), bytes):
+        return base64.b64encode(obj.value).decode()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def plain(value):
+    # JSON-ready copy of boto3 / TypeDeserializer output, for callers that need the data
+    # rather than its encoding
+    t = type(value)
+    if t is str or t is int or t is float or t is bool or value is None:
+        return value
+    if t is Decimal:
+        return number(value)
+    if t is dict:
+        return {k: plain(v) for k, v in value.items()}
+    if t is list or t is tuple:
+        return [plain(v) for v in value]
+    return default(value)
+
+
+def from_attribute(attribute):
+    # One raw attribute value ({'S': ...}, {'N': ...}, {'M': ...}, ...) straight to JSON-ready
+    # data, skipping the Decimal round trip of TypeDeserializer
+    (kind, value), = attribute.items()
+    if kind == 'S':
+        return value
+    if kind == 'N':
+        return number(value)
+    if kind == 'M':
+        return {k: from_attribute(v) for k, v in value.items()}
+    if kind == 'L':
+        return [from_attribute(v) for v in value]
+    if kind == 'BOOL':
+        return value
+    if kind == 'NULL':
+        return None
+    if kind == 'SS':
+        return value
+    if kind == 'NS':
+        return [number(v) for v in value]
+    if kind == 'B':
+        return value if type(value) is str else base64.b64encode(value).decode()
+    if kind == 'BS':
+        return [v if type(v) is str else base64.b64encode(v).decode() for v in value]
+    raise ValueError(f"Unknown attribute type {kind}")
+
+
+def from_item(item):
+    return {k: from_attribute(v) for k, v in item.items()}
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), default=default)
+
+
+def dumps(value):
+    return _encoder.encode(value)
+
+
+def iter_list(items, key=None, extra=None):
+    # Encodes a (possibly lazy) sequence as a JSON array, STREAM_CHUNK_SIZE items per C
+    # encoder call; with `key` the array is wrapped as {"key": [...]}, followed by the
+    # members of `extra` if given
+    items = iter(items)
+    yield '{' + _encoder.encode(key) + ':[' if key is not None else '['
+    separator = ''
+    while True:
+        chunk = list(islice(items, STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        yield separator + _encoder.encode(chunk)[1:-1]
+        separator = ','
+    if key is None:
+        yield ']'
+    elif extra:
+        yield '],' + _encoder.encode(extra)[1:-1] + '}'
+    else:
+        yield ']}'
+
+
+def dumps_list(items, key=None, extra=None):
+    return ''.join(iter_list(items, key, extra))
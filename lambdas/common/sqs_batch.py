@@ -0,0 +1,5 @@
+# Response of an SQS-triggered lambda. The event source mapping has
+# ReportBatchItemFailures on, so only the messages listed here go back to the queue;
+# the rest of the batch is deleted.
+def item_failures(message_ids):
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in message_ids]}
@@ -0,0 +1,239 @@
+import math
+import os
+import random
+import time
+
+from botocore.exceptions import ClientError
+
+from common import cache
+
+# Write-sharded available-ticket counter. An event's count is split across N items in
+# Event_counter_table (keyed "<event_id>#<shard>"), each with its own available_tickets;
+# a purchase decrements one shard chosen at random, so concurrent buyers of one event
+# land on different items instead of conflicting on the Event_table item. Each shard
+# still carries the `available_tickets >= :count` condition, so no shard goes negative
+# and the sum never undercounts the seats actually sold.
+#
+# Event_table.counter_shards records N. Events without it (created before sharding)
+# keep counting on Event_table.available_tickets until resharded.
+COUNTER_TABLE = os.environ.get('COUNTER_TABLE', 'Event_counter_table')
+# Purchases per second one shard is sized for. A transactional write costs two WCUs and
+# conflicts well before an item's 1000 WCU/s limit, so this stays conservative.
+PURCHASES_PER_SHARD = int(os.environ.get('COUNTER_PURCHASES_PER_SHARD', 100))
+# Keeps a reshard (old shards + new shards + Event_table) inside one 100-item transaction
+MAX_SHARDS = 40
+# Summed totals served to readers may be this stale
+TOTAL_CACHE_SECONDS = float(os.environ.get('AVAILABLE_CACHE_SECONDS', 1))
+READ_RETRIES = 5
+
+_totals = {}
+
+
+def shards_for_demand(purchases_per_second):
+    return max(1, min(MAX_SHARDS, math.ceil(float(purchases_per_second) / PURCHASES_PER_SHARD)))
+
+
+def shard_key(event_id, shard):
+    return f"{event_id}#{shard}"
+
+
+def split(total, shard_count):
+    base, extra = divmod(total, shard_count)
+    return [base + (1 if shard < extra else 0) for shard in range(shard_count)]
+
+
+def counter_key(event_id, shard):
+    # shard None is the unsharded Event_table counter
+    if shard is None:
+        return 'Event_table', {'event_id': {'S': event_id}}
+    return COUNTER_TABLE, {'shard_id': {'S': shard_key(event_id, shard)}}
+
+
+def decrement(event_id, shard, count):
+    table_name, key = counter_key(event_id, shard)
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': key,
+            'UpdateExpression': "SET available_tickets = available_tickets - :count",
+            'ConditionExpression': "available_tickets >= :count",
+            'ExpressionAttributeValues': {':count': {'N': str(count)}}
+        }
+    }
+
+
+def increment(event_id, shard, count):
+    table_name, key = counter_key(event_id, shard)
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': key,
+            'UpdateExpression': "SET available_tickets = available_tickets + :count",
+            'ExpressionAttributeValues': {':count': {'N': str(count)}}
+        }
+    }
+
+
+def shard_count(dynamodb, event_id, refresh=False):
+    # 0 means the event still counts on Event_table. Served from the event metadata cache;
+    # a stale count is corrected by the refresh after a shard refuses a purchase.
+    if not refresh:
+        item = cache.event(event_id) or {}
+        return int(item.get('counter_shards', 0))
+    cache.events.discard(event_id)
+    item = dynamodb.get_item(
+        TableName='Event_table',
+        Key={'event_id': {'S': event_id}},
+        ProjectionExpression='counter_shards',
+        ConsistentRead=True
+    ).get('Item', {})
+    return int(item['counter_shards']['N']) if 'counter_shards' in item else 0
+
+
+def pick_shard(shard_count, candidates=None):
+    if not shard_count:
+        return None
+    if candidates:
+        return random.choice(candidates)
+    return random.randrange(shard_count)
+
+
+def read_shards(dynamodb, event_id, shard_count):
+    # Strongly consistent per-shard counts, in shard order
+    if not shard_count:
+        item = dynamodb.get_item(
+            TableName='Event_table',
+            Key={'event_id': {'S': event_id}},
+            ProjectionExpression='available_tickets',
+            ConsistentRead=True
+        ).get('Item', {})
+        return [int(item['available_tickets']['N'])] if 'available_tickets' in item else [0]
+    counts = {}
+    request = {COUNTER_TABLE: {
+        'Keys': [{'shard_id': {'S': shard_key(event_id, shard)}} for shard in range(shard_count)],
+        'ConsistentRead': True
+    }}
+    for attempt in range(READ_RETRIES + 1):
+        response = dynamodb.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(COUNTER_TABLE, []):
+            counts[item['shard_id']['S']] = int(item['available_tickets']['N'])
+        request = response.get('UnprocessedKeys')
+        if not request:
+            break
+        if attempt == READ_RETRIES:
+            raise RuntimeError(f"Could not read counter shards for {event_id}")
+        time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+    return [counts.get(shard_key(event_id, shard), 0) for shard in range(shard_count)]
+
+
+def total(dynamodb, event_id, max_age=None):
+    # Sum of the shards, cached for TOTAL_CACHE_SECONDS (max_age=0 reads through)
+    max_age = TOTAL_CACHE_SECONDS if max_age is None else max_age
+    cached = _totals.get(event_id)
+    if cached and cached[0] + max_age > time.time():
+        return cached[1]
+    count = sum(read_shards(dynamodb, event_id, shard_count(dynamodb, event_id)))
+    _totals[event_id] = (time.time(), count)
+    return count
+
+
+def candidates(counts, need):
+    return [shard for shard, count in enumerate(counts) if count >= need]
+
+
+def rebalance(dynamodb, event_id, counts, need):
+    # Near sell-out the remaining seats can be spread so thin that no shard covers a
+    # purchase. Concentrates them on as few shards as it takes for each to cover `need`;
+    # conditional on the counts read, so a concurrent purchase makes this a no-op.
+    # Returns the new counts, or None if it lost the race.
+    used = max(1, min(len(counts), sum(counts) // max(need, 1)))
+    target = split(sum(counts), used) + [0] * (len(counts) - used)
+    transact_items = []
+    for shard, (old, new) in enumerate(zip(counts, target)):
+        if old == new:
+            continue
+        table_name, key = counter_key(event_id, shard)
+        transact_items.append({
+            'Update': {
+                'TableName': table_name,
+                'Key': key,
+                'UpdateExpression': "SET available_tickets = :new",
+                'ConditionExpression': "available_tickets = :old",
+                'ExpressionAttributeValues': {':new': {'N': str(new)}, ':old': {'N': str(old)}}
+            }
+        })
+    if transact_items:
+        try:
+            dynamodb.transact_write_items(TransactItems=transact_items)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                raise
+            return None
+    return target
+
+
+def initialize(dynamodb, event_id, available, shard_count):
+    # Writes the shards of a new event; Event_table.counter_shards is set by the caller
+    transact_items = [{
+        'Put': {
+            'TableName': COUNTER_TABLE,
+            'Item': {
+                'shard_id': {'S': shard_key(event_id, shard)},
+                'event_id': {'S': event_id},
+                'available_tickets': {'N': str(count)}
+            }
+        }
+    } for shard, count in enumerate(split(available, shard_count))]
+    dynamodb.transact_write_items(TransactItems=transact_items)
+    cache.events.discard(event_id)
+
+
+def reshard(dynamodb, event_id, new_count):
+    # Moves the event to `new_count` shards in one transaction, keeping the total. Works
+    # from an unsharded event too. Raises TransactionCanceledException if a purchase
+    # lands in between; the caller retries.
+    new_count = max(1, min(MAX_SHARDS, int(new_count)))
+    old_count = shard_count(dynamodb, event_id, refresh=True)
+    counts = read_shards(dynamodb, event_id, old_count)
+    target = split(sum(counts), new_count)
+    transact_items = []
+    for shard in range(max(old_count, new_count)):
+        table_name, key = counter_key(event_id, shard)
+        if shard < old_count and shard < new_count:
+            transact_items.append({'Update': {
+                'TableName': table_name, 'Key': key,
+                'UpdateExpression': "SET available_tickets = :new",
+                'ConditionExpression': "available_tickets = :old",
+                'ExpressionAttributeValues': {':new': {'N': str(target[shard])}, ':old': {'N': str(counts[shard])}}
+            }})
+        elif shard < new_count:
+            transact_items.append({'Put': {
+                'TableName': table_name,
+                'Item': {**key, 'event_id': {'S': event_id}, 'available_tickets': {'N': str(target[shard])}},
+                'ConditionExpression': "attribute_not_exists(shard_id)"
+            }})
+        else:
+            transact_items.append({'Delete': {
+                'TableName': table_name, 'Key': key,
+                'ConditionExpression': "available_tickets = :old",
+                'ExpressionAttributeValues': {':old': {'N': str(counts[shard])}}
+            }})
+    if old_count:
+        condition = "counter_shards = :old_shards"
+        values = {':old_shards': {'N': str(old_count)}}
+    else:
+        # The Event_table item was the counter; pin it so no purchase slips past, then
+        # drop it so a container still on the old shard count is refused and re-reads
+        condition = "attribute_not_exists(counter_shards) AND available_tickets = :old"
+        values = {':old': {'N': str(counts[0])}}
+    transact_items.append({'Update': {
+        'TableName': 'Event_table',
+        'Key': {'event_id': {'S': event_id}},
+        'UpdateExpression': "SET counter_shards = :shards" + ("" if old_count else " REMOVE available_tickets"),
+        'ConditionExpression': condition,
+        'ExpressionAttributeValues': {':shards': {'N': str(new_count)}, **values}
+    }})
+    dynamodb.transact_write_items(TransactItems=transact_items)
+    cache.events.discard(event_id)
+    _totals.pop(event_id, None)
+    return {'counter_shards': new_count, 'available_tickets': sum(target)}
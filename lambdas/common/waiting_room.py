@@ -0,0 +1,192 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+
+# Virtual waiting room. Arrivals get a FIFO position from a per-event counter; an
+# admission cursor advances at `rate` visitors per second (computed lazily inside Redis
+# on every status poll), and visitors at or behind the cursor receive a signed admission
+# token. Booking routes only verify the token's HMAC, which costs no Redis round trip.
+# Without WAITING_ROOM_SECRET no room can be enabled and no token verifies.
+SECRET = os.environ.get('WAITING_ROOM_SECRET')
+ADMISSION_TTL_SECONDS = int(os.environ.get('ADMISSION_TTL_SECONDS', 900))
+TOKEN_HEADER = 'x-admission-token'
+# How long a warm container trusts its copy of an event's waiting-room config
+CONFIG_CACHE_SECONDS = 5
+STATS_TTL_SECONDS = 24 * 3600
+
+# KEYS = [state hash, visitors hash]; ARGV = [visitor_id]
+JOIN_SCRIPT = """
+local position = redis.call('HGET', KEYS[2], ARGV[1])
+if not position then
+    position = redis.call('HINCRBY', KEYS[1], 'joined', 1)
+    redis.call('HSET', KEYS[2], ARGV[1], position)
+end
+return position
+"""
+
+# Advance the admission cursor by rate * elapsed, capped at the number of arrivals.
+# KEYS = [state hash]; ARGV = [now_ms]
+ADVANCE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'rate', 'admitted', 'updated_ms', 'joined')
+local rate = tonumber(state[1]) or 0
+local admitted = tonumber(state[2]) or 0
+local updated = tonumber(state[3]) or tonumber(ARGV[1])
+local joined = tonumber(state[4]) or 0
+admitted = math.min(joined, admitted + rate * (tonumber(ARGV[1]) - updated) / 1000)
+redis.call('HSET', KEYS[1], 'admitted', tostring(admitted), 'updated_ms', ARGV[1])
+return {tostring(admitted), tostring(rate), joined}
+"""
+
+_configs = {}
+
+
+def state_key(event_id):
+    return f"waitroom:{{{event_id}}}"
+
+
+def visitors_key(event_id):
+    return f"waitroom:{{{event_id}}}:visitors"
+
+
+def admitted_key(event_id):
+    return f"waitroom:{{{event_id}}}:admitted"
+
+
+def stats_key(event_id):
+    return f"waitroom:{{{event_id}}}:stats"
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def configure(redis_client, event_id, rate, enabled=True):
+    if enabled and not SECRET:
+        raise RuntimeError('WAITING_ROOM_SECRET is not configured')
+    # Bring the cursor up to date at the old rate before switching to the new one
+    advance(redis_client, event_id)
+    redis_client.hset(state_key(event_id), mapping={'rate': rate, 'enabled': 1 if enabled else 0})
+    _configs.pop(event_id, None)
+
+
+def is_active(redis_client, event_id):
+    cached = _configs.get(event_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    active = redis_client.hget(state_key(event_id), 'enabled') == b'1'
+    _configs[event_id] = (time.monotonic() + CONFIG_CACHE_SECONDS, active)
+    return active
+
+
+def advance(redis_client, event_id):
+    admitted, rate, joined = redis_client.register_script(ADVANCE_SCRIPT)(keys=[state_key(event_id)], args=[now_ms()])
+    return float(admitted), float(rate), int(joined)
+
+
+def record(redis_client, event_id, metric, count=1):
+    minute = int(time.time() // 60)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hincrby(stats_key(event_id), f"{metric}:{minute}", count)
+    pipe.expire(stats_key(event_id), STATS_TTL_SECONDS)
+    pipe.execute()
+
+
+def sign(payload):
+    if not SECRET:
+        raise RuntimeError('WAITING_ROOM_SECRET is not configured')
+    return hmac.new(SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_token(event_id, visitor_id):
+    expires = int(time.time()) + ADMISSION_TTL_SECONDS
+    payload = base64.urlsafe_b64encode(json.dumps([event_id, visitor_id, expires]).encode()).decode()
+    return f"{payload}.{sign(payload)}", expires
+
+
+def verify_token(token, event_id):
+    # Returns the admitted visitor_id, or None if the token is missing, forged or expired
+    if not SECRET or not token or '.' not in token:
+        return None
+    payload, signature = token.rsplit('.', 1)
+    if not hmac.compare_digest(signature, sign(payload)):
+        return None
+    try:
+        token_event_id, visitor_id, expires = json.loads(base64.urlsafe_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    if token_event_id != event_id or expires < time.time():
+        return None
+    return visitor_id
+
+
+def request_token(event):
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == TOKEN_HEADER:
+            return value
+    return None
+
+
+def is_admitted(redis_client, event, event_id):
+    if not is_active(redis_client, event_id):
+        return True
+    return verify_token(request_token(event), event_id) is not None
+
+
+def join(redis_client, event_id, visitor_id=None):
+    visitor_id = visitor_id or str(uuid.uuid4())
+    script = redis_client.register_script(JOIN_SCRIPT)
+    position = int(script(keys=[state_key(event_id), visitors_key(event_id)], args=[visitor_id]))
+    return visitor_id, position
+
+
+def status(redis_client, event_id, visitor_id):
+    position = redis_client.hget(visitors_key(event_id), visitor_id)
+    if position is None:
+        return None
+    position = int(position)
+    admitted, rate, joined = advance(redis_client, event_id)
+    result = {'event_id': event_id, 'visitor_id': visitor_id, 'position': position, 'queue_length': joined}
+    if position <= admitted:
+        token, expires = issue_token(event_id, visitor_id)
+        # Count each visitor's admission once, not every poll after it
+        if redis_client.hsetnx(admitted_key(event_id), visitor_id, now_ms()):
+            record(redis_client, event_id, 'admitted')
+        result.update({'admitted': True, 'admission_token': token, 'expires_at': expires})
+    else:
+        ahead = position - int(admitted) - 1
+        result.update({
+            'admitted': False,
+            'ahead': ahead,
+            'eta_seconds': round((position - admitted) / rate, 1) if rate > 0 else None
+        })
+    return result
+
+
+def metrics(redis_client, event_id, minutes=15):
+    admitted, rate, joined = advance(redis_client, event_id)
+    stats = redis_client.hgetall(stats_key(event_id))
+    current = int(time.time() // 60)
+    series = []
+    for minute in range(current - minutes + 1, current + 1):
+        series.append({
+            'minute': minute * 60,
+            'admitted': int(stats.get(f"admitted:{minute}".encode(), 0)),
+            'purchased': int(stats.get(f"purchased:{minute}".encode(), 0))
+        })
+    recent = series[-5:]
+    admitted_recent = sum(m['admitted'] for m in recent)
+    purchased_recent = sum(m['purchased'] for m in recent)
+    return {
+        'event_id': event_id,
+        'rate': rate,
+        'joined': joined,
+        'admission_cursor': int(admitted),
+        'queue_depth': max(0, joined - int(admitted)),
+        'admitted_per_second': round(admitted_recent / (60.0 * len(recent)), 3),
+        'purchases_per_second': round(purchased_recent / (60.0 * len(recent)), 3),
+        'series': series
+    }
@@ -1,36 +1,30 @@
+import base64
 import json
-import boto3
-import string
-import redis
-import requests
-from boto3.dynamodb.conditions import Key
 from decimal import Decimal
+from itertools import islice
 import os
 
-# Create DynamoDB resource and table handles
-dynamodb = boto3.resource('dynamodb')
-event_table = dynamodb.Table('Event_table')
-ticket_table = dynamodb.Table('Ticket_table')
-venue_table = dynamodb.Table('Venue_table')
+from common import cache, clients, dynamo_batch, event_deletion, event_search, holds, metrics, search_client, seat_state, serialization, ticket_counter, waiting_room
 
-redis_client = redis.StrictRedis(
-    host=os.environ.get('REDIS_HOST', 'redis-ticket-if7udi.serverless.usw2.cache.amazonaws.com'),
-    port=int(os.environ.get('REDIS_PORT', 6379)), 
-    db=0,
-    ssl=bool(os.environ.get('REDIS_SSL', True))
-)
+# DynamoDB and Redis handles, created on first use (see common.clients)
+dynamodb_client = clients.lazy('dynamodb_client')
+event_table = clients.table('Event_table')
+ticket_table = clients.table('Ticket_table')
+redis_client = clients.lazy('redis')
+sqs = clients.lazy('sqs')
 
 # OpenSearch configuration via environment variables
 OPENSEARCH_URL = os.environ.get('OPENSEARCH_URL', 'https://search-ticketmasterdomain-o6opkdsmctza4ui7frhdsg6e2q.us-west-2.es.amazonaws.com/event/_search')
-OPENSEARCH_USER = os.environ.get('OPENSEARCH_USER')
-OPENSEARCH_PASS = os.environ.get('OPENSEARCH_PASS')
 
-alphabet = string.ascii_uppercase
+# Bulk ticket loader tuning
+TICKET_LOAD_WORKERS = int(os.environ.get('TICKET_LOAD_WORKERS', 8))
+TICKET_LOAD_SEGMENT_SIZE = int(os.environ.get('TICKET_LOAD_SEGMENT_SIZE', 500))
+# Stop scheduling new segments when less than this much Lambda time is left
+TICKET_LOAD_TIME_MARGIN_MS = int(os.environ.get('TICKET_LOAD_TIME_MARGIN_MS', 5000))
 
-def decimal_default(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError
+# Seats per availability response page; clients follow the returned cursor for the rest
+AVAILABILITY_PAGE_SIZE = int(os.environ.get('AVAILABILITY_PAGE_SIZE', 5000))
+AVAILABILITY_MAX_PAGE_SIZE = 20000
 
 def validate_event_data(event):
     required_fields = ['event_id', 'event_name', 'event_date', 'venue_id', 'ticket_price']
@@ -39,43 +33,125 @@ def validate_event_data(event):
             return False, f"Missing required field: {field}"
     return True, ""
 
-def generate_seat_map(row_count, seats_per_row):
-    seat_map = []
-    for row_num in range(row_count):
-        row = alphabet[row_num]
-        for seat_num in range(1, seats_per_row + 1):
-            seat_map.append(f"{row}{seat_num}")
-    return seat_map
+def counter_shards_for(event):
+    # Explicit counter_shards wins; otherwise sized from expected_demand (peak purchases per second)
+    if 'counter_shards' in event:
+        return max(1, min(ticket_counter.MAX_SHARDS, int(event['counter_shards'])))
+    return ticket_counter.shards_for_demand(event.get('expected_demand', 0))
 
-def get_venue_seat_info(venue_id):
-    response = venue_table.get_item(Key={'venue_id': venue_id})
-    if 'Item' in response:
-        if 'row_count' not in response['Item'] or 'seats_per_row' not in response['Item']:
-            raise ValueError("Seat info missing: row_count or seats_per_row is missing in the venue data.")
-        row_count = int(response['Item']['row_count'])
-        seats_per_row = int(response['Item']['seats_per_row'])
-        return row_count, seats_per_row
-    else:
+def generate_seat_map(layout):
+    # Yields (seat_number, section) row by row, front to back, in seat-state ordinal
+    # order; a generator, so a stadium map is never held in memory
+    sections = layout.get('sections') or [None]
+    for section in sections:
+        first_row = section['first_row'] if section else 0
+        last_row = section['last_row'] if section else layout['row_count'] - 1
+        for row_num in range(first_row, last_row + 1):
+            row = seat_state.row_label(row_num)
+            for seat_num in range(1, layout['seats_per_row'] + 1):
+                yield f"{row}{seat_num}", section
+
+def get_venue(venue_id):
+    # Venue layouts rarely change; warm containers serve them from common.cache
+    venue = cache.venue(venue_id)
+    if not venue:
         raise ValueError("Venue not found.")
+    if 'row_count' not in venue or 'seats_per_row' not in venue:
+        raise ValueError("Seat info missing: row_count or seats_per_row is missing in the venue data.")
+    return venue
+
+def get_venue_seat_info(venue_id):
+    venue = get_venue(venue_id)
+    return int(venue['row_count']), int(venue['seats_per_row'])
+
+def build_event_layout(venue, ticket_price, section_prices=None):
+    # Venue_table sections: [{'name', 'rows', 'price'}]; an event's section_prices override
+    # the venue's, and sections without either sell at the event's ticket_price
+    section_prices = section_prices or {}
+    sections = [
+        {'name': section['name'], 'rows': section['rows'],
+         'price': section_prices.get(section['name'], section.get('price', ticket_price))}
+        for section in venue.get('sections', [])
+    ]
+    return seat_state.build_layout(int(venue['row_count']), int(venue['seats_per_row']), sections)
 
-def create_tickets_for_event(event_id, seat_map, ticket_price, venue_id, event_date):
-    for seat in seat_map:
-        ticket_id = f"{event_id}_{seat}"
-        ticket_table.put_item(
-            Item={
-                'ticket_id': ticket_id,
-                'event_id': event_id,
-                'seat_number': seat,
-                'ticket_price': ticket_price,
-                'venue_id': venue_id,
-                'event_date': event_date,
-                'ticket_status': "available",
-                'redis_status' : 'non-exist'
-            }
+def dynamo_price(price):
+    # boto3 rejects float; JSON and cached metadata hand prices over as int or float
+    return Decimal(str(price)) if isinstance(price, float) else price
+
+def build_ticket_item(event_id, seat, ticket_price, venue_id, event_date, section=None):
+    item = {
+        'ticket_id': f"{event_id}_{seat}",
+        'event_id': event_id,
+        'seat_number': seat,
+        'ticket_price': dynamo_price(ticket_price),
+        'venue_id': venue_id,
+        'event_date': event_date,
+        'ticket_status': "available",
+        'redis_status' : 'non-exist'
+    }
+    if section:
+        item['section'] = section['name']
+        item['ticket_price'] = dynamo_price(section['price'])
+    return item
+
+def save_ticket_checkpoint(event_id, checkpoint):
+    event_table.update_item(
+        Key={'event_id': event_id},
+        UpdateExpression="SET ticket_load_checkpoint=:checkpoint",
+        ExpressionAttributeValues={':checkpoint': checkpoint}
+    )
+
+def create_tickets_for_event(event_id, seat_map, ticket_price, venue_id, event_date, start=0, context=None):
+    # Seats are written in seat_map order, so the checkpoint is simply the number of
+    # leading seats already stored; a retried invocation resumes from there.
+    requests_iter = (
+        dynamo_batch.put_request(build_ticket_item(event_id, seat, ticket_price, venue_id, event_date, section))
+        for seat, section in islice(seat_map, start, None)
+    )
+    should_stop = None
+    if context is not None:
+        should_stop = lambda: context.get_remaining_time_in_millis() < TICKET_LOAD_TIME_MARGIN_MS
+
+    result = dynamo_batch.bulk_write(
+        dynamodb_client,
+        'Ticket_table',
+        requests_iter,
+        workers=TICKET_LOAD_WORKERS,
+        segment_size=TICKET_LOAD_SEGMENT_SIZE,
+        on_checkpoint=lambda written: save_ticket_checkpoint(event_id, start + written),
+        should_stop=should_stop
+    )
+    checkpoint = start + result['checkpoint']
+    if result['complete']:
+        event_table.update_item(
+            Key={'event_id': event_id},
+            UpdateExpression="SET ticket_load_status=:status, ticket_load_checkpoint=:checkpoint",
+            ExpressionAttributeValues={':status': 'complete', ':checkpoint': checkpoint}
         )
-    return {'statusCode': 200, 'body': json.dumps({'message': 'Tickets successfully created'})}
+        message = 'Tickets successfully created'
+    else:
+        message = 'Ticket creation paused before timeout; resubmit the event to resume'
+    return {
+        'statusCode': 200 if result['complete'] else 202,
+        'body': json.dumps({
+            'message': message,
+            'tickets_written': result['written'],
+            'checkpoint': checkpoint,
+            'seconds': result['seconds'],
+            'tickets_per_second': result['items_per_second']
+        })
+    }
 
-def create_item(event):
+def event_exists_response(existing):
+    return {'statusCode': 409, 'body': json.dumps({
+        'error': 'Event already exists',
+        'event_id': existing.get('event_id'),
+        'ticket_load_status': existing.get('ticket_load_status'),
+        'deletion_status': existing.get('deletion_status')
+    })}
+
+def create_item(event, context=None):
     is_valid, message = validate_event_data(event)
     if not is_valid:
         return {'statusCode': 400, 'body': json.dumps({'error': message})}
@@ -86,43 +162,207 @@ def create_item(event):
     venue_id = event['venue_id']
     ticket_price = event['ticket_price']
 
-    row_count, seats_per_row = get_venue_seat_info(venue_id)
-    if row_count is None or seats_per_row is None:
-        return {'statusCode': 404, 'body': json.dumps({'error': 'Venue not found or seat info missing'})}
+    section_prices = event.get('section_prices') or {}
 
-    event_table.put_item(
-        Item={
-            'event_id': event_id,
-            'event_name': event_name,
-            'event_date': event_date,
-            'venue_id': venue_id,
-            'ticket_price': ticket_price,
-            'available_tickets': row_count * seats_per_row
-        }
-    )
+    # Resume an interrupted ticket load instead of starting over
+    existing = event_table.get_item(Key={'event_id': event_id}, ConsistentRead=True).get('Item')
+    if existing and (existing.get('ticket_load_status') != 'loading' or existing.get('deletion_status')):
+        # Re-creating would reset the counter and seat map and erase the event's sales
+        return event_exists_response(existing)
+    if existing:
+        # The rest of the seats match the ones already written, whatever this request says
+        venue_id, event_date = existing['venue_id'], existing['event_date']
+        ticket_price = serialization.plain(existing['ticket_price'])
+        section_prices = serialization.plain(existing.get('section_prices', {}))
+
+    try:
+        layout = build_event_layout(get_venue(venue_id), ticket_price, section_prices)
+    except ValueError as e:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'Venue not found or seat info missing', 'details': str(e)})}
+    row_count, seats_per_row = layout['row_count'], layout['seats_per_row']
 
-    seat_map = generate_seat_map(row_count, seats_per_row)
-    ticket_creation_response = create_tickets_for_event(event_id, seat_map, ticket_price, venue_id, event_date)
+    if existing:
+        start = int(existing.get('ticket_load_checkpoint', 0))
+    else:
+        start = 0
+        counter_shards = counter_shards_for(event)
+        # Purchases count down the Event_counter_table shards; available_tickets here stays the starting count
+        ticket_counter.initialize(dynamodb_client, event_id, row_count * seats_per_row, counter_shards)
+        try:
+            event_table.put_item(
+                Item={
+                    'event_id': event_id,
+                    'event_name': event_name,
+                    'event_date': event_date,
+                    'venue_id': venue_id,
+                    'ticket_price': dynamo_price(ticket_price),
+                    'available_tickets': row_count * seats_per_row,
+                    'counter_shards': counter_shards,
+                    'section_prices': {name: dynamo_price(price) for name, price in section_prices.items()},
+                    'ticket_load_status': 'loading',
+                    'ticket_load_checkpoint': 0
+                },
+                # A concurrent create of the same event_id got there first
+                ConditionExpression="attribute_not_exists(event_id)"
+            )
+        except event_table.meta.client.exceptions.ConditionalCheckFailedException:
+            return event_exists_response(event_table.get_item(Key={'event_id': event_id}, ConsistentRead=True).get('Item', {'event_id': event_id}))
+        cache.events.discard(event_id)
+        seat_state.write(redis_client, event_id, layout)
+
+    seat_map = generate_seat_map(layout)
+    ticket_creation_response = create_tickets_for_event(event_id, seat_map, ticket_price, venue_id, event_date, start=start, context=context)
+    ticket_creation = json.loads(ticket_creation_response['body'])
     return {
-        'statusCode': 200,
+        'statusCode': ticket_creation_response['statusCode'],
         'body': json.dumps({
-            'message': 'Event and Tickets successfully created',
+            'message': 'Event and Tickets successfully created' if ticket_creation_response['statusCode'] == 200 else 'Event created, ticket creation in progress',
             'event_id': event_id,
-            'tickets_status': json.loads(ticket_creation_response['body'])['message']
+            'tickets_status': ticket_creation['message'],
+            'tickets_written': ticket_creation['tickets_written'],
+            'tickets_total': row_count * seats_per_row,
+            'checkpoint': ticket_creation['checkpoint'],
+            'seconds': ticket_creation['seconds'],
+            'tickets_per_second': ticket_creation['tickets_per_second']
         })
     }
 
+def filter_held_tickets(tickets, event_id=None):
+    # One pipelined round trip per chunk instead of one EXISTS round trip per ticket
+    held = holds.held(redis_client, [ticket['ticket_id'] for ticket in tickets], event_id)
+    return [ticket for ticket in tickets if ticket['ticket_id'] not in held]
+
+def query_ticket_ids(event_id, ticket_status):
+    query_kwargs = {
+        'IndexName': 'event_id-ticket_status-index',
+        'KeyConditionExpression': 'event_id = :event_id AND ticket_status = :status',
+        'ExpressionAttributeValues': {':event_id': event_id, ':status': ticket_status},
+        'ProjectionExpression': 'ticket_id'
+    }
+    while True:
+        response = ticket_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            yield item['ticket_id']
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def rebuild_seat_state(event_id):
+    # Repopulate the Redis seat-state bitmap from Ticket_table and the live hold keys
+    event_item = cache.event(event_id)
+    if not event_item:
+        return None
+    layout = build_event_layout(get_venue(event_item['venue_id']), event_item.get('ticket_price'), event_item.get('section_prices'))
+    sold_ticket_ids = list(query_ticket_ids(event_id, 'sold'))
+    available_ticket_ids = list(query_ticket_ids(event_id, 'available'))
+    # Carries over holds still under the pre-hash-tag keys
+    holds.migrate(redis_client, event_id, available_ticket_ids)
+    held_ticket_ttls = holds.remaining_ms(redis_client, available_ticket_ids, event_id)
+    return seat_state.rebuild(redis_client, event_id, layout, sold_ticket_ids, held_ticket_ttls)
+
+def read_seat_state(event_id):
+    layout, bitmap = seat_state.snapshot(redis_client, event_id)
+    if layout is None:
+        if rebuild_seat_state(event_id) is None:
+            return {'statusCode': 404, 'body': json.dumps({'error': 'Event not found'})}
+        layout, bitmap = seat_state.snapshot(redis_client, event_id)
+    return {'statusCode': 200, 'body': json.dumps(seat_state.encode_snapshot(event_id, layout, bitmap))}
+
+def rebuild_item(event):
+    event_id = json.loads(event['body'])['event_id']
+    result = rebuild_seat_state(event_id)
+    if result is None:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'Event not found'})}
+    return {'statusCode': 200, 'body': json.dumps({'message': 'Seat state rebuilt', 'event_id': event_id, **result})}
+
+def read_availability(event_id):
+    # Summed across the counter shards and cached briefly, so polling clients do not fan out reads
+    available = ticket_counter.total(dynamodb_client, event_id)
+    return {'statusCode': 200, 'body': json.dumps({'event_id': event_id, 'available_tickets': available})}
+
+def reshard_counter(event):
+    event = json.loads(event['body'])
+    event_id = event['event_id']
+    if not cache.event(event_id):
+        return {'statusCode': 404, 'body': json.dumps({'error': 'Event not found'})}
+    try:
+        result = ticket_counter.reshard(dynamodb_client, event_id, counter_shards_for(event))
+    except dynamodb_client.exceptions.TransactionCanceledException:
+        return {'statusCode': 409, 'body': json.dumps({'error': 'Counter changed while resharding; retry', 'event_id': event_id})}
+    return {'statusCode': 200, 'body': json.dumps({'message': 'Counter resharded', 'event_id': event_id, **result})}
+
+def encode_cursor(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, separators=(',', ':')).encode()).decode()
+
+def decode_cursor(cursor, event_id):
+    # Raises ValueError for a cursor that is malformed or belongs to another event
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, dict) or key.get('event_id') != {'S': event_id}:
+        raise ValueError('Invalid cursor')
+    return key
+
+def available_ticket_pages(event_id, limit, start_key=None):
+    # Yields (tickets, last_evaluated_key) per GSI page (up to 1 MB each), projected to what
+    # the client needs. Each query asks for at most the seats still owed, so the last key
+    # is an exact cursor.
+    query_kwargs = {
+        'TableName': 'Ticket_table',
+        'IndexName': 'event_id-ticket_status-index',
+        'KeyConditionExpression': 'event_id = :event_id AND ticket_status = :status',
+        'ExpressionAttributeValues': {':event_id': {'S': event_id}, ':status': {'S': 'available'}},
+        'ProjectionExpression': 'ticket_id, seat_number, ticket_price'
+    }
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    remaining = limit
+    while remaining > 0:
+        query_kwargs['Limit'] = remaining
+        response = dynamodb_client.query(**query_kwargs)
+        items = response.get('Items', [])
+        remaining -= len(items)
+        last_key = response.get('LastEvaluatedKey')
+        yield [serialization.from_item(item) for item in items], last_key
+        if not last_key:
+            return
+        query_kwargs['ExclusiveStartKey'] = last_key
+
 def read_item(event):
-    event_id = event['queryStringParameters']['event_id']
-    ticket_response = ticket_table.query(
-        IndexName='event_id-ticket_status-index',
-        KeyConditionExpression=Key('event_id').eq(event_id) & Key('ticket_status').eq('available')
-    )
-    available_tickets = ticket_response.get('Items', [])
-    tickets_not_in_redis = [t for t in available_tickets if not redis_client.exists(t['ticket_id'])]
-    if not tickets_not_in_redis:
+    params = event['queryStringParameters']
+    event_id = params['event_id']
+    view = params.get('view')
+    if view == 'seatmap':
+        return read_seat_state(event_id)
+    if view == 'availability':
+        return read_availability(event_id)
+    if view == 'deletion':
+        return read_deletion(event_id)
+    # The full availability list is the expensive read during an on-sale
+    if not waiting_room.is_admitted(redis_client, event, event_id):
+        return {'statusCode': 403, 'body': json.dumps({'error': 'Admission required; join the waiting room first', 'event_id': event_id})}
+    try:
+        start_key = decode_cursor(params['cursor'], event_id) if params.get('cursor') else None
+        limit = min(int(params.get('limit', AVAILABILITY_PAGE_SIZE)), AVAILABILITY_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+    if limit < 1:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'limit must be positive'})}
+
+    # One response page at a time: memory is bounded by limit, not by the venue size
+    tickets_not_in_redis = []
+    last_key = None
+    for tickets, last_key in available_ticket_pages(event_id, limit, start_key):
+        tickets_not_in_redis.extend(filter_held_tickets(tickets, event_id))
+    cursor = encode_cursor(last_key)
+    if not tickets_not_in_redis and not cursor and not start_key:
         return {'statusCode' : 404, 'body': json.dumps({'message': 'No available tickets found'})}
-    return {'statusCode': 200, 'body': json.dumps({'available_tickets': tickets_not_in_redis}, default=decimal_default)}
+    # Held seats are dropped after the read, so a page can be short and still have a cursor
+    body = serialization.dumps_list(tickets_not_in_redis, key='available_tickets', extra={'cursor': cursor})
+    return {'statusCode': 200, 'body': body}
 
 def update_item(event):
     event = json.loads(event['body'])
@@ -138,28 +378,105 @@ def update_item(event):
         ':tickets': row_count * seats_per_row
     }
     response = event_table.update_item(Key={'event_id': event_id}, UpdateExpression=update_expression, ExpressionAttributeValues=expression_values, ReturnValues="UPDATED_NEW")
+    cache.events.discard(event_id)
     if 'Attributes' in response:
         return {'statusCode': 200, 'body': json.dumps({'message': 'Item successfully updated'})}
     else:
         return {'statusCode': 404, 'body': json.dumps({'error': 'Item not found'})}
 
+def read_deletion(event_id):
+    item = dynamodb_client.get_item(TableName='Event_table', Key={'event_id': {'S': event_id}}, ConsistentRead=True).get('Item')
+    progress = event_deletion.progress(redis_client, event_id, serialization.from_item(item) if item else None)
+    if progress is None:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'No deletion found for this event'})}
+    return {'statusCode': 200, 'body': json.dumps(progress)}
+
 def delete_item(event):
+    # Marks the event and queues the cascade; worker_delete removes the tickets, counter
+    # shards, holds and search document, then the item. Re-sending the request re-queues it.
     event = json.loads(event['body'])
     event_id = event['event_id']
-    response = event_table.delete_item(Key={'event_id': event_id})
-    if response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 200:
-        return {'statusCode': 200, 'body': json.dumps({'message': 'Item successfully deleted'})}
-    else:
+    if not event_deletion.QUEUE_URL:
+        # Checked before marking, so a misconfigured lambda cannot strand an event in 'deleting'
+        return {'statusCode': 500, 'body': json.dumps({'error': 'EVENT_DELETE_QUEUE_URL is not configured'})}
+    try:
+        event_table.update_item(
+            Key={'event_id': event_id},
+            UpdateExpression="SET deletion_status=:deleting, deletion_requested_at=if_not_exists(deletion_requested_at, :now)",
+            ConditionExpression="attribute_exists(event_id)",
+            ExpressionAttributeValues={':deleting': event_deletion.DELETING, ':now': event_deletion.now_iso()}
+        )
+    except event_table.meta.client.exceptions.ConditionalCheckFailedException:
         return {'statusCode': 404, 'body': json.dumps({'error': 'Item not found'})}
+    cache.events.discard(event_id)
+    try:
+        event_deletion.enqueue(sqs, event_id)
+    except sqs.exceptions.ClientError as e:
+        return {'statusCode': 500, 'body': json.dumps({
+            'error': 'Could not queue the deletion; send the request again',
+            'event_id': event_id,
+            'code': e.response.get('Error', {}).get('Code')
+        })}
+    return {'statusCode': 202, 'body': json.dumps({
+        'message': 'Event deletion started',
+        'event_id': event_id,
+        'status': event_deletion.DELETING
+    })}
+
+# Hold administration (support, on-sale resets)
+def list_holds(event):
+    params = event.get('queryStringParameters') or {}
+    event_id = params.get('event_id')
+    if not event_id:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'event_id is required'})}
+    try:
+        limit = int(params.get('limit', 100))
+    except ValueError:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'limit must be a number'})}
+    return {'statusCode': 200, 'body': json.dumps({
+        'event_id': event_id,
+        'held': holds.count(redis_client, event_id),
+        'holds': holds.active(redis_client, event_id, limit)
+    })}
+
+def release_all_holds(event):
+    event_id = json.loads(event['body']).get('event_id')
+    if not event_id:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'event_id is required'})}
+    released = holds.release_all(redis_client, event_id)
+    return {'statusCode': 200, 'body': json.dumps({'message': 'Holds released', 'event_id': event_id, 'released': released})}
+
+# Waiting-room administration; the public booking API only joins and polls the queue
+def configure_queue(event):
+    body = json.loads(event['body'])
+    event_id = body.get('event_id')
+    if not event_id or 'rate' not in body:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'event_id and rate are required'})}
+    try:
+        waiting_room.configure(redis_client, event_id, float(body['rate']), body.get('enabled', True))
+    except RuntimeError as e:
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    return {'statusCode': 200, 'body': json.dumps({'message': 'Waiting room updated', 'event_id': event_id})}
+
+def queue_metrics(event):
+    event_id = (event.get('queryStringParameters') or {}).get('event_id')
+    if not event_id:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'event_id is required'})}
+    return {'statusCode': 200, 'body': json.dumps(waiting_room.metrics(redis_client, event_id))}
 
 def search(event):
+    # Only the search route needs requests; importing it costs cold starts of the other routes
+    import requests
     event = json.loads(event['body'])
-    keyword = event['keyword']
-    query = {"query": {"match": {"event_name": keyword}}}
-    headers = {'Content-Type': 'application/json'}
     try:
-        response = requests.get(OPENSEARCH_URL, auth=(OPENSEARCH_USER, OPENSEARCH_PASS) if OPENSEARCH_USER and OPENSEARCH_PASS else None, headers=headers, data=json.dumps(query), timeout=10)
-        response.raise_for_status()
+        if event_search.is_advanced(event):
+            # Filtered / paginated / faceted mode; returns projected documents only
+            return {'statusCode': 200, 'body': serialization.dumps(event_search.search(OPENSEARCH_URL, event, redis_client=redis_client))}
+        keyword = search_client.normalize(event['keyword'])
+        query = {"query": {"match": {"event_name": keyword}}}
+        search_results = search_client.search(OPENSEARCH_URL, query, redis_client=redis_client)
+    except event_search.InvalidSearch as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
     except requests.exceptions.Timeout:
         return {'statusCode': 504, 'body': json.dumps({'error': 'OpenSearch request timed out'})}
     except requests.exceptions.ConnectionError as e:
@@ -168,22 +485,31 @@ def search(event):
         return {'statusCode': e.response.status_code, 'body': json.dumps({'error': 'OpenSearch HTTP error', 'details': e.response.text})}
     except requests.exceptions.RequestException as e:
         return {'statusCode': 500, 'body': json.dumps({'error': 'Request failed', 'details': str(e)})}
-    if response.status_code == 200:
-        search_results = response.json()
-        if search_results.get('hits', {}).get('total', {}).get('value', 0) > 0:
-            return {'statusCode': 200, 'body': json.dumps(search_results['hits']['hits'], default=decimal_default)}
-        else:
-            return {'statusCode': 404, 'body': json.dumps({'message': 'No events found for the given keyword'})}
+    if search_results.get('hits', {}).get('total', {}).get('value', 0) > 0:
+        return {'statusCode': 200, 'body': serialization.dumps(search_results['hits']['hits'])}
     else:
-        return {'statusCode': response.status_code, 'body': json.dumps({'error': 'Failed to fetch data from OpenSearch', 'details': response.text})}
+        return {'statusCode': 404, 'body': json.dumps({'message': 'No events found for the given keyword'})}
 
+@metrics.handler('event')
 def lambda_handler(event, context):
     http_method = event['httpMethod']
     path = event['path']
     if path == "/default/ticketmaster_event/search" and http_method =='POST':
         return search(event)
+    elif path == "/default/ticketmaster_event/seatmap/rebuild" and http_method == 'POST':
+        return rebuild_item(event)
+    elif path == "/default/ticketmaster_event/counter" and http_method == 'PUT':
+        return reshard_counter(event)
+    elif path == "/default/ticketmaster_event/holds" and http_method == 'GET':
+        return list_holds(event)
+    elif path == "/default/ticketmaster_event/holds/release-all" and http_method == 'POST':
+        return release_all_holds(event)
+    elif path == "/default/ticketmaster_event/queue/config" and http_method == 'PUT':
+        return configure_queue(event)
+    elif path == "/default/ticketmaster_event/queue/metrics" and http_method == 'GET':
+        return queue_metrics(event)
     elif http_method == 'POST':
-        return create_item(json.loads(event['body']))
+        return create_item(json.loads(event['body']), context)
     elif http_method == 'GET':
         return read_item(event)
     elif http_method == 'PUT':
@@ -1,48 +1,118 @@
-import boto3
+import redis
 import requests
 import json
-from decimal import Decimal
-from boto3.dynamodb.types import TypeDeserializer
+import random
+import time
 import os
 
-# OpenSearch settings from environment
+from common import cache, clients, event_search, metrics, search_client, serialization
+
+# OpenSearch settings from environment; indexing is skipped when OPENSEARCH_URL is unset
 OPENSEARCH_URL = os.environ.get('OPENSEARCH_URL')
-OPENSEARCH_USER = os.environ.get('OPENSEARCH_USER')
-OPENSEARCH_PASS = os.environ.get('OPENSEARCH_PASS')
+INDEX_NAME = 'event'
+# Attempts for documents that fail inside a _bulk response (429s, shard errors)
+BULK_RETRIES = 3
+BULK_BACKOFF = 0.2
+
+# Redis holds the search cache generation that this indexer bumps
+redis_client = clients.lazy('redis')
+
+def collect_operations(records):
+    # Keep only the latest operation per document; remember every stream record that
+    # contributed so a failure can be reported against all of them.
+    operations = {}
+    sequence_numbers = {}
+    for record in records:
+        # Venue_table's stream only drives cache invalidation
+        if cache.stream_table(record) not in (None, 'Event_table'):
+            continue
+        event_name = record.get('eventName')
+        keys = record['dynamodb'].get('Keys', {})
+        document_id = serialization.from_attribute(keys['event_id']) if 'event_id' in keys else None
+        if event_name in ('INSERT', 'MODIFY'):
+            # Stream images go straight from attribute values to JSON-ready documents
+            item = serialization.from_item(record['dynamodb']['NewImage'])
+            document_id = item.get('event_id', document_id)
+            # An event being deleted leaves search as soon as it is marked
+            document = {field: item[field] for field in event_search.DOCUMENT_FIELDS if field in item}
+            operation = ('delete', None) if 'deletion_status' in item else ('index', document)
+        elif event_name == 'REMOVE':
+            operation = ('delete', None)
+        else:
+            continue
+        if not document_id:
+            continue
+        operations.pop(document_id, None)
+        operations[document_id] = operation
+        sequence_numbers.setdefault(document_id, []).append(record['dynamodb']['SequenceNumber'])
+    return operations, sequence_numbers
+
 
-# Deserialize DynamoDB types
-deserializer = TypeDeserializer()
+def bulk_body(operations):
+    lines = []
+    for document_id, (action, item) in operations.items():
+        lines.append(json.dumps({action: {'_index': INDEX_NAME, '_id': document_id}}))
+        if action == 'index':
+            lines.append(serialization.dumps(item))
+    return '\n'.join(lines) + '\n'
 
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj) if obj % 1 else int(obj)
-        return super(DecimalEncoder, self).default(obj)
+def send_bulk(operations):
+    # Returns the document ids that failed
+    try:
+        response = search_client.session().post(
+            f"{OPENSEARCH_URL}/_bulk",
+            data=bulk_body(operations),
+            headers={'Content-Type': 'application/x-ndjson'},
+            timeout=30
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        return set(operations)
 
+    result = response.json()
+    if not result.get('errors'):
+        return set()
+    failed = set()
+    for document_id, entry in zip(operations, result.get('items', [])):
+        action, outcome = next(iter(entry.items()))
+        # Deleting a document that was never indexed is fine
+        if outcome.get('status', 500) >= 300 and not (action == 'delete' and outcome.get('status') == 404):
+            failed.add(document_id)
+    return failed
 
+
+@metrics.handler('upload')
 def lambda_handler(event, context):
-    # Send INSERT/MODIFY DynamoDB stream records to OpenSearch
-    for record in event.get('Records', []):
-        eventName = record.get('eventName')
-        if eventName in ('INSERT', 'MODIFY'):
-            newImage = record['dynamodb']['NewImage']
-            item = {k: deserializer.deserialize(v) for k, v in newImage.items()}
-            document_id = item.get('event_id')
-            if not OPENSEARCH_URL or not document_id:
-                continue
-            index_name = 'event'
-            url = f"{OPENSEARCH_URL}/{index_name}/_doc/{document_id}"
-            try:
-                requests.put(
-                    url,
-                    auth=(OPENSEARCH_USER, OPENSEARCH_PASS) if OPENSEARCH_USER and OPENSEARCH_PASS else None,
-                    json=json.loads(json.dumps(item, cls=DecimalEncoder)),
-                    headers={'Content-Type': 'application/json'},
-                    timeout=10
-                )
-            except Exception:
-                # Ignore indexing errors to avoid blocking stream processing
-                pass
-
-    return {'statusCode': 200, 'body': json.dumps('DynamoDB -> OpenSearch processing complete')}
+    # Index every DynamoDB stream record of the batch with one _bulk request
+    records = event.get('Records', [])
+    if records:
+        # Warm containers drop cached venue / event metadata on their next generation check
+        try:
+            cache.invalidate_for_records(records, redis_client)
+        except redis.RedisError:
+            # Cached metadata still expires after its TTL
+            pass
+    if not OPENSEARCH_URL:
+        return {'batchItemFailures': []}
+    operations, sequence_numbers = collect_operations(records)
+    pending = operations
+    for attempt in range(BULK_RETRIES + 1):
+        if not pending:
+            break
+        if attempt:
+            time.sleep(random.uniform(0, BULK_BACKOFF * (2 ** attempt)))
+        failed = send_bulk(pending)
+        pending = {document_id: pending[document_id] for document_id in failed}
+
+    if len(pending) < len(operations):
+        # Retire cached search results that may include the old documents
+        try:
+            search_client.invalidate(redis_client)
+        except redis.RedisError:
+            # Cached results still expire after SEARCH_CACHE_TTL_SECONDS
+            pass
+
+    # Lambda retries the batch from the lowest reported sequence number
+    failures = sorted({seq for document_id in pending for seq in sequence_numbers[document_id]}, key=int)
+    return {'batchItemFailures': [{'itemIdentifier': seq} for seq in failures]}
@@ -1,8 +1,10 @@
 import json
-import boto3
 
-s3 = boto3.client('s3')
+from common import clients, metrics
 
+s3 = clients.lazy('s3')
+
+@metrics.handler('image')
 def lambda_handler(event, context):
     filename = event['queryStringParameters']['filename']
     # generate a presigned URL for uploading an image
@@ -1,27 +1,216 @@
+import base64
 import json
-import json
-import boto3
-from botocore.exceptions import ClientError
-import json
-import boto3
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
-# DynamoDB and S3 clients
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('Image_table')
+from common import clients, image_index, metrics
+
+# DynamoDB table handle, created on first use (see common.clients)
+table = clients.table('Image_table')
+
+EVENT_INDEX = 'event_id-event_time-index'
+PREFIX_INDEX = 'image_prefix-image_id-index'
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_SCAN_SEGMENTS = 16
+# URLs per export response, split across the segments; keeps the body well under
+# Lambda's 6 MB response limit
+EXPORT_PAGE_SIZE = int(os.environ.get('IMAGE_EXPORT_PAGE_SIZE', 10000))
+# The first page of each listing is what the gallery loads; keep it briefly per container
+FIRST_PAGE_TTL_SECONDS = float(os.environ.get('IMAGE_FIRST_PAGE_TTL_SECONDS', 5))
+FIRST_PAGE_CACHE_SIZE = 256
+# Items examined per backfill response, split across the segments
+BACKFILL_PAGE_SIZE = int(os.environ.get('IMAGE_BACKFILL_PAGE_SIZE', 2000))
+
+_first_pages = {}
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+def encode_cursor(last_key):
+    return base64.urlsafe_b64encode(json.dumps(last_key).encode()).decode() if last_key else None
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise InvalidRequest('Invalid cursor')
+
+
+def page_size(params):
+    try:
+        size = int(params.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidRequest('page_size must be an integer')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def list_page(params):
+    # One page of image URLs through the event or prefix index; falls back to a paged
+    # scan when neither is given.
+    request = {'Limit': page_size(params), 'ProjectionExpression': 'image_url'}
+    if params.get('cursor'):
+        request['ExclusiveStartKey'] = decode_cursor(params['cursor'])
+
+    if params.get('event_id'):
+        request['IndexName'] = EVENT_INDEX
+        request['KeyConditionExpression'] = Key('event_id').eq(params['event_id'])
+        request['ScanIndexForward'] = False
+        response = table.query(**request)
+    elif params.get('prefix') and '/' in params['prefix']:
+        prefix = params['prefix']
+        request['IndexName'] = PREFIX_INDEX
+        request['KeyConditionExpression'] = Key('image_prefix').eq(prefix.split('/', 1)[0]) & Key('image_id').begins_with(prefix)
+        response = table.query(**request)
+    elif params.get('prefix'):
+        # The index is keyed by the whole top-level folder, so a partial one ("eve") is
+        # matched by a filtered scan; pages can come back short with a cursor
+        request['FilterExpression'] = Attr('image_id').begins_with(params['prefix'])
+        response = table.scan(**request)
+    else:
+        response = table.scan(**request)
+
+    return {
+        'image_urls': [item['image_url'] for item in response.get('Items', []) if item.get('image_url')],
+        'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
+
+def cached_first_page(params):
+    key = (params.get('event_id'), params.get('prefix'), page_size(params))
+    cached = _first_pages.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    page = list_page(params)
+    if len(_first_pages) >= FIRST_PAGE_CACHE_SIZE:
+        _first_pages.clear()
+    _first_pages[key] = (time.monotonic() + FIRST_PAGE_TTL_SECONDS, page)
+    return page
+
+
+def scan_segment(segment, total_segments, start_key, limit):
+    # Runs on a worker thread: use the thread-safe client rather than the Table resource.
+    # Returns (urls, last_key); last_key is None once the segment is exhausted.
+    urls = []
+    request = {'TableName': table.name, 'Segment': segment, 'TotalSegments': total_segments, 'ProjectionExpression': 'image_url'}
+    if start_key:
+        request['ExclusiveStartKey'] = start_key
+    while len(urls) < limit:
+        request['Limit'] = limit - len(urls)
+        response = table.meta.client.scan(**request)
+        urls.extend(item['image_url'] for item in response.get('Items', []) if item.get('image_url'))
+        if 'LastEvaluatedKey' not in response:
+            return urls, None
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return urls, request['ExclusiveStartKey']
+
+
+def scan_state(params):
+    # (segment count, {segment: start key}) for a fresh parallel scan or one resumed
+    # from the cursor, which carries each unfinished segment's position
+    if params.get('cursor'):
+        state = decode_cursor(params['cursor'])
+        try:
+            segments = int(state['segments'])
+            pending = {int(segment): key for segment, key in state['pending'].items()}
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise InvalidRequest('Invalid cursor')
+    else:
+        try:
+            segments = max(1, min(int(params.get('segments', 4)), MAX_SCAN_SEGMENTS))
+        except ValueError:
+            raise InvalidRequest('segments must be an integer')
+        pending = {segment: None for segment in range(segments)}
+    return segments, pending
+
+
+def scan_cursor(segments, pending, results):
+    pending = {str(segment): last_key for segment, (_, last_key) in zip(pending, results) if last_key}
+    return encode_cursor({'segments': segments, 'pending': pending}) if pending else None
+
+
+def export_all(params):
+    # Admin export: parallel segment scan of the whole table, EXPORT_PAGE_SIZE URLs per
+    # response
+    segments, pending = scan_state(params)
+    limit = max(1, EXPORT_PAGE_SIZE // len(pending)) if pending else 0
+    with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+        results = list(executor.map(lambda segment: scan_segment(segment, segments, pending[segment], limit), pending))
+    image_urls = [url for urls, _ in results for url in urls]
+    return {'image_urls': image_urls, 'next_cursor': scan_cursor(segments, pending, results)}
+
+
+def backfill_segment(segment, total_segments, start_key, limit):
+    # Sets image_prefix and event_id on items written before worker_SQS set them, so the
+    # listings by event and by prefix find them. Returns (items updated, last_key).
+    updated = 0
+    examined = 0
+    request = {
+        'TableName': table.name, 'Segment': segment, 'TotalSegments': total_segments,
+        'ProjectionExpression': 'image_id', 'FilterExpression': 'attribute_not_exists(image_prefix)'
+    }
+    if start_key:
+        request['ExclusiveStartKey'] = start_key
+    while examined < limit:
+        request['Limit'] = limit - examined
+        response = table.meta.client.scan(**request)
+        examined += response.get('ScannedCount', 0)
+        for item in response.get('Items', []):
+            attributes = image_index.attributes(item['image_id'])
+            try:
+                table.meta.client.update_item(
+                    TableName=table.name,
+                    Key={'image_id': item['image_id']},
+                    UpdateExpression='SET ' + ', '.join(f"{name} = :{name}" for name in attributes),
+                    ConditionExpression='attribute_exists(image_id)',
+                    ExpressionAttributeValues={f":{name}": value for name, value in attributes.items()}
+                )
+                updated += 1
+            except ClientError as e:
+                # Deleted since the scan read it
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        if 'LastEvaluatedKey' not in response:
+            return updated, None
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return updated, request['ExclusiveStartKey']
+
+
+def backfill(params):
+    # Admin backfill of the index attributes; call again with next_cursor until it is null
+    segments, pending = scan_state(params)
+    limit = max(1, BACKFILL_PAGE_SIZE // len(pending)) if pending else 0
+    with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+        results = list(executor.map(lambda segment: backfill_segment(segment, segments, pending[segment], limit), pending))
+    return {'updated': sum(updated for updated, _ in results), 'next_cursor': scan_cursor(segments, pending, results)}
 
 
+@metrics.handler('read_imageDB')
 def lambda_handler(event, context):
-    # Return JSON list of image URLs stored in DynamoDB
+    # Return a page of image URLs stored in DynamoDB
+    params = event.get('queryStringParameters') or {}
     try:
-        response = table.scan()
-        items = response.get('Items', [])
-        image_urls = [item.get('image_url') for item in items if item.get('image_url')]
+        if params.get('mode') == 'export':
+            body = export_all(params)
+        elif params.get('mode') == 'backfill':
+            body = backfill(params)
+        elif params.get('cursor'):
+            body = list_page(params)
+        else:
+            body = cached_first_page(params)
         return {
             'statusCode': 200,
-            'body': json.dumps({'image_urls': image_urls})
+            'body': json.dumps(body)
         }
+    except InvalidRequest as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
     except ClientError as e:
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
     except Exception as e:
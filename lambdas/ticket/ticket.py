@@ -1,21 +1,20 @@
 import json
-import boto3
-from boto3.dynamodb.conditions import Key
-from decimal import Decimal
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-# Create DynamoDB resource and table handle
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('Ticket_table')
+from common import clients, dynamo_batch, holds, metrics, serialization
 
+# Table handle, created on first use (see common.clients)
+table = clients.table('Ticket_table')
+# Low-level client for batched reads (takes typed attribute values)
+dynamodb_client = clients.lazy('dynamodb_client')
+redis_client = clients.lazy('redis')
 
-
-# Helper class to convert Decimal values to JSON-serializable types
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            # Convert Decimal to float if fractional, otherwise to int
-            return float(obj) if obj % 1 else int(obj)
-        return super(DecimalEncoder, self).default(obj)
+# One batch read covers a whole cart; BatchGetItem calls of 100 keys run in parallel
+MAX_BATCH_TICKETS = int(os.environ.get('TICKET_BATCH_MAX', 500))
+BATCH_READ_WORKERS = 4
+FIELD_NAME = re.compile(r'^[A-Za-z0-9_]{1,64}$')
 
 
 def create_item(event):
@@ -45,15 +44,80 @@ def create_item(event):
 
 
 def read_item(event):
-    # Read ticket by ticket_id
-    ticket_id = event['ticket_id']
+    # Read ticket by ticket_id (query string; a top-level ticket_id is still accepted)
+    params = event.get('queryStringParameters') or {}
+    ticket_id = params.get('ticket_id') or event.get('ticket_id')
+    if not ticket_id:
+        return {'statusCode': 400, 'body': json.dumps('ticket_id is required')}
     response = table.get_item(Key={'ticket_id': ticket_id})
     if 'Item' in response:
-        return {'statusCode': 200, 'body': json.dumps(response['Item'], cls=DecimalEncoder)}
+        return {'statusCode': 200, 'body': serialization.dumps(response['Item'])}
     else:
         return {'statusCode': 404, 'body': json.dumps('Ticket not found')}
 
 
+def split_list(value):
+    # Accepts a JSON list or a comma-separated string
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(v).strip() for v in value or [] if str(v).strip()]
+
+
+def projection_for(fields):
+    # ticket_id is always returned so results can be matched to the request
+    names = {}
+    for field in ['ticket_id'] + [f for f in fields if f != 'ticket_id']:
+        if not FIELD_NAME.match(field):
+            raise ValueError(f"Invalid field: {field}")
+        names[f"#f{len(names)}"] = field
+    return ', '.join(names), names
+
+
+def read_batch(ticket_ids, fields=None, include_holds=False):
+    # Returns (tickets in request order, ids not found)
+    projection, names = projection_for(fields) if fields else (None, None)
+    chunks = list(dynamo_batch.chunked(({'ticket_id': {'S': ticket_id}} for ticket_id in ticket_ids), dynamo_batch.GET_BATCH_SIZE))
+
+    def get_chunk(keys):
+        return dynamo_batch.get_batch(dynamodb_client, 'Ticket_table', keys, projection, names)
+
+    if len(chunks) == 1:
+        results = [get_chunk(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=BATCH_READ_WORKERS) as executor:
+            results = list(executor.map(get_chunk, chunks))
+    found = {}
+    for items in results:
+        for item in items:
+            ticket = serialization.from_item(item)
+            found[ticket['ticket_id']] = ticket
+
+    if include_holds and found:
+        held = holds.remaining_ms(redis_client, list(found))
+        for ticket_id, ticket in found.items():
+            ticket['held'] = ticket_id in held
+            if ticket_id in held:
+                ticket['hold_expires_in_ms'] = held[ticket_id]
+    return [found[t] for t in ticket_ids if t in found], [t for t in ticket_ids if t not in found]
+
+
+def batch_read_item(params):
+    # params: ticket_ids, optional fields (projection) and holds (merge live hold state)
+    ticket_ids = list(dict.fromkeys(split_list(params.get('ticket_ids'))))
+    if not ticket_ids:
+        return {'statusCode': 400, 'body': json.dumps('ticket_ids is required')}
+    if len(ticket_ids) > MAX_BATCH_TICKETS:
+        return {'statusCode': 400, 'body': json.dumps(f"At most {MAX_BATCH_TICKETS} ticket_ids per request")}
+    include_holds = str(params.get('holds', 'false')).lower() == 'true'
+    try:
+        tickets, missing = read_batch(ticket_ids, split_list(params.get('fields')), include_holds)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps(str(e))}
+    except dynamo_batch.BatchGetError:
+        return {'statusCode': 503, 'body': json.dumps('Ticket reads throttled; retry')}
+    return {'statusCode': 200, 'body': serialization.dumps_list(tickets, key='tickets', extra={'missing': missing})}
+
+
 def update_item(event):
     # Update ticket item
     ticket_id = event['ticket_id']
@@ -68,7 +132,7 @@ def update_item(event):
     }
     response = table.update_item(Key={'ticket_id': ticket_id}, UpdateExpression=update_expression, ExpressionAttributeValues=expression_values, ReturnValues="UPDATED_NEW")
     if 'Attributes' in response:
-        return {'statusCode': 200, 'body': json.dumps('Ticket successfully updated', cls=DecimalEncoder)}
+        return {'statusCode': 200, 'body': json.dumps('Ticket successfully updated')}
     else:
         return {'statusCode': 404, 'body': json.dumps('Ticket not found')}
 
@@ -83,11 +147,16 @@ def delete_item(event):
         return {'statusCode': 404, 'body': json.dumps('Ticket not found')}
 
 
+@metrics.handler('ticket')
 def lambda_handler(event, context):
     # Route by HTTP method
     http_method = event['httpMethod']
-    if http_method == 'POST':
+    if event.get('path') == '/default/ticketmaster_ticket/batch' and http_method == 'POST':
+        return batch_read_item(json.loads(event['body']))
+    elif http_method == 'POST':
         return create_item(json.loads(event['body']))
+    elif http_method == 'GET' and (event.get('queryStringParameters') or {}).get('ticket_ids'):
+        return batch_read_item(event['queryStringParameters'])
     elif http_method == 'GET':
         return read_item(event)
     elif http_method == 'PUT':
@@ -1,50 +1,80 @@
 import json
-import boto3
+from concurrent.futures import ThreadPoolExecutor
 
-dynamodb = boto3.resource('dynamodb')
-image_table = dynamodb.Table('Image_table')
+from botocore.exceptions import ClientError
 
-def add_image_dynamoDB(s3_record):
+from common import clients, dynamo_batch, image_index, metrics, sqs_batch
+
+# Low-level client for batch writes (takes typed attribute values)
+dynamodb_client = clients.lazy('dynamodb_client')
+
+WRITE_WORKERS = 4
+
+def image_item(s3_record):
     bucket_name = s3_record['s3']['bucket']['name']
     object_key = s3_record['s3']['object']['key']
     event_time = s3_record['eventTime']
     image_url = f"https://d3n5cjruhfi9i8.cloudfront.net/{object_key}"
-    item = {
+    return {
         'image_id': object_key,
         'bucket_name': bucket_name,
         'object_key': object_key,
         'image_url' : image_url,
-        'event_time': event_time
+        'event_time': event_time,
+        **image_index.attributes(object_key)
     }
-    image_table.put_item(Item=item)
-    
 
-def delete_image_dynamoDB(s3_record):
-    image_id = s3_record['s3']['object']['key']
-    response = image_table.delete_item(
-        Key={
-            'image_id': image_id
-        }
-    )
-    
+def event_order(s3_record, position):
+    # S3's sequencer orders events for the same key; compare as equal-length hex strings
+    sequencer = s3_record['s3']['object'].get('sequencer', '')
+    return (sequencer.rjust(32, '0'), position)
 
+def collect_operations(records):
+    # Coalesce every S3 record in the batch to the latest operation per object key.
+    # Returns ({key: (order, request)}, {key: {message ids}}, failed message ids)
+    operations = {}
+    sources = {}
+    failed = set()
+    position = 0
+    for record in records:
+        message_id = record['messageId']
+        try:
+            s3_records = json.loads(record['body']).get('Records', [])
+            for s3_record in s3_records:
+                position += 1
+                event_name = s3_record['eventName']
+                object_key = s3_record['s3']['object']['key']
+                if event_name.startswith('ObjectCreated:'):
+                    request = dynamo_batch.put_request(image_item(s3_record))
+                elif event_name.startswith('ObjectRemoved:'):
+                    request = dynamo_batch.delete_request({'image_id': object_key})
+                else:
+                    continue
+                order = event_order(s3_record, position)
+                if object_key not in operations or operations[object_key][0] < order:
+                    operations[object_key] = (order, request)
+                sources.setdefault(object_key, set()).add(message_id)
+        except (ValueError, KeyError, TypeError):
+            failed.add(message_id)
+    return operations, sources, failed
 
+def write_chunk(chunk):
+    # Returns the object keys whose writes did not land
+    try:
+        dynamo_batch.write_batch(dynamodb_client, 'Image_table', [request for _, request in chunk])
+        return []
+    except (ClientError, dynamo_batch.BatchWriteError):
+        return [object_key for object_key, _ in chunk]
 
+@metrics.handler('worker_SQS')
 def lambda_handler(event, context):
     # Process SQS messages that contain S3 event notifications
+    operations, sources, failed = collect_operations(event['Records'])
 
-    try:
-        for record in event['Records']:
-            body = json.loads(record['body'])
-            s3_record = body['Records'][0]
-            if s3_record['eventName'] == 'ObjectCreated:Put':
-                add_image_dynamoDB(s3_record)
-            elif s3_record['eventName'] == 'ObjectRemoved:Delete':
-                delete_image_dynamoDB(s3_record)            
-    except Exception as e:
-        raise e        
-    # TODO implement
-    return {
-        'statusCode': 200,
-        'body': json.dumps('OK')
-    }
+    chunks = list(dynamo_batch.chunked([(key, request) for key, (_, request) in operations.items()], dynamo_batch.BATCH_SIZE))
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+        for failed_keys in executor.map(write_chunk, chunks):
+            for object_key in failed_keys:
+                failed.update(sources[object_key])
+
+    return sqs_batch.item_failures(sorted(failed))
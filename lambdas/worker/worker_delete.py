@@ -0,0 +1,165 @@
+import json
+import os
+
+from common import clients, dynamo_batch, event_deletion, holds, metrics, search_client, seat_state, serialization, sqs_batch, ticket_counter, waiting_room
+
+dynamodb_client = clients.lazy('dynamodb_client')
+redis_client = clients.lazy('redis')
+sqs = clients.lazy('sqs')
+
+# Like the stream indexer, leaves search alone when OPENSEARCH_URL is unset
+OPENSEARCH_URL = os.environ.get('OPENSEARCH_URL')
+INDEX_NAME = 'event'
+DELETE_WORKERS = int(os.environ.get('EVENT_DELETE_WORKERS', 8))
+DELETE_SEGMENT_SIZE = int(os.environ.get('EVENT_DELETE_SEGMENT_SIZE', 500))
+# Stop handing out segments this close to the Lambda timeout and requeue the rest
+DELETE_TIME_MARGIN_MS = int(os.environ.get('EVENT_DELETE_TIME_MARGIN_MS', 10000))
+# The GSI is eventually consistent; sweep again until a pass finds nothing
+MAX_PASSES = 5
+
+def read_event(event_id):
+    item = dynamodb_client.get_item(TableName='Event_table', Key={'event_id': {'S': event_id}}, ConsistentRead=True).get('Item')
+    return serialization.from_item(item) if item else None
+
+def event_ticket_ids(event_id):
+    # Every ticket of the event, whatever its status, in GSI order
+    query_kwargs = {
+        'TableName': 'Ticket_table',
+        'IndexName': 'event_id-ticket_status-index',
+        'KeyConditionExpression': 'event_id = :event_id',
+        'ExpressionAttributeValues': {':event_id': {'S': event_id}},
+        'ProjectionExpression': 'ticket_id'
+    }
+    while True:
+        response = dynamodb_client.query(**query_kwargs)
+        for item in response.get('Items', []):
+            yield item['ticket_id']['S']
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def delete_requests(event_id, seen):
+    # Holds go with each segment of tickets, before the tickets themselves. Ids in `seen`
+    # were deleted by an earlier pass and are only still listed by the lagging GSI.
+    fresh = (ticket_id for ticket_id in event_ticket_ids(event_id) if ticket_id not in seen)
+    for chunk in dynamo_batch.chunked(fresh, DELETE_SEGMENT_SIZE):
+        seen.update(chunk)
+        holds.clear(redis_client, event_id, chunk)
+        for ticket_id in chunk:
+            yield dynamo_batch.delete_request({'ticket_id': ticket_id})
+
+def save_progress(event_id, tickets_deleted):
+    try:
+        dynamodb_client.update_item(
+            TableName='Event_table',
+            Key={'event_id': {'S': event_id}},
+            UpdateExpression="SET tickets_deleted = :deleted",
+            ConditionExpression="deletion_status = :deleting",
+            ExpressionAttributeValues={':deleted': {'N': str(tickets_deleted)}, ':deleting': {'S': event_deletion.DELETING}}
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        pass
+
+def delete_tickets(event_id, deleted, should_stop):
+    # Returns (tickets deleted so far, finished). Each ticket is counted once per
+    # invocation, so a pass that finds only already-deleted tickets ends the sweep.
+    seen = set()
+    for _ in range(MAX_PASSES):
+        base = deleted
+        result = dynamo_batch.bulk_write(
+            dynamodb_client,
+            'Ticket_table',
+            delete_requests(event_id, seen),
+            workers=DELETE_WORKERS,
+            segment_size=DELETE_SEGMENT_SIZE,
+            on_checkpoint=lambda written: save_progress(event_id, base + written),
+            should_stop=should_stop
+        )
+        deleted = base + result['written']
+        if not result['complete']:
+            return deleted, False
+        if not result['written']:
+            return deleted, True
+    return deleted, False
+
+def delete_counter(event_id, shard_count):
+    keys = [ticket_counter.counter_key(event_id, shard)[1] for shard in range(shard_count)]
+    for chunk in dynamo_batch.chunked(keys, dynamo_batch.BATCH_SIZE):
+        dynamo_batch.write_batch(dynamodb_client, ticket_counter.COUNTER_TABLE, [{'DeleteRequest': {'Key': key}} for key in chunk])
+
+def delete_redis_state(event_id):
+    redis_client.delete(seat_state.bitmap_key(event_id), seat_state.layout_key(event_id), seat_state.expiry_key(event_id),
+                        seat_state.version_key(event_id), holds.index_key(event_id))
+    redis_client.delete(waiting_room.state_key(event_id), waiting_room.visitors_key(event_id),
+                        waiting_room.admitted_key(event_id), waiting_room.stats_key(event_id))
+
+def delete_search_document(event_id):
+    # The stream indexer also drops it once the item is gone; this keeps search honest
+    # without waiting on the stream
+    if not OPENSEARCH_URL:
+        return
+    response = search_client.session().delete(f"{OPENSEARCH_URL}/{INDEX_NAME}/_doc/{event_id}", timeout=search_client.TIMEOUT)
+    if response.status_code not in (200, 404):
+        raise RuntimeError(f"OpenSearch delete returned {response.status_code}")
+    search_client.invalidate(redis_client)
+
+def delete_event_item(event_id):
+    try:
+        dynamodb_client.delete_item(
+            TableName='Event_table',
+            Key={'event_id': {'S': event_id}},
+            ConditionExpression="deletion_status = :deleting",
+            ExpressionAttributeValues={':deleting': {'S': event_deletion.DELETING}}
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        # Already gone (a re-delivered message) or no longer marked for deletion
+        pass
+
+def cascade_delete(event_id, should_stop=None):
+    # Every step is idempotent, so a re-delivered or requeued message starts over safely.
+    # Returns False when it stopped early and the rest must be requeued.
+    event_item = read_event(event_id)
+    if event_item and event_item.get('deletion_status') != event_deletion.DELETING:
+        # Not (or no longer) marked for deletion; nothing to do
+        return True
+    deleted = int(event_item.get('tickets_deleted', 0)) if event_item else 0
+    deleted, finished = delete_tickets(event_id, deleted, should_stop)
+    if not finished:
+        return False
+    shard_count = int(event_item.get('counter_shards', 0)) if event_item else ticket_counter.MAX_SHARDS
+    delete_counter(event_id, shard_count)
+    delete_redis_state(event_id)
+    delete_search_document(event_id)
+    if event_item:
+        event_deletion.write_summary(redis_client, event_id, {
+            'event_id': event_id,
+            'status': 'deleted',
+            'tickets_deleted': deleted,
+            'requested_at': event_item.get('deletion_requested_at'),
+            'completed_at': event_deletion.now_iso()
+        })
+    delete_event_item(event_id)
+    return True
+
+@metrics.handler('worker_delete')
+def lambda_handler(event, context):
+    # Process SQS messages of {"event_id": ...} queued by the event lambda's DELETE
+    should_stop = None
+    if context is not None:
+        should_stop = lambda: context.get_remaining_time_in_millis() < DELETE_TIME_MARGIN_MS
+
+    failed = []
+    for record in event['Records']:
+        try:
+            event_id = json.loads(record['body'])['event_id']
+            if should_stop and should_stop():
+                failed.append(record['messageId'])
+                continue
+            if not cascade_delete(event_id, should_stop):
+                # Out of time: hand the rest to a fresh invocation
+                event_deletion.enqueue(sqs, event_id)
+        except Exception:
+            # Any failure (DynamoDB, Redis, OpenSearch) sends the message back for a retry
+            failed.append(record['messageId'])
+
+    return sqs_batch.item_failures(failed)
@@ -0,0 +1,85 @@
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import cache, clients, metrics, orders, purchase, sqs_batch, waiting_room
+
+dynamodb = clients.lazy('dynamodb_client')
+redis_client = clients.lazy('redis')
+
+# Events whose orders are purchased at once within one batch. With the event source
+# mapping's MaximumConcurrency this caps concurrent purchase transactions, and so the
+# DynamoDB write rate, at a level chosen here rather than by client demand.
+PURCHASE_WORKERS = int(os.environ.get('PURCHASE_WORKERS', 4))
+# Orders that lose only to transaction conflicts or throttling are retried in place;
+# their seats are still held by the order's token
+CONTENDED_RETRIES = 2
+CONTENDED_BACKOFF = 0.05
+
+def lost_to_contention(result):
+    outcomes = set(result['results'].values())
+    return result['status'] == 'conflict' and purchase.CONTENDED in outcomes and outcomes <= {purchase.CONTENDED, purchase.HELD}
+
+def process_order(order):
+    order_id = order['order_id']
+    event_id = order['event_id']
+    current = orders.read_status(redis_client, order_id)
+    if current and current['status'] in orders.FINAL:
+        # A re-delivered message for an order already settled
+        return
+    event_item = cache.event(event_id)
+    if event_item and event_item.get('deletion_status'):
+        orders.write_status(redis_client, order_id, orders.FAILED, event_id=event_id, ticket_ids=order['ticket_ids'],
+                            error='Event is being deleted')
+        return
+    orders.write_status(redis_client, order_id, orders.PROCESSING, event_id=event_id, ticket_ids=order['ticket_ids'])
+
+    for attempt in range(CONTENDED_RETRIES + 1):
+        result = purchase.purchase(dynamodb, redis_client, event_id, order['ticket_ids'], order['hold_token'], booking_id=order_id)
+        if not lost_to_contention(result) or attempt == CONTENDED_RETRIES:
+            break
+        time.sleep(random.uniform(0, CONTENDED_BACKOFF * (2 ** attempt)))
+
+    if result['status'] == 'not_held' and orders.booking_exists(dynamodb, order_id):
+        # Bought on an earlier delivery that stopped before recording it
+        result = {'status': 'complete', 'booking_id': order_id, 'results': {}}
+    if result['status'] == 'complete':
+        orders.write_status(redis_client, order_id, orders.COMPLETE, event_id=event_id, ticket_ids=order['ticket_ids'],
+                            booking_id=result['booking_id'])
+        if waiting_room.is_active(redis_client, event_id):
+            waiting_room.record(redis_client, event_id, 'purchased')
+        return
+    orders.write_status(
+        redis_client, order_id, orders.FAILED, event_id=event_id, ticket_ids=order['ticket_ids'],
+        error='Tickets are not held by this hold_token' if result['status'] == 'not_held' else 'Some tickets could not be purchased',
+        results=[{'ticket_id': ticket_id, 'result': outcome} for ticket_id, outcome in result['results'].items()],
+        retry_ticket_ids=[ticket_id for ticket_id, outcome in result['results'].items() if outcome != purchase.HELD]
+    )
+
+def process_group(records):
+    # One event's messages, in queue order. After a failure the rest of the group goes
+    # back too, so a FIFO group is never processed out of order.
+    for index, record in enumerate(records):
+        try:
+            process_order(json.loads(record['body']))
+        except Exception:
+            # DynamoDB or Redis errors; SQS redelivers and the order picks up where it was
+            return [r['messageId'] for r in records[index:]]
+    return []
+
+@metrics.handler('worker_purchase')
+def lambda_handler(event, context):
+    # Process SQS FIFO messages of orders queued by the booking lambda
+    groups = {}
+    for record in event['Records']:
+        group = record.get('attributes', {}).get('MessageGroupId', '')
+        groups.setdefault(group, []).append(record)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=PURCHASE_WORKERS) as executor:
+        for group_failures in executor.map(process_group, groups.values()):
+            failed.extend(group_failures)
+
+    return sqs_batch.item_failures(failed)
@@ -1,45 +1,54 @@
 import json
 import os
 import requests
-from decimal import Decimal
+
+from common import clients, event_search, metrics, search_client, serialization
 
 # OpenSearch settings from environment
 OPENSEARCH_URL = os.environ.get('OPENSEARCH_URL')
-OPENSEARCH_USER = os.environ.get('OPENSEARCH_USER')
-OPENSEARCH_PASS = os.environ.get('OPENSEARCH_PASS')
+# Shares the cache generation the stream indexer bumps, so index updates retire cached results
+redis_client = clients.lazy('redis')
 
 
-def decimal_default(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError
+def advanced_search(payload):
+    if not OPENSEARCH_URL:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'OPENSEARCH_URL is required'})}
+    try:
+        results = event_search.search(OPENSEARCH_URL, payload, redis_client=redis_client)
+    except event_search.InvalidSearch as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+    except requests.exceptions.HTTPError as e:
+        return {'statusCode': e.response.status_code, 'body': json.dumps({'error': 'Failed to fetch data from OpenSearch', 'details': e.response.text})}
+    except Exception as e:
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    return {'statusCode': 200, 'body': serialization.dumps(results)}
 
 
 def search(event):
     # Search events in OpenSearch using provided JSON body {"keyword": "..."}
     payload = json.loads(event.get('body', '{}'))
+    if event_search.is_advanced(payload):
+        return advanced_search(payload)
     keyword = payload.get('keyword')
     if not keyword or not OPENSEARCH_URL:
         return {'statusCode': 400, 'body': json.dumps({'error': 'keyword and OPENSEARCH_URL are required'})}
 
-    query = {"query": {"match": {"event_name": keyword}}}
-    headers = {'Content-Type': 'application/json'}
+    query = {"query": {"match": {"event_name": search_client.normalize(keyword)}}}
     try:
-        response = requests.get(OPENSEARCH_URL, auth=(OPENSEARCH_USER, OPENSEARCH_PASS) if OPENSEARCH_USER and OPENSEARCH_PASS else None, headers=headers, json=query, timeout=10)
+        search_results = search_client.search(OPENSEARCH_URL, query, redis_client=redis_client)
+    except requests.exceptions.HTTPError as e:
+        return {'statusCode': e.response.status_code, 'body': json.dumps({'error': 'Failed to fetch data from OpenSearch', 'details': e.response.text})}
     except Exception as e:
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
-    if response.status_code == 200:
-        search_results = response.json()
-        hits = search_results.get('hits', {}).get('hits', [])
-        if hits:
-            return {'statusCode': 200, 'body': json.dumps(hits, default=decimal_default)}
-        else:
-            return {'statusCode': 404, 'body': json.dumps({'message': 'No events found for the given keyword'})}
+    hits = search_results.get('hits', {}).get('hits', [])
+    if hits:
+        return {'statusCode': 200, 'body': serialization.dumps(hits)}
     else:
-        return {'statusCode': response.status_code, 'body': json.dumps({'error': 'Failed to fetch data from OpenSearch', 'details': response.text})}
+        return {'statusCode': 404, 'body': json.dumps({'message': 'No events found for the given keyword'})}
 
 
+@metrics.handler('search')
 def lambda_handler(event, context):
     path = event.get('path', '')
     http_method = event.get('httpMethod', '')